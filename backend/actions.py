@@ -0,0 +1,128 @@
+import logging
+from typing import Dict, Tuple
+from game_logic import GameManager
+
+logger = logging.getLogger(__name__)
+
+# 客户端可以发起的全部操作
+KNOWN_ACTIONS = (
+    "join_game",
+    "roll_dice",
+    "buy_property",
+    "end_turn",
+    "mortgage_property",
+    "redeem_property",
+    "upgrade_property",
+    "batch",
+)
+
+# 一个批量操作最多包含的操作数
+MAX_BATCH_ACTIONS = 16
+
+def dispatch_action(game_manager: GameManager, player_id: str, message: Dict) -> Dict:
+    """把客户端操作分发给游戏管理器，返回 action_result 消息"""
+    action = message.get("action")
+    response = {"type": "action_result", "success": False}
+
+    if action == "join_game":
+        player_name = message.get("player_name", f"玩家{player_id}")
+        success = game_manager.add_player(player_id, player_name)
+        response["success"] = success
+        if success:
+            response["message"] = "加入游戏成功"
+        elif player_id in game_manager.state.players:
+            response["message"] = "已经在游戏中"
+        else:
+            response["message"] = "房间已满，无法加入"
+
+    elif action == "roll_dice":
+        result = game_manager.roll_dice_and_move(player_id)
+        response.update(result)
+
+    elif action == "buy_property":
+        result = game_manager.buy_property(player_id)
+        response.update(result)
+
+    elif action == "end_turn":
+        result = game_manager.end_turn()
+        response.update(result)
+
+    elif action == "mortgage_property":
+        property_id = message.get("property_id")
+        if property_id is not None:
+            result = game_manager.mortgage_property(player_id, property_id)
+            response.update(result)
+        else:
+            response["message"] = "缺少地产ID参数"
+
+    elif action == "redeem_property":
+        property_id = message.get("property_id")
+        if property_id is not None:
+            result = game_manager.redeem_property(player_id, property_id)
+            response.update(result)
+        else:
+            response["message"] = "缺少地产ID参数"
+
+    elif action == "upgrade_property":
+        property_id = message.get("property_id")
+        if property_id is not None:
+            result = game_manager.upgrade_property(player_id, property_id)
+            response.update(result)
+        else:
+            response["message"] = "缺少地产ID参数"
+
+    elif action == "batch":
+        return dispatch_batch(game_manager, player_id, message.get("actions"))
+
+    else:
+        response["message"] = "未知操作"
+
+    return response
+
+def apply_action(game_manager: GameManager, player_id: str, message: Dict) -> Tuple[Dict, str]:
+    """执行一个操作，返回 action_result 消息和结果分类（success / failure / error）
+
+    服务器、事件日志恢复和重放工具都通过这里执行操作。校验失败的操作不修改状态；
+    执行中抛出异常的操作保留已做的修改，返回内部错误，之后的操作照常执行。
+    """
+    try:
+        response = dispatch_action(game_manager, player_id, message)
+    except Exception:
+        logger.exception("房间 %s 执行操作 %s 出错", game_manager.state.room_id, message.get("action"))
+        return {"type": "action_result", "success": False, "message": "服务器内部错误"}, "error"
+    return response, "success" if response.get("success") else "failure"
+
+def dispatch_batch(game_manager: GameManager, player_id: str, actions) -> Dict:
+    """按顺序执行一组操作，全部成功才生效
+
+    任一操作失败时回滚整组操作，返回的 results 包含失败操作及其之前各操作的结果，
+    failed_index 为失败操作的下标。
+    """
+    response = {"type": "action_result", "action": "batch", "success": False}
+    if not isinstance(actions, list) or not actions:
+        response["message"] = "缺少操作列表参数"
+        return response
+    if len(actions) > MAX_BATCH_ACTIONS:
+        response["message"] = f"批量操作最多包含 {MAX_BATCH_ACTIONS} 个操作"
+        return response
+
+    checkpoint = game_manager.checkpoint()
+    results = []
+    for index, message in enumerate(actions):
+        if not isinstance(message, dict) or message.get("action") in ("batch", None):
+            result = {"type": "action_result", "success": False, "message": "无效的批量操作项"}
+        else:
+            result = dispatch_action(game_manager, player_id, message)
+        results.append(result)
+
+        if not result.get("success"):
+            game_manager.rollback(checkpoint)
+            response["results"] = results
+            response["failed_index"] = index
+            response["message"] = f"第 {index + 1} 个操作失败，已全部撤销：{result.get('message', '操作失败')}"
+            return response
+
+    response["success"] = True
+    response["results"] = results
+    response["message"] = f"批量操作完成（共 {len(results)} 个）"
+    return response
@@ -0,0 +1,222 @@
+"""棋盘马尔可夫链分析
+
+把单个棋子每个回合的移动看作马尔可夫链，直接求出稳态分布，不需要模拟：
+- 状态为回合结束时棋子所在的地块，以及在监狱中已等待 0..jail_turns-1 个回合的监狱状态
+- 骰子为 1-6 点等概率
+- 落在机会/命运地块时等概率抽一张卡，移动类卡片触发新的落地处理（可能连锁）
+- 落在"前往监狱"直接传送到监狱，等待规则与 roll_dice_and_move 一致
+
+由稳态分布得到每个地块每回合的期望落地次数，进而得到各地产各等级的期望租金
+和回本所需的轮数。结果按棋盘版本缓存，棋盘、卡片或规则变化时重新计算。
+
+用法：
+    python analytics.py --opponents 3 --board default
+"""
+import argparse
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import Response
+
+from game_board import (
+    BOARDS, DEFAULT_BOARD, DEFAULT_BOARD_NAME, TILE_CHANCE, TILE_DESTINY, TILE_GO_TO_JAIL, TILE_PROPERTY, Board
+)
+
+# 骰子点数及其概率
+DICE_FACES = range(1, 7)
+
+# 客户端可缓存的时间（秒），过期后凭 ETag 重新验证
+ANALYTICS_MAX_AGE = 3600
+
+# 分析结果缓存：(棋盘版本, 对手数) -> 序列化后的结果
+_cache: Dict[Tuple[str, int], bytes] = {}
+
+def _card_moves(cards: List[Dict], position: int, board_size: int) -> Tuple[Dict[int, float], float, float]:
+    """在 position 抽卡的结果（私有函数）
+
+    Returns:
+        (移动目标 -> 概率, 不移动的概率, 因卡片移动经过起点的概率)
+    """
+    weight = 1 / len(cards)
+    moves: Dict[int, float] = {}
+    stay = 0.0
+    go_pass = 0.0
+    for card in cards:
+        if card["type"] == "move_to":
+            steps = (card["value"] - position) % board_size
+        elif card["type"] == "move_forward":
+            steps = card["value"]
+        elif card["type"] == "move_backward":
+            steps = -card["value"]
+        else:
+            stay += weight
+            continue
+        target = (position + steps) % board_size
+        moves[target] = moves.get(target, 0.0) + weight
+        if steps > 0 and target < position:
+            go_pass += weight
+    return moves, stay, go_pass
+
+def transition_matrices(board: Board):
+    """构建每回合的状态转移矩阵和期望落地次数矩阵
+
+    状态 0..n-1 为回合结束时位于对应地块，n+k 为在监狱中已等待 k 个回合。
+
+    Returns:
+        (转移矩阵 T，S×S；落地矩阵 L，S×n，L[s, t] 为从状态 s 开始的一个回合内落在 t 的期望次数；
+         起点向量 g，g[s] 为一个回合内经过起点的期望次数)
+    """
+    board_size = board.size
+    jail_turns = board.jail_turns
+    state_count = board_size + jail_turns
+    jail = board.jail_position
+    first_jail_state = board_size
+
+    # 落地处理：B 为卡片移动的子随机矩阵，A 为落地处理结束后的状态分布
+    card_moves = np.zeros((board_size, board_size))
+    stops = np.zeros((board_size, state_count))
+    card_go = np.zeros(board_size)
+    for tile_id, tile_type in enumerate(board.tile_types):
+        if tile_type in (TILE_CHANCE, TILE_DESTINY):
+            cards = board.chance_cards if tile_type == TILE_CHANCE else board.destiny_cards
+            moves, stay, go_pass = _card_moves(cards, tile_id, board_size)
+            for target, probability in moves.items():
+                card_moves[tile_id, target] += probability
+            stops[tile_id, tile_id] = stay
+            card_go[tile_id] = go_pass
+        elif tile_type == TILE_GO_TO_JAIL:
+            stops[tile_id, first_jail_state] = 1.0
+        else:
+            stops[tile_id, tile_id] = 1.0
+
+    # 基本矩阵 N[t, u]：落在 t 之后（含 t 本身）落在 u 的期望次数，卡片连锁成环时同样成立
+    visits = np.linalg.inv(np.eye(board_size) - card_moves)
+    # 落在 t 之后最终停留的状态分布
+    resolved = visits @ stops
+    # 落在 t 之后因卡片移动经过起点的期望次数
+    resolved_go = visits @ card_go
+
+    # 从每个地块掷骰子后的结果
+    roll_states = np.zeros((board_size, state_count))
+    roll_landings = np.zeros((board_size, board_size))
+    roll_go = np.zeros(board_size)
+    for position in range(board_size):
+        for face in DICE_FACES:
+            probability = 1 / len(DICE_FACES)
+            target = (position + face) % board_size
+            roll_states[position] += probability * resolved[target]
+            roll_landings[position] += probability * visits[target]
+            roll_go[position] += probability * ((target < position) + resolved_go[target])
+
+    transition = np.zeros((state_count, state_count))
+    landings = np.zeros((state_count, board_size))
+    go_passes = np.zeros(state_count)
+    transition[:board_size] = roll_states
+    landings[:board_size] = roll_landings
+    go_passes[:board_size] = roll_go
+    for waited in range(jail_turns):
+        state = first_jail_state + waited
+        if waited + 1 < jail_turns:
+            # 继续在监狱中等待，不移动
+            transition[state, state + 1] = 1.0
+        else:
+            # 等满回合后缴纳罚款出狱，本回合正常掷骰
+            transition[state] = roll_states[jail]
+            landings[state] = roll_landings[jail]
+            go_passes[state] = roll_go[jail]
+    return transition, landings, go_passes
+
+def stationary_distribution(transition: np.ndarray) -> np.ndarray:
+    """求解 πT = π 且 Σπ = 1"""
+    state_count = transition.shape[0]
+    system = transition.T - np.eye(state_count)
+    # 用归一化条件替换一个冗余方程
+    system[-1] = 1.0
+    rhs = np.zeros(state_count)
+    rhs[-1] = 1.0
+    return np.linalg.solve(system, rhs)
+
+def analyze(board: Board = DEFAULT_BOARD, opponents: int = 3) -> Dict:
+    """计算稳态分布、期望租金和回本轮数
+
+    expected_rent 为对手每走一个回合，该地产在各等级下带来的期望租金，与 simulation.py 的定义一致；
+    payback_rounds 为各等级下收回累计投入（地价加升级费用）所需的轮数，每轮 opponents 名对手各走一个回合。
+    """
+    transition, landings, go_passes = transition_matrices(board)
+    distribution = stationary_distribution(transition)
+    frequency = distribution @ landings
+    board_size = board.size
+
+    result_tiles = []
+    for tile_id, tile in enumerate(board.tiles):
+        entry = {
+            "id": tile_id,
+            "name": tile["name"],
+            "type": tile["type"],
+            # 回合结束时停在该地块的概率（不含在监狱中等待）
+            "stationary_probability": float(distribution[tile_id]),
+            # 每回合落在该地块的期望次数（含卡片连锁中的落地）
+            "landing_frequency": float(frequency[tile_id]),
+        }
+        if board.tile_types[tile_id] == TILE_PROPERTY:
+            expected_rent = [float(frequency[tile_id] * rent) for rent in board.rents[tile_id]]
+            payback = []
+            for level, rent in enumerate(expected_rent):
+                invested = board.prices[tile_id] + level * board.upgrade_costs[tile_id]
+                per_round = rent * opponents
+                payback.append(invested / per_round if per_round > 0 else None)
+            entry["expected_rent"] = expected_rent
+            entry["payback_rounds"] = payback
+        result_tiles.append(entry)
+
+    return {
+        "board": board.name,
+        "version": board.version,
+        "opponents": opponents,
+        "jail_probability": float(distribution[board_size:].sum()),
+        "go_passes_per_turn": float(distribution @ go_passes),
+        "tiles": result_tiles,
+    }
+
+def analytics_response(board: Board, opponents: int, if_none_match: Optional[str] = None) -> Response:
+    """返回棋盘的分析结果，按棋盘版本和对手数缓存，客户端缓存仍有效时返回 304"""
+    version = board.version
+    etag = f'"{version}-{opponents}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={ANALYTICS_MAX_AGE}"}
+    if if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    key = (version, opponents)
+    body = _cache.get(key)
+    if body is None:
+        body = _cache[key] = json.dumps(
+            analyze(board, opponents), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def main():
+    parser = argparse.ArgumentParser(description="大富翁棋盘马尔可夫链分析")
+    parser.add_argument("--opponents", type=int, default=3, help="对手数，用于计算回本轮数")
+    parser.add_argument("--board", default=DEFAULT_BOARD_NAME, choices=sorted(BOARDS), help="棋盘名")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    args = parser.parse_args()
+
+    summary = analyze(BOARDS[args.board], args.opponents)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'ID':>3} {'地块':<8} {'稳态概率':>8} {'落地频率':>8}  各等级期望租金/回合  回本轮数")
+    for entry in summary["tiles"]:
+        rents = " ".join(f"{rent:7.2f}" for rent in entry.get("expected_rent", []))
+        payback = " ".join(f"{rounds:6.1f}" for rounds in entry.get("payback_rounds", []) if rounds is not None)
+        print(
+            f"{entry['id']:>3} {entry['name']:<8} {entry['stationary_probability']:>8.4f} "
+            f"{entry['landing_frequency']:>8.4f}  {rents}  {payback}"
+        )
+    print(f"在监狱中的概率：{summary['jail_probability']:.4f}")
+    print(f"经过起点频率：{summary['go_passes_per_turn']:.4f} 次/回合")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""游戏引擎微基准测试
+
+单独测量 GameManager 热点路径和状态序列化的耗时，不经过网络和事件循环：
+- roll_dice_and_move：普通落地付租金、机会卡连锁移动、前往监狱、狱中回合，以及随机混合
+- buy_property、upgrade_property（含颜色组检查）、_handle_debt
+- get_game_state().dict() + json.dumps 以及增量提交，按玩家数和日志长度分组
+
+每个用例在计时前把状态重置到相同的起点，骰子和卡片通过 replay_rng 固定，
+计时期间关闭垃圾回收，取多轮平均值中的最小值作为主要指标。
+结果以 JSON Lines 输出，第一行为运行环境信息，可保存后与其他提交的结果对比。
+
+用法：
+    python bench_engine.py --output bench_output.jsonl
+    python bench_engine.py --compare bench_output.jsonl
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from game_logic import CHANCE_CARDS, GAME_MAP, PROPERTY_GROUPS, GameManager
+
+# 用例定义：(名称, 参数, 构造函数)，构造函数返回 (重置函数, 被测函数)
+Case = Tuple[str, Dict, Callable[[], Tuple[Callable[[], None], Callable[[], object]]]]
+
+# 资金足够多，避免基准过程中出现负债
+RICH = 10 ** 9
+
+def _position_of(tile_type: str) -> int:
+    """某类地块的第一个位置（私有函数）"""
+    return next(tile["id"] for tile in GAME_MAP if tile["type"] == tile_type)
+
+def build_game(players: int = 4, owned: bool = True, log_entries: int = 0, seed: int = 1) -> GameManager:
+    """构造基准用的对局
+
+    Args:
+        players: 玩家数，ID 为 p0、p1……
+        owned: 是否把全部地产依次分给 p1 之后的玩家（p0 为行动玩家，不拥有地产）
+        log_entries: 预先写入的日志条数
+        seed: 随机数种子
+    """
+    game_manager = GameManager("bench", seed, max_players=max(players, 1))
+    for index in range(players):
+        game_manager.add_player(f"p{index}", f"玩家{index}")
+    state = game_manager.state
+    for player in state.players.values():
+        player.money = RICH
+
+    if owned and players > 1:
+        owners = [state.players[f"p{index}"] for index in range(1, players)]
+        property_ids = [tile["id"] for tile in GAME_MAP if tile["type"] == "property"]
+        for index, tile_id in enumerate(property_ids):
+            state.acquire_tile(tile_id, owners[index % len(owners)])
+
+    for index in range(log_entries):
+        game_manager.log.append(f"基准日志 {index}")
+    game_manager.commit_delta()
+    return game_manager
+
+def _roll_case(start: Optional[int], outcomes: Optional[List[int]], in_jail: bool = False):
+    """掷骰子用例：每次从同一位置出发并使用相同的随机结果（私有函数）
+
+    start 为空时不重置位置，随机结果为空时使用房间的随机数生成器。
+    """
+    def make():
+        game_manager = build_game()
+        state = game_manager.state
+        player = state.players["p0"]
+
+        def reset():
+            state.current_turn_player_id = "p0"
+            state.has_rolled_dice = False
+            state.turn_completed = False
+            state.player_in_debt_id = ""
+            player.money = RICH
+            if start is not None:
+                player.position = start
+            player.is_in_jail = in_jail
+            player.turns_in_jail = 0
+            if outcomes is not None:
+                game_manager.replay_rng(outcomes)
+            game_manager.take_rng_outcomes()
+
+        return reset, lambda: game_manager.roll_dice_and_move("p0")
+    return make
+
+def _buy_case():
+    game_manager = build_game(owned=False)
+    state = game_manager.state
+    player = state.players["p0"]
+    tile_id = _position_of("property")
+
+    def reset():
+        state.release_tiles(player)
+        player.position = tile_id
+        player.money = RICH
+        state.current_turn_player_id = "p0"
+        state.can_buy_property = True
+        state.has_rolled_dice = True
+
+    return reset, lambda: game_manager.buy_property("p0")
+
+def _upgrade_case(full_group: bool):
+    def make():
+        game_manager = build_game(owned=False)
+        state = game_manager.state
+        player = state.players["p0"]
+        group_tiles = next(iter(PROPERTY_GROUPS.values()))
+        for tile_id in group_tiles if full_group else group_tiles[:1]:
+            state.acquire_tile(tile_id, player)
+        tile_id = group_tiles[0]
+
+        def reset():
+            state.tile_level[tile_id] = 0
+            player.money = RICH
+
+        return reset, lambda: game_manager.upgrade_property("p0", tile_id)
+    return make
+
+def _debt_case(has_assets: bool):
+    def make():
+        game_manager = build_game(owned=False)
+        state = game_manager.state
+        if has_assets:
+            state.acquire_tile(_position_of("property"), state.players["p0"])
+
+        def reset():
+            # 破产会移除玩家，重新加入后再制造负债
+            if "p0" not in state.players:
+                game_manager.add_player("p0", "玩家0")
+            state.player_in_debt_id = ""
+            state.game_phase = "playing"
+            state.players["p0"].money = -100
+
+        return reset, lambda: game_manager._handle_debt("p0")
+    return make
+
+def _serialize_case(players: int, log_entries: int):
+    def make():
+        game_manager = build_game(players, log_entries=log_entries)
+        return (lambda: None), lambda: json.dumps(game_manager.get_game_state().dict())
+    return make
+
+def _delta_case(players: int):
+    def make():
+        game_manager = build_game(players)
+        state = game_manager.state
+
+        def reset():
+            # 准备一次付租金的掷骰结果，只计时增量提交和编码
+            state.current_turn_player_id = "p0"
+            state.has_rolled_dice = False
+            state.players["p0"].position = 0
+            game_manager.replay_rng([1])
+            game_manager.roll_dice_and_move("p0")
+            game_manager.take_rng_outcomes()
+
+        return reset, lambda: json.dumps({"type": "game_delta", "data": game_manager.commit_delta()})
+    return make
+
+def cases() -> Iterator[Case]:
+    """全部基准用例"""
+    chance = _position_of("chance")
+    go_to_jail = _position_of("go_to_jail")
+    # 机会卡中第一张"前进"卡，从起点出发落到机会格后继续移动
+    move_card = next(
+        index for index, card in enumerate(CHANCE_CARDS)
+        if card["type"] == "move_forward"
+    )
+
+    yield "roll_dice_and_move", {"landing": "rent"}, _roll_case(0, [1])
+    yield "roll_dice_and_move", {"landing": "card_chain"}, _roll_case(0, [chance, move_card])
+    yield "roll_dice_and_move", {"landing": "go_to_jail"}, _roll_case(go_to_jail - 3, [3])
+    yield "roll_dice_and_move", {"landing": "in_jail"}, _roll_case(_position_of("jail"), [], in_jail=True)
+    yield "roll_dice_and_move", {"landing": "mixed"}, _roll_case(None, None)
+    yield "buy_property", {}, _buy_case
+    yield "upgrade_property", {"group": "complete"}, _upgrade_case(True)
+    yield "upgrade_property", {"group": "incomplete"}, _upgrade_case(False)
+    yield "handle_debt", {"outcome": "must_mortgage"}, _debt_case(True)
+    yield "handle_debt", {"outcome": "bankrupt"}, _debt_case(False)
+    for players in (2, 4, 8):
+        for log_entries in (0, 50, 500):
+            yield "get_game_state_json", {"players": players, "log": log_entries}, _serialize_case(players, log_entries)
+    for players in (2, 4, 8):
+        yield "commit_delta_json", {"players": players}, _delta_case(players)
+
+def run_case(make, number: int, repeat: int) -> Dict:
+    """运行一个用例，返回每次调用的耗时统计（纳秒）"""
+    reset, operation = make()
+    # 预热
+    for _ in range(min(number, 100)):
+        reset()
+        operation()
+
+    means = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            total = 0
+            for _ in range(number):
+                reset()
+                start = time.perf_counter_ns()
+                operation()
+                total += time.perf_counter_ns() - start
+            means.append(total / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_ns": min(means),
+        "median_ns": statistics.median(means),
+        "stdev_ns": statistics.stdev(means) if len(means) > 1 else 0.0,
+    }
+
+def environment() -> Dict:
+    """运行环境信息"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+def _key(result: Dict) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+def load_results(path: str) -> Dict[str, Dict]:
+    """读取之前保存的结果，按用例索引"""
+    results = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if "name" in record:
+                results[_key(record)] = record
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="大富翁游戏引擎微基准测试")
+    parser.add_argument("--number", type=int, default=2000, help="每轮调用次数")
+    parser.add_argument("--repeat", type=int, default=7, help="轮数")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--output", default=None, help="把 JSON Lines 结果写入文件，默认输出到标准输出")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果对比")
+    args = parser.parse_args()
+
+    baseline = load_results(args.compare) if args.compare else None
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+
+    def emit(record: Dict):
+        line = json.dumps(record, ensure_ascii=False)
+        if output is not None:
+            output.write(line + "\n")
+        else:
+            print(line)
+
+    try:
+        emit({"environment": environment()})
+        for name, params, make in cases():
+            if args.filter not in name:
+                continue
+            result = {"name": name, "params": params, **run_case(make, args.number, args.repeat)}
+            emit(result)
+            if baseline is not None:
+                previous = baseline.get(_key(result))
+                if previous is not None:
+                    ratio = result["min_ns"] / previous["min_ns"]
+                    print(
+                        f"# {name} {json.dumps(params, ensure_ascii=False)}: "
+                        f"{previous['min_ns']:.0f} -> {result['min_ns']:.0f} ns ({ratio:.2f}x)",
+                        file=sys.stderr
+                    )
+    finally:
+        if output is not None:
+            output.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""静态棋盘数据
+
+棋盘在运行期间不会变化，启动时每个棋盘序列化一次，
+通过带 ETag 的 /board 接口提供给客户端缓存。棋盘版本为内容哈希，
+状态消息只携带房间所用棋盘的名称和版本号，操作结果只用地块ID引用地块。
+"""
+import json
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from game_board import BOARDS, Board
+
+# 客户端可缓存的时间（秒），过期后凭 ETag 重新验证
+BOARD_MAX_AGE = 3600
+
+def _board_body(board: Board) -> bytes:
+    """序列化发送给客户端的棋盘数据（私有函数）"""
+    return json.dumps(
+        {
+            "name": board.name,
+            "title": board.title,
+            "version": board.version,
+            "rules": {"go_bonus": board.go_bonus, "jail_turns": board.jail_turns, "jail_fine": board.jail_fine},
+            "tiles": board.tiles,
+            "property_groups": board.property_groups,
+        },
+        ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+# 预先序列化的响应体：棋盘名 -> 响应体
+BOARD_BODIES: Dict[str, bytes] = {name: _board_body(board) for name, board in BOARDS.items()}
+
+def find_board(name: str) -> Board:
+    """按名称查找棋盘，不存在时返回 404"""
+    board = BOARDS.get(name)
+    if board is None:
+        raise HTTPException(status_code=404, detail=f"棋盘 {name} 不存在")
+    return board
+
+def board_response(board: Board, if_none_match: Optional[str]) -> Response:
+    """返回棋盘数据，客户端缓存仍有效时返回 304"""
+    etag = f'"{board.version}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={BOARD_MAX_AGE}"}
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in tags or f"W/{etag}" in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=BOARD_BODIES[board.name], media_type="application/json", headers=headers)
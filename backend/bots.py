@@ -0,0 +1,201 @@
+"""服务器端机器人玩家
+
+机器人是玩家ID带有 BOT_PREFIX 前缀的普通玩家，通过 join_game 加入房间，
+轮到它行动时由房间执行者代为提交操作，与人类玩家的操作走相同的处理、持久化和广播流程。
+
+每一步决策只查预先计算好的决策表，不做搜索：
+- 购买：地块的回本轮数越短，购买时要求保留的资金越少
+- 升级：按每元升级费用带来的期望租金增量排序，优先升级收益高的地产
+- 抵押：负债时先抵押每元抵押价值对应期望租金最低的地产
+
+决策表由 analytics.py 的马尔可夫链分析结果生成，在线程池中计算，
+按棋盘版本缓存，不会阻塞事件循环。升级和抵押只遍历机器人自己的地产，
+决策开销与棋盘大小无关。
+"""
+import asyncio
+import statistics
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from analytics import analyze
+from game_board import DEFAULT_BOARD, Board
+from game_core import RoomState
+
+# 机器人玩家ID的前缀，人类玩家不能使用
+BOT_PREFIX = "bot-"
+
+# 回本轮数处于中位数的地产，购买和升级后要保留的资金
+BASE_BUY_RESERVE = 2000
+BASE_UPGRADE_RESERVE = 4000
+
+# 保留资金的上下限
+MIN_RESERVE = 500
+MAX_RESERVE = 8000
+
+# 按棋盘版本缓存的决策表，以及正在计算中的任务
+_policies: Dict[str, "BotPolicy"] = {}
+_pending: Dict[str, asyncio.Future] = {}
+
+def is_bot(player_id: str) -> bool:
+    """玩家是否为机器人"""
+    return player_id.startswith(BOT_PREFIX)
+
+def new_bot_id() -> str:
+    """生成新的机器人玩家ID"""
+    return BOT_PREFIX + uuid.uuid4().hex[:8]
+
+def bot_name(bot_id: str) -> str:
+    """机器人的显示名称"""
+    return f"机器人{bot_id[len(BOT_PREFIX):len(BOT_PREFIX) + 4]}"
+
+def acting_bot(state: RoomState) -> Optional[str]:
+    """当前需要行动的机器人，没有时返回 None
+
+    有玩家负债时只有负债的玩家能行动；只剩一名玩家时不再行动。
+    """
+    if state.game_phase != "playing" or len(state.players) < 2:
+        return None
+    player_id = state.player_in_debt_id or state.current_turn_player_id
+    if player_id in state.players and is_bot(player_id):
+        return player_id
+    return None
+
+def _scaled_reserve(base: int, payback: Optional[float], median: Optional[float]) -> int:
+    """按回本轮数相对中位数的比例缩放保留资金（私有函数）
+
+    无法回本（payback 为 None）时取上限；没有可比较的中位数时不缩放。
+    """
+    if payback is None:
+        return MAX_RESERVE
+    if not median or median <= 0:
+        return base
+    return int(min(max(base * payback / median, MIN_RESERVE), MAX_RESERVE))
+
+def _median(values: List[float]) -> Optional[float]:
+    """有限值的中位数，没有有限值时返回 None（私有函数）"""
+    finite = [value for value in values if value is not None and value != float("inf")]
+    return statistics.median(finite) if finite else None
+
+class BotPolicy:
+    """由棋盘数据预先计算的机器人决策表"""
+
+    __slots__ = ("board", "buy_reserve", "upgrade_rank", "upgrade_reserve", "mortgage_rank")
+
+    def __init__(self, board: Board, buy_reserve: List[Optional[int]], upgrade_rank: List[int],
+                 upgrade_reserve: List[Optional[int]], mortgage_rank: List[int]):
+        self.board = board
+        # 地块ID -> 购买后至少保留的资金，非地产为 None
+        self.buy_reserve = buy_reserve
+        # 地块ID -> 升级优先级，升级收益越高数值越小
+        self.upgrade_rank = upgrade_rank
+        # 地块ID -> 升级后至少保留的资金，非地产为 None
+        self.upgrade_reserve = upgrade_reserve
+        # 地块ID -> 负债时的抵押优先级，数值越小越先抵押
+        self.mortgage_rank = mortgage_rank
+
+    def decide(self, state: RoomState) -> Optional[Tuple[str, Dict]]:
+        """机器人的下一步操作，返回 (玩家ID, 操作消息)，无需行动时返回 None"""
+        bot_id = acting_bot(state)
+        if bot_id is None:
+            return None
+        player = state.players[bot_id]
+        board = self.board
+
+        if state.player_in_debt_id == bot_id:
+            candidates = [tile_id for tile_id in player.tiles if not state.tile_mortgaged[tile_id]]
+            if not candidates:
+                return None
+            tile_id = min(candidates, key=self.mortgage_rank.__getitem__)
+            return bot_id, {"action": "mortgage_property", "property_id": tile_id}
+
+        if not state.has_rolled_dice:
+            return bot_id, {"action": "roll_dice"}
+
+        if state.can_buy_property:
+            reserve = self.buy_reserve[player.position]
+            if reserve is not None and player.money - board.prices[player.position] >= reserve:
+                return bot_id, {"action": "buy_property"}
+
+        candidates = [
+            tile_id for tile_id in player.tiles
+            if not state.tile_mortgaged[tile_id]
+            and state.tile_level[tile_id] < board.max_levels[tile_id]
+            and (board.tile_groups[tile_id] is None or state.owns_group(player, board.tile_groups[tile_id]))
+            and player.money - board.upgrade_costs[tile_id] >= self.upgrade_reserve[tile_id]
+        ]
+        if candidates:
+            tile_id = min(candidates, key=self.upgrade_rank.__getitem__)
+            return bot_id, {"action": "upgrade_property", "property_id": tile_id}
+
+        if state.turn_completed:
+            return bot_id, {"action": "end_turn"}
+        return None
+
+def _ranks(order: List[int], size: int) -> List[int]:
+    """把地块ID的排列转换为地块ID -> 名次的表（私有函数）"""
+    ranks = [size] * size
+    for rank, tile_id in enumerate(order):
+        ranks[tile_id] = rank
+    return ranks
+
+def build_policy(board: Board = DEFAULT_BOARD) -> BotPolicy:
+    """根据棋盘分析结果生成决策表（计算较重，应在线程池中调用）"""
+    summary = analyze(board)
+    properties = [entry for entry in summary["tiles"] if entry["type"] == "property"]
+
+    # 购买：按首级回本轮数缩放保留资金，租金为 0 的地产无法回本
+    median_payback = _median([entry["payback_rounds"][0] for entry in properties])
+    buy_reserve: List[Optional[int]] = [None] * board.size
+    for entry in properties:
+        buy_reserve[entry["id"]] = _scaled_reserve(BASE_BUY_RESERVE, entry["payback_rounds"][0], median_payback)
+
+    # 升级：每元升级费用带来的期望租金增量，免费且有收益的升级排在最前
+    upgrade_return = {}
+    for entry in properties:
+        rents = entry["expected_rent"]
+        gain = rents[1] - rents[0] if len(rents) > 1 else 0.0
+        cost = board.upgrade_costs[entry["id"]]
+        if cost > 0:
+            upgrade_return[entry["id"]] = gain / cost
+        else:
+            upgrade_return[entry["id"]] = float("inf") if gain > 0 else 0.0
+    upgrade_order = sorted(upgrade_return, key=lambda tile_id: (-upgrade_return[tile_id], tile_id))
+    median_return = _median(list(upgrade_return.values()))
+    upgrade_reserve: List[Optional[int]] = [None] * board.size
+    for tile_id, value in upgrade_return.items():
+        if value == float("inf"):
+            upgrade_reserve[tile_id] = MIN_RESERVE
+        elif value > 0:
+            upgrade_reserve[tile_id] = _scaled_reserve(BASE_UPGRADE_RESERVE, median_return, value)
+        else:
+            upgrade_reserve[tile_id] = MAX_RESERVE
+
+    # 抵押：每元抵押价值损失的期望租金最少的先抵押，抵押价值为 0 的地产最后抵押
+    def mortgage_key(tile_id: int) -> Tuple[float, int]:
+        value = board.mortgage_values[tile_id]
+        rent = summary["tiles"][tile_id]["expected_rent"][0]
+        return (rent / value if value > 0 else float("inf"), tile_id)
+
+    mortgage_order = sorted((entry["id"] for entry in properties), key=mortgage_key)
+
+    return BotPolicy(
+        board, buy_reserve, _ranks(upgrade_order, board.size), upgrade_reserve, _ranks(mortgage_order, board.size)
+    )
+
+async def load_policy(board: Board = DEFAULT_BOARD) -> BotPolicy:
+    """取得棋盘的决策表，首次使用时在线程池中计算，并发调用共享同一次计算"""
+    version = board.version
+    policy = _policies.get(version)
+    if policy is not None:
+        return policy
+
+    future = _pending.get(version)
+    if future is None:
+        future = _pending[version] = asyncio.ensure_future(asyncio.to_thread(build_policy, board))
+    try:
+        policy = await asyncio.shield(future)
+    finally:
+        if future.done():
+            _pending.pop(version, None)
+    _policies[version] = policy
+    return policy
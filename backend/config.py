@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+# 服务器配置，均可通过环境变量覆盖
+
+# 每个连接的待发送消息队列长度
+SEND_QUEUE_SIZE = int(os.environ.get("MONOPOLY_SEND_QUEUE_SIZE", "64"))
+
+# 慢速客户端处理策略：
+#   latest     - 丢弃积压的中间状态，只在队列空闲后补发一份最新快照
+#   disconnect - 直接断开发送队列已满的连接
+SLOW_CONSUMER_POLICY = os.environ.get("MONOPOLY_SLOW_CONSUMER_POLICY", "latest")
+
+# 每个房间待处理操作队列长度，队满时发送方等待
+ACTION_QUEUE_SIZE = int(os.environ.get("MONOPOLY_ACTION_QUEUE_SIZE", "256"))
+
+# 房间一次批量处理的最大操作数
+ACTION_BATCH_SIZE = int(os.environ.get("MONOPOLY_ACTION_BATCH_SIZE", "64"))
+
+# 房间状态广播的最小间隔（秒），间隔内的状态变化和通知合并为一条消息；为 0 时每批操作后立即广播
+BROADCAST_TICK = float(os.environ.get("MONOPOLY_BROADCAST_TICK", "0"))
+
+# 玩家断线后保留座位的时间（秒），期间凭重连令牌重连可继续游戏；为 0 时断线立即离开房间
+RECONNECT_GRACE = float(os.environ.get("MONOPOLY_RECONNECT_GRACE", "60"))
+
+# 每个房间保留的最近状态增量数，重连的客户端落后不超过该数量时只补发错过的增量，否则补发快照
+DELTA_HISTORY_SIZE = int(os.environ.get("MONOPOLY_DELTA_HISTORY_SIZE", "256"))
+
+# 观战者状态广播的间隔（秒），间隔内的状态变化合并为一条消息，所有观战者共享
+SPECTATOR_INTERVAL = float(os.environ.get("MONOPOLY_SPECTATOR_INTERVAL", "1.0"))
+
+# 机器人每一步操作之前的等待时间（秒）
+BOT_THINK_TIME = float(os.environ.get("MONOPOLY_BOT_THINK_TIME", "0.5"))
+
+# 棋盘定义目录，目录下每个 JSON 文件是一个棋盘，文件名即棋盘名，必须包含 default.json
+BOARDS_DIR = os.environ.get("MONOPOLY_BOARDS_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "boards"
+)
+
+# 多进程分片：当前进程负责的分片序号和分片总数（1 表示不分片）
+SHARD_INDEX = int(os.environ.get("MONOPOLY_SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.environ.get("MONOPOLY_SHARD_COUNT", "1"))
+
+# 各分片工作进程对客户端公开的地址（逗号分隔，按分片序号排列）
+SHARD_URLS = [url for url in os.environ.get("MONOPOLY_SHARD_URLS", "").split(",") if url]
+
+# 事件日志和快照的存放目录，为空时不启用持久化
+DATA_DIR = os.environ.get("MONOPOLY_DATA_DIR", "")
+
+# 写入全部房间快照的间隔（秒）
+SNAPSHOT_INTERVAL = float(os.environ.get("MONOPOLY_SNAPSHOT_INTERVAL", "60"))
+
+# 每批事件写入后是否 fsync 刷盘
+EVENT_FSYNC = os.environ.get("MONOPOLY_EVENT_FSYNC", "1") == "1"
+
+# 没有连接超过该时间（秒）的房间写入磁盘并移出内存
+ROOM_IDLE_TIMEOUT = float(os.environ.get("MONOPOLY_ROOM_IDLE_TIMEOUT", "300"))
+
+# 没有玩家或已结束的房间在没有连接超过该时间（秒）后直接删除
+ROOM_TTL = float(os.environ.get("MONOPOLY_ROOM_TTL", "120"))
+
+# 休眠房间文件的保留时间（秒）
+HIBERNATED_ROOM_TTL = float(os.environ.get("MONOPOLY_HIBERNATED_ROOM_TTL", str(7 * 24 * 3600)))
+
+# 内存中常驻房间数上限，超出时按最近使用顺序换出没有连接的房间
+MAX_RESIDENT_ROOMS = int(os.environ.get("MONOPOLY_MAX_RESIDENT_ROOMS", "10000"))
+
+# 检查空闲房间的间隔（秒）
+ROOM_SWEEP_INTERVAL = float(os.environ.get("MONOPOLY_ROOM_SWEEP_INTERVAL", "30"))
+
+# 休眠房间的存放目录，默认位于持久化目录或系统临时目录下
+HIBERNATE_DIR = os.environ.get("MONOPOLY_HIBERNATE_DIR") or os.path.join(
+    DATA_DIR or tempfile.gettempdir(), "monopoly-rooms"
+)
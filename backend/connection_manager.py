@@ -0,0 +1,211 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import WebSocket
+import metrics
+from wire import FORMAT_JSON, OutgoingMessage, encode
+
+# 慢速客户端处理策略
+POLICY_LATEST = "latest"
+POLICY_DISCONNECT = "disconnect"
+
+# 队列中的特殊标记：发送时现场生成最新快照
+_RESYNC = object()
+
+# 热点路径上使用的子指标
+_SEND_ERRORS = metrics.SEND_FAILURES.labels("error")
+_SLOW_CONSUMERS = metrics.SEND_FAILURES.labels("slow_consumer")
+
+class Connection:
+    """单个WebSocket连接及其发送队列"""
+
+    def __init__(self, websocket: WebSocket, room_id: str, player_id: str, queue_size: int,
+                 wire_format: str = FORMAT_JSON):
+        self.websocket = websocket
+        self.room_id = room_id
+        self.player_id = player_id
+        # 发送给该连接的消息使用的编码格式
+        self.wire_format = wire_format
+        # 队列元素为 (是否为可丢弃的状态消息, 消息内容)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # 是否已丢弃过状态消息并等待补发快照
+        self.resync_pending = False
+        self.writer_task: Optional[asyncio.Task] = None
+
+class ConnectionManager:
+    """WebSocket连接管理器
+
+    每个连接拥有独立的有界发送队列和写协程，广播只负责把编码结果放入各个队列，
+    不会等待任何一个客户端的网络发送。一条广播对每种编码格式只编码一次，
+    使用相同格式的连接共享同一份结果。
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 64,
+        slow_consumer_policy: str = POLICY_LATEST,
+        snapshot_provider: Optional[Callable[[str], Dict]] = None
+    ):
+        # 存储每个房间的连接列表
+        self.active_connections: Dict[str, List[WebSocket]] = {}
+        # 存储每个连接对应的连接对象
+        self.connection_info: Dict[WebSocket, Connection] = {}
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        # 根据房间ID生成最新完整状态消息，用于慢速客户端补发快照
+        self.snapshot_provider = snapshot_provider
+
+    async def connect(self, websocket: WebSocket, room_id: str, player_id: str, wire_format: str = FORMAT_JSON):
+        """接受WebSocket连接"""
+        await websocket.accept()
+
+        # 初始化房间连接列表
+        if room_id not in self.active_connections:
+            self.active_connections[room_id] = []
+
+        # 添加连接到房间
+        self.active_connections[room_id].append(websocket)
+
+        # 存储连接信息并启动写协程
+        connection = Connection(websocket, room_id, player_id, self.queue_size, wire_format)
+        connection.writer_task = asyncio.create_task(self._writer(connection))
+        self.connection_info[websocket] = connection
+
+    def disconnect(self, websocket: WebSocket):
+        """断开WebSocket连接"""
+        connection = self.connection_info.pop(websocket, None)
+        if connection is None:
+            return
+
+        room_id = connection.room_id
+
+        # 从房间连接列表中移除
+        if room_id in self.active_connections:
+            self.active_connections[room_id].remove(websocket)
+
+            # 如果房间没有连接了，清理房间
+            if not self.active_connections[room_id]:
+                del self.active_connections[room_id]
+
+        # 停止写协程（写协程自身出错时由它自己退出）
+        task = connection.writer_task
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def player_connected(self, room_id: str, player_id: str) -> bool:
+        """玩家在房间中是否还有其他连接（例如旧连接尚未断开时已经重连）"""
+        return any(
+            self.connection_info[websocket].player_id == player_id
+            for websocket in self.active_connections.get(room_id, [])
+        )
+
+    async def send_personal_message(self, message: Dict, websocket: WebSocket):
+        """按连接协商的格式编码并发送个人消息"""
+        connection = self.connection_info.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, encode(message, connection.wire_format), False)
+
+    async def broadcast_to_room(self, message: Dict, room_id: str, droppable: bool = False):
+        """向房间内所有连接广播消息
+
+        Args:
+            message: 待发送的消息，每种编码格式只编码一次
+            room_id: 房间ID
+            droppable: 是否为可被更新快照取代的状态消息
+        """
+        start = time.perf_counter()
+        outgoing = OutgoingMessage(message)
+        recipients = 0
+        # 遍历副本，入队过程中可能断开慢速连接
+        for websocket in list(self.active_connections.get(room_id, [])):
+            connection = self.connection_info.get(websocket)
+            if connection is not None:
+                self._enqueue(connection, outgoing.encoded(connection.wire_format), droppable)
+                recipients += 1
+
+        metrics.BROADCAST_FANOUT_DURATION.observe(time.perf_counter() - start)
+        metrics.BROADCAST_RECIPIENTS.inc(recipients)
+        message_type = "state" if droppable else "notice"
+        for wire_format, payload in outgoing.items():
+            metrics.BROADCAST_BYTES.labels(message_type, wire_format).observe(len(payload))
+
+    def _enqueue(self, connection: Connection, message, droppable: bool):
+        """把消息放入连接的发送队列，队列已满时执行慢速客户端策略（私有方法）"""
+        # 等待补发快照期间，新的状态消息已被快照覆盖
+        if droppable and connection.resync_pending:
+            return
+
+        try:
+            connection.queue.put_nowait((droppable, message))
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == POLICY_LATEST and self.snapshot_provider is not None:
+            if self._drop_pending_states(connection):
+                if not droppable:
+                    connection.queue.put_nowait((False, message))
+                return
+
+        self._drop_connection(connection)
+
+    def _drop_pending_states(self, connection: Connection) -> bool:
+        """丢弃队列中积压的状态消息，改为在末尾补发一份最新快照（私有方法）
+
+        Returns:
+            bool: 是否腾出了空间
+        """
+        pending: List[Tuple[bool, object]] = []
+        while not connection.queue.empty():
+            pending.append(connection.queue.get_nowait())
+
+        kept = [item for item in pending if not item[0]]
+        # 需要为快照标记和新消息各留一个位置
+        if len(kept) + 2 > connection.queue.maxsize:
+            for item in pending:
+                connection.queue.put_nowait(item)
+            return False
+
+        metrics.STATES_DROPPED.inc(len(pending) - len(kept))
+        for item in kept:
+            connection.queue.put_nowait(item)
+        connection.queue.put_nowait((True, _RESYNC))
+        connection.resync_pending = True
+        return True
+
+    def _drop_connection(self, connection: Connection):
+        """断开无法跟上发送速度的连接（私有方法）"""
+        websocket = connection.websocket
+        _SLOW_CONSUMERS.inc()
+        self.disconnect(websocket)
+        # 关闭后接收循环会收到断开事件并完成玩家清理
+        asyncio.create_task(self._close(websocket))
+
+    async def _close(self, websocket: WebSocket):
+        """关闭WebSocket连接，忽略已关闭的情况（私有方法）"""
+        try:
+            await websocket.close(code=1008)
+        except Exception:
+            pass
+
+    async def _writer(self, connection: Connection):
+        """按顺序发送连接队列中的消息（私有方法）"""
+        websocket = connection.websocket
+        try:
+            while True:
+                _, message = await connection.queue.get()
+                if message is _RESYNC:
+                    # 在发送前一刻生成快照，之后的增量都基于该版本
+                    connection.resync_pending = False
+                    message = encode(self.snapshot_provider(connection.room_id), connection.wire_format)
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+                metrics.MESSAGES_SENT.inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 发送失败，移除该连接
+            _SEND_ERRORS.inc()
+            self.disconnect(websocket)
@@ -0,0 +1,175 @@
+"""棋盘定义
+
+棋盘由 BOARDS_DIR 目录下的 JSON 文件定义（文件名即棋盘名），包括地块、颜色组、
+机会/命运卡片和规则参数（经过起点的奖励、出狱前等待的回合数和罚款）。
+启动时每个棋盘编译一次为 Board，游戏引擎只查按地块ID索引的数组：
+地块类型编码、各等级租金、最高等级、地块所属颜色组等，
+每次操作的开销与棋盘大小无关。
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import config
+
+# 默认棋盘名
+DEFAULT_BOARD_NAME = "default"
+
+# 地块类型编码（按 TILE_TYPES 中的顺序）
+TILE_TYPES = ("start", "property", "chance", "destiny", "jail", "go_to_jail", "tax", "free_parking")
+(
+    TILE_START,
+    TILE_PROPERTY,
+    TILE_CHANCE,
+    TILE_DESTINY,
+    TILE_JAIL,
+    TILE_GO_TO_JAIL,
+    TILE_TAX,
+    TILE_FREE_PARKING,
+) = range(len(TILE_TYPES))
+
+# 卡片效果类型
+CARD_TYPES = ("money_change", "move_to", "move_forward", "move_backward")
+
+# 规则参数的默认值
+DEFAULT_RULES = {
+    # 经过起点获得的奖励
+    "go_bonus": 2000,
+    # 在监狱中第几个回合强制出狱
+    "jail_turns": 3,
+    # 强制出狱时缴纳的罚款
+    "jail_fine": 500,
+}
+
+class Board:
+    """编译后的棋盘，运行期间只读，可由多个房间共享"""
+
+    __slots__ = (
+        "name",
+        "title",
+        "version",
+        "definition",
+        "tiles",
+        "size",
+        "tile_types",
+        "prices",
+        "rents",
+        "max_levels",
+        "upgrade_costs",
+        "mortgage_values",
+        "tax_amounts",
+        "tile_groups",
+        "property_groups",
+        "chance_cards",
+        "destiny_cards",
+        "jail_position",
+        "go_bonus",
+        "jail_turns",
+        "jail_fine",
+    )
+
+    def __init__(self, name: str, definition: Dict):
+        """编译棋盘定义，定义不合法时抛出 ValueError
+
+        Args:
+            name: 棋盘名
+            definition: 棋盘定义（JSON 文件的内容）
+        """
+        self.name = name
+        self.title = definition.get("title", name)
+        self.definition = definition
+        # 棋盘版本为完整定义的内容哈希，定义变化时客户端缓存和分析结果随之失效
+        canonical = json.dumps(definition, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+        rules = {**DEFAULT_RULES, **definition.get("rules", {})}
+        self.go_bonus = int(rules["go_bonus"])
+        self.jail_turns = int(rules["jail_turns"])
+        self.jail_fine = int(rules["jail_fine"])
+
+        self.tiles: List[Dict] = definition["tiles"]
+        self.size = len(self.tiles)
+        if self.size == 0:
+            raise ValueError(f"棋盘 {name} 没有地块")
+
+        self.tile_types = bytearray(self.size)
+        self.prices = [0] * self.size
+        self.rents: List[tuple] = [()] * self.size
+        self.max_levels = bytearray(self.size)
+        self.upgrade_costs = [0] * self.size
+        self.mortgage_values = [0] * self.size
+        self.tax_amounts = [0] * self.size
+        jail_positions = []
+        for index, tile in enumerate(self.tiles):
+            if tile.get("id") != index:
+                raise ValueError(f"棋盘 {name} 的第 {index} 个地块ID不一致")
+            if tile.get("type") not in TILE_TYPES:
+                raise ValueError(f"棋盘 {name} 的地块 {index} 类型未知：{tile.get('type')}")
+            code = TILE_TYPES.index(tile["type"])
+            self.tile_types[index] = code
+            if code == TILE_PROPERTY:
+                rent = tuple(tile["rent"])
+                # 地块等级存放在字节数组中
+                if not 1 <= len(rent) <= 256:
+                    raise ValueError(f"棋盘 {name} 的地产 {index} 租金等级数不合法")
+                self.prices[index] = tile["price"]
+                self.rents[index] = rent
+                self.max_levels[index] = len(rent) - 1
+                self.upgrade_costs[index] = tile["upgrade_cost"]
+                self.mortgage_values[index] = tile["mortgage_value"]
+            elif code == TILE_TAX:
+                self.tax_amounts[index] = tile["amount"]
+            elif code == TILE_JAIL:
+                jail_positions.append(index)
+
+        if TILE_GO_TO_JAIL in self.tile_types and len(jail_positions) != 1:
+            raise ValueError(f"棋盘 {name} 有前往监狱地块时必须恰好有一个监狱")
+        self.jail_position = jail_positions[0] if jail_positions else 0
+
+        # 颜色组，以及每个地块所属颜色组的反向索引
+        self.property_groups: Dict[str, List[int]] = definition.get("property_groups", {})
+        self.tile_groups: List[Optional[str]] = [None] * self.size
+        for group, members in self.property_groups.items():
+            for tile_id in members:
+                if not 0 <= tile_id < self.size or self.tile_types[tile_id] != TILE_PROPERTY:
+                    raise ValueError(f"棋盘 {name} 的颜色组 {group} 包含非地产地块 {tile_id}")
+                self.tile_groups[tile_id] = group
+
+        self.chance_cards: List[Dict] = definition.get("chance_cards", [])
+        self.destiny_cards: List[Dict] = definition.get("destiny_cards", [])
+        for code, cards in ((TILE_CHANCE, self.chance_cards), (TILE_DESTINY, self.destiny_cards)):
+            if code in self.tile_types and not cards:
+                raise ValueError(f"棋盘 {name} 有{TILE_TYPES[code]}地块但没有对应的卡片")
+            for card in cards:
+                if card["type"] not in CARD_TYPES:
+                    raise ValueError(f"棋盘 {name} 的卡片类型未知：{card['type']}")
+                if card["type"] == "move_to":
+                    if not 0 <= card["value"] < self.size:
+                        raise ValueError(f"棋盘 {name} 的卡片目标位置超出棋盘：{card['value']}")
+                    # 移动到机会或命运地块会再次抽卡，可能无限循环
+                    if self.tile_types[card["value"]] in (TILE_CHANCE, TILE_DESTINY):
+                        raise ValueError(f"棋盘 {name} 的卡片目标位置是抽卡地块：{card['value']}")
+                elif card["type"] in ("move_forward", "move_backward") and card["value"] <= 0:
+                    raise ValueError(f"棋盘 {name} 的卡片移动步数必须为正数：{card['value']}")
+
+def load_boards(directory: str) -> Dict[str, Board]:
+    """加载并编译目录下的全部棋盘定义"""
+    boards = {}
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension != ".json":
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as file:
+            boards[name] = Board(name, json.load(file))
+    if DEFAULT_BOARD_NAME not in boards:
+        raise ValueError(f"棋盘目录 {directory} 中没有 {DEFAULT_BOARD_NAME}.json")
+    return boards
+
+# 启动时编译的全部棋盘
+BOARDS = load_boards(config.BOARDS_DIR)
+DEFAULT_BOARD = BOARDS[DEFAULT_BOARD_NAME]
+
+def get_board(name: str) -> Board:
+    """按名称取得棋盘，不存在时抛出 KeyError"""
+    return BOARDS[name]
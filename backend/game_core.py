@@ -0,0 +1,232 @@
+from array import array
+from typing import Dict, List, Optional
+from models import GameState, LogEntry, Player, TileState
+
+# 玩家起始资金（与 Player 模型默认值一致）
+STARTING_MONEY = 15000
+
+# 地块无人拥有时的座位号
+NO_OWNER = -1
+
+class PlayerRecord:
+    """玩家运行时记录，只在序列化时转换为 Player 模型"""
+
+    __slots__ = (
+        "id",
+        "name",
+        "seat",
+        "money",
+        "position",
+        "is_in_jail",
+        "turns_in_jail",
+        "tiles",
+        "unmortgaged_count",
+        "group_counts"
+    )
+
+    def __init__(self, player_id: str, name: str, seat: int):
+        self.id = player_id
+        self.name = name
+        # 房间内的座位号，地块所有权以座位号记录
+        self.seat = seat
+        self.money = STARTING_MONEY
+        self.position = 0
+        self.is_in_jail = False
+        self.turns_in_jail = 0
+        # 所有权索引：拥有的地块、未抵押地块数量、各颜色组拥有的地块数量
+        self.tiles = set()
+        self.unmortgaged_count = 0
+        self.group_counts: Dict[str, int] = {}
+
+    def to_dict(self) -> Dict:
+        """转换为与 Player 模型字段一致的字典"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "money": self.money,
+            "position": self.position,
+            "is_in_jail": self.is_in_jail,
+            "turns_in_jail": self.turns_in_jail
+        }
+
+class RoomState:
+    """房间运行时状态
+
+    地块状态按地块ID存放在紧凑数组中，所有者记录为玩家座位号。
+    地块所有权和抵押状态只能通过本类的方法修改，以保持玩家所有权索引同步。
+    """
+
+    __slots__ = (
+        "room_id",
+        "players",
+        "seat_owners",
+        "next_seat",
+        "current_turn_player_id",
+        "game_phase",
+        "has_rolled_dice",
+        "can_buy_property",
+        "turn_completed",
+        "player_in_debt_id",
+        "tile_owner",
+        "tile_mortgaged",
+        "tile_level",
+        "tile_groups",
+        "group_sizes"
+    )
+
+    def __init__(self, room_id: str, tile_groups: List[Optional[str]]):
+        """
+        Args:
+            room_id: 房间ID
+            tile_groups: 每个地块所属的颜色组名，不属于任何颜色组时为 None
+        """
+        tile_count = len(tile_groups)
+        self.room_id = room_id
+        # 玩家ID到玩家记录的映射，保持加入顺序
+        self.players: Dict[str, PlayerRecord] = {}
+        # 座位号到玩家ID的映射
+        self.seat_owners: Dict[int, str] = {}
+        self.next_seat = 0
+        self.current_turn_player_id = ""
+        self.game_phase = "waiting"
+        self.has_rolled_dice = False
+        self.can_buy_property = False
+        self.turn_completed = False
+        self.player_in_debt_id = ""
+        self.tile_owner = array("i", [NO_OWNER] * tile_count)
+        self.tile_mortgaged = bytearray(tile_count)
+        self.tile_level = bytearray(tile_count)
+        self.tile_groups = tile_groups
+        self.group_sizes: Dict[str, int] = {}
+        for group in tile_groups:
+            if group is not None:
+                self.group_sizes[group] = self.group_sizes.get(group, 0) + 1
+
+    def add_player(self, player_id: str, name: str) -> PlayerRecord:
+        """创建玩家记录并分配座位号"""
+        player = PlayerRecord(player_id, name, self.next_seat)
+        self.players[player_id] = player
+        self.seat_owners[self.next_seat] = player_id
+        self.next_seat += 1
+        return player
+
+    def remove_player(self, player_id: str) -> PlayerRecord:
+        """删除玩家记录并释放座位号"""
+        player = self.players.pop(player_id)
+        del self.seat_owners[player.seat]
+        return player
+
+    def acquire_tile(self, tile_id: int, player: PlayerRecord):
+        """把无主地块的所有权交给玩家"""
+        self.tile_owner[tile_id] = player.seat
+        player.tiles.add(tile_id)
+        if not self.tile_mortgaged[tile_id]:
+            player.unmortgaged_count += 1
+        group = self.tile_groups[tile_id]
+        if group is not None:
+            player.group_counts[group] = player.group_counts.get(group, 0) + 1
+
+    def set_mortgaged(self, tile_id: int, player: PlayerRecord, mortgaged: bool):
+        """修改玩家所拥有地块的抵押状态"""
+        if bool(self.tile_mortgaged[tile_id]) == mortgaged:
+            return
+        self.tile_mortgaged[tile_id] = 1 if mortgaged else 0
+        player.unmortgaged_count += -1 if mortgaged else 1
+
+    def release_tiles(self, player: PlayerRecord) -> List[int]:
+        """清空玩家拥有的全部地块，返回被清空的地块ID"""
+        released = sorted(player.tiles)
+        for tile_id in released:
+            self.tile_owner[tile_id] = NO_OWNER
+            self.tile_mortgaged[tile_id] = 0
+            self.tile_level[tile_id] = 0
+        player.tiles.clear()
+        player.unmortgaged_count = 0
+        player.group_counts.clear()
+        return released
+
+    def owns_group(self, player: PlayerRecord, group: str) -> bool:
+        """玩家是否拥有该颜色组的全部地产"""
+        return player.group_counts.get(group, 0) == self.group_sizes[group]
+
+    def to_snapshot(self) -> Dict:
+        """导出紧凑的状态快照（可直接 JSON 序列化）"""
+        return {
+            "players": [
+                [player.id, player.name, player.seat, player.money, player.position,
+                 player.is_in_jail, player.turns_in_jail]
+                for player in self.players.values()
+            ],
+            "next_seat": self.next_seat,
+            "scalars": [
+                self.current_turn_player_id,
+                self.game_phase,
+                self.has_rolled_dice,
+                self.can_buy_property,
+                self.turn_completed,
+                self.player_in_debt_id
+            ],
+            "tile_owner": self.tile_owner.tolist(),
+            "tile_mortgaged": list(self.tile_mortgaged),
+            "tile_level": list(self.tile_level)
+        }
+
+    def restore(self, snapshot: Dict):
+        """从状态快照恢复，并重建所有权索引"""
+        self.players.clear()
+        self.seat_owners.clear()
+        for player_id, name, seat, money, position, is_in_jail, turns_in_jail in snapshot["players"]:
+            player = PlayerRecord(player_id, name, seat)
+            player.money = money
+            player.position = position
+            player.is_in_jail = is_in_jail
+            player.turns_in_jail = turns_in_jail
+            self.players[player_id] = player
+            self.seat_owners[seat] = player_id
+        self.next_seat = snapshot["next_seat"]
+        (
+            self.current_turn_player_id,
+            self.game_phase,
+            self.has_rolled_dice,
+            self.can_buy_property,
+            self.turn_completed,
+            self.player_in_debt_id
+        ) = snapshot["scalars"]
+
+        tile_count = len(self.tile_owner)
+        self.tile_owner = array("i", [NO_OWNER] * tile_count)
+        self.tile_mortgaged = bytearray(snapshot["tile_mortgaged"])
+        self.tile_level = bytearray(snapshot["tile_level"])
+        for tile_id, seat in enumerate(snapshot["tile_owner"]):
+            if seat != NO_OWNER:
+                self.acquire_tile(tile_id, self.players[self.seat_owners[seat]])
+
+    def owner_id(self, tile_id: int) -> str:
+        """地块所有者的玩家ID，空字符串表示无人拥有"""
+        seat = self.tile_owner[tile_id]
+        if seat == NO_OWNER:
+            return ""
+        return self.seat_owners.get(seat, "")
+
+    def tile_dict(self, tile_id: int) -> Dict:
+        """转换为与 TileState 模型字段一致的字典"""
+        return {
+            "owner_id": self.owner_id(tile_id),
+            "mortgaged": bool(self.tile_mortgaged[tile_id]),
+            "level": self.tile_level[tile_id]
+        }
+
+    def to_game_state(self, game_log: List[Dict]) -> GameState:
+        """生成发送给客户端的 GameState 模型"""
+        return GameState(
+            room_id=self.room_id,
+            players={player_id: Player(**player.to_dict()) for player_id, player in self.players.items()},
+            current_turn_player_id=self.current_turn_player_id,
+            game_phase=self.game_phase,
+            game_log=[LogEntry(**entry) for entry in game_log],
+            has_rolled_dice=self.has_rolled_dice,
+            can_buy_property=self.can_buy_property,
+            turn_completed=self.turn_completed,
+            player_in_debt_id=self.player_in_debt_id,
+            tile_states={str(i): TileState(**self.tile_dict(i)) for i in range(len(self.tile_owner))}
+        )
@@ -0,0 +1,99 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# 每个房间保留的历史日志条数上限
+LOG_CAPACITY = 500
+# 实时游戏状态中携带的最近日志条数
+LIVE_LOG_SIZE = 50
+# 分页查询单页条数上限
+MAX_PAGE_SIZE = 100
+
+class GameLog:
+    """定长环形游戏日志，每条日志带有单调递增的序号
+
+    查询结果为与 LogEntry 模型字段一致的字典。
+    """
+
+    def __init__(self, capacity: int = LOG_CAPACITY):
+        # 以 (序号, 文本) 元组存储，超出容量时自动丢弃最旧的条目
+        self._entries = deque(maxlen=capacity)
+        # 下一条日志的序号
+        self.next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, text: str) -> int:
+        """追加一条日志，返回其序号"""
+        seq = self.next_seq
+        self._entries.append((seq, text))
+        self.next_seq += 1
+        return seq
+
+    def to_snapshot(self) -> Dict:
+        """导出日志快照"""
+        return {
+            "next_seq": self.next_seq,
+            "entries": [text for _, text in self._entries]
+        }
+
+    def restore(self, snapshot: Dict):
+        """从日志快照恢复"""
+        self._entries.clear()
+        self.next_seq = snapshot["next_seq"]
+        first_seq = self.next_seq - len(snapshot["entries"])
+        for offset, text in enumerate(snapshot["entries"]):
+            self._entries.append((first_seq + offset, text))
+
+    def truncate(self, seq: int):
+        """丢弃序号不小于 seq 的日志，用于撤销尚未提交的操作
+
+        撤销期间因容量限制被挤出的最旧条目不会恢复。
+        """
+        while self._entries and self._entries[-1][0] >= seq:
+            self._entries.pop()
+        self.next_seq = seq
+
+    @property
+    def first_seq(self) -> int:
+        """仍保留在内存中的最旧日志序号"""
+        if not self._entries:
+            return self.next_seq
+        return self._entries[0][0]
+
+    def _slice(self, start_seq: int, end_seq: int) -> List[Dict]:
+        """按序号区间 [start_seq, end_seq) 取出日志（私有方法）"""
+        start_seq = max(start_seq, self.first_seq)
+        end_seq = min(end_seq, self.next_seq)
+        offset = start_seq - self.first_seq
+        return [
+            {"seq": seq, "text": text}
+            for seq, text in (self._entries[i] for i in range(offset, offset + end_seq - start_seq))
+        ]
+
+    def recent(self, count: int = LIVE_LOG_SIZE) -> List[Dict]:
+        """获取最近的若干条日志"""
+        return self._slice(self.next_seq - count, self.next_seq)
+
+    def since(self, seq: int) -> List[Dict]:
+        """获取序号不小于 seq 的全部日志"""
+        return self._slice(seq, self.next_seq)
+
+    def page(self, before: Optional[int] = None, limit: int = LIVE_LOG_SIZE) -> Tuple[List[Dict], Optional[int]]:
+        """按游标向前分页查询历史日志
+
+        Args:
+            before: 只返回序号小于该值的日志，为空时从最新日志开始
+            limit: 单页条数
+
+        Returns:
+            (日志列表, 下一页游标)，没有更早的日志时游标为 None
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        end_seq = self.next_seq if before is None else min(before, self.next_seq)
+        entries = self._slice(end_seq - limit, end_seq)
+
+        next_cursor = None
+        if entries and entries[0]["seq"] > self.first_seq:
+            next_cursor = entries[0]["seq"]
+        return entries, next_cursor
@@ -1,153 +1,208 @@
 import random
-from models import Player, GameState, TileState
-from typing import Dict, List
+from collections import deque
+from models import GameState
+from game_log import GameLog
+from game_core import RoomState, NO_OWNER
+from game_board import (
+    DEFAULT_BOARD, DEFAULT_BOARD_NAME, TILE_CHANCE, TILE_DESTINY, TILE_GO_TO_JAIL, TILE_JAIL,
+    TILE_PROPERTY, TILE_TAX, Board, get_board
+)
+from typing import Dict, List, Optional
 
-# 游戏地图常量 - 20个地块的5x4布局
-GAME_MAP = [
-    {"id": 0, "name": "起点", "type": "start"},
-    {"id": 1, "name": "高旺路", "type": "property", "price": 1000, "rent": [100, 300, 700], "mortgage_value": 500, "upgrade_cost": 500},
-    {"id": 2, "name": "竹湾路", "type": "property", "price": 1200, "rent": [120, 360, 840], "mortgage_value": 600, "upgrade_cost": 600},
-    {"id": 3, "name": "机会", "type": "chance"},
-    {"id": 4, "name": "红岭路", "type": "property", "price": 1500, "rent": [150, 450, 1050], "mortgage_value": 750, "upgrade_cost": 750},
-    {"id": 5, "name": "监狱", "type": "jail"},
-    {"id": 6, "name": "龙山路", "type": "property", "price": 1800, "rent": [180, 540, 1260], "mortgage_value": 900, "upgrade_cost": 900},
-    {"id": 7, "name": "三龙大道", "type": "property", "price": 2000, "rent": [200, 600, 1400], "mortgage_value": 1000, "upgrade_cost": 1000},
-    {"id": 8, "name": "命运", "type": "destiny"},
-    {"id": 9, "name": "工厂路", "type": "property", "price": 2200, "rent": [220, 660, 1540], "mortgage_value": 1100, "upgrade_cost": 1100},
-    {"id": 10, "name": "免费停车", "type": "free_parking"},
-    {"id": 11, "name": "富民路", "type": "property", "price": 2500, "rent": [250, 750, 1750], "mortgage_value": 1250, "upgrade_cost": 1250},
-    {"id": 12, "name": "大学路", "type": "property", "price": 2800, "rent": [280, 840, 1960], "mortgage_value": 1400, "upgrade_cost": 1400},
-    {"id": 13, "name": "税收", "type": "tax"},
-    {"id": 14, "name": "西江路", "type": "property", "price": 3000, "rent": [300, 900, 2100], "mortgage_value": 1500, "upgrade_cost": 1500},
-    {"id": 15, "name": "前往监狱", "type": "go_to_jail"},
-    {"id": 16, "name": "文澜路", "type": "property", "price": 3200, "rent": [320, 960, 2240], "mortgage_value": 1600, "upgrade_cost": 1600},
-    {"id": 17, "name": "西堤路", "type": "property", "price": 3500, "rent": [350, 1050, 2450], "mortgage_value": 1750, "upgrade_cost": 1750},
-    {"id": 18, "name": "机会", "type": "chance"},
-    {"id": 19, "name": "新兴路", "type": "property", "price": 4000, "rent": [400, 1200, 2800], "mortgage_value": 2000, "upgrade_cost": 2000}
-]
+# 默认棋盘的定义，供只使用默认棋盘的工具（模拟、基准测试、压力测试）引用
+GAME_MAP = DEFAULT_BOARD.tiles
+PROPERTY_GROUPS = DEFAULT_BOARD.property_groups
+CHANCE_CARDS = DEFAULT_BOARD.chance_cards
+DESTINY_CARDS = DEFAULT_BOARD.destiny_cards
 
-# 地产颜色组常量 - 定义同一颜色组的地产ID
-PROPERTY_GROUPS = {
-    'group1': [1, 2, 4],
-    'group2': [6, 7, 9],
-    'group3': [11, 12, 14],
-    'group4': [16, 17, 19]
-}
+# 每个地块所属的颜色组，不属于任何颜色组时为 None
+TILE_GROUPS = DEFAULT_BOARD.tile_groups
 
-# 机会卡片常量 - 偏向奖励
-CHANCE_CARDS = [
-    {'type': 'money_change', 'value': 1000, 'text': '银行分红，获得1000元'},
-    {'type': 'money_change', 'value': 800, 'text': '股票投资收益，获得800元'},
-    {'type': 'money_change', 'value': 1500, 'text': '彩票中奖，获得1500元'},
-    {'type': 'move_to', 'value': 0, 'text': '前进到起点，获得起点奖励'},
-    {'type': 'money_change', 'value': 500, 'text': '工作奖金，获得500元'},
-    {'type': 'move_forward', 'value': 3, 'text': '搭乘快车，前进3格'},
-    {'type': 'money_change', 'value': 1200, 'text': '房租收入，获得1200元'}
-]
+# 每个房间的默认玩家数上限（与前端的棋子数量一致）
+MAX_PLAYERS = 4
 
-# 命运卡片常量 - 偏向惩罚
-DESTINY_CARDS = [
-    {'type': 'money_change', 'value': -500, 'text': '缴纳个人所得税500元'},
-    {'type': 'money_change', 'value': -800, 'text': '汽车维修费，支付800元'},
-    {'type': 'money_change', 'value': -300, 'text': '医疗费用，支付300元'},
-    {'type': 'money_change', 'value': -1000, 'text': '房屋维修费，支付1000元'},
-    {'type': 'move_backward', 'value': 2, 'text': '交通堵塞，后退2格'},
-    {'type': 'money_change', 'value': -600, 'text': '信用卡年费，支付600元'},
-    {'type': 'money_change', 'value': -400, 'text': '水电费账单，支付400元'}
-]
+# 导致玩家资金为负的原因，破产时记录在 GameManager.bankruptcies 中
+DEBT_RENT = "rent"
+DEBT_TAX = "tax"
+DEBT_CARD = "card"
+DEBT_JAIL_FINE = "jail_fine"
+
+# 增量消息中携带的标量字段
+SCALAR_STATE_FIELDS = (
+    "current_turn_player_id",
+    "game_phase",
+    "has_rolled_dice",
+    "can_buy_property",
+    "turn_completed",
+    "player_in_debt_id",
+)
+
+def merge_deltas(deltas: List[Dict]) -> Dict:
+    """把版本连续的多个状态增量合并为一个
+    
+    增量中的玩家、地块和标量都是覆盖式的，合并后取最新值；
+    先移除后重新加入的玩家同时出现在移除列表和玩家数据中，客户端先移除再合并即可。
+    """
+    if len(deltas) == 1:
+        return deltas[0]
+    
+    merged = {
+        "base_version": deltas[0]["base_version"],
+        "version": deltas[-1]["version"],
+        "removed_players": [],
+        "players": {},
+        "tile_states": {},
+        "game_log": []
+    }
+    removed = set()
+    for delta in deltas:
+        for player_id in delta["removed_players"]:
+            merged["players"].pop(player_id, None)
+            removed.add(player_id)
+        merged["players"].update(delta["players"])
+        merged["tile_states"].update(delta["tile_states"])
+        merged["game_log"].extend(delta["game_log"])
+        for field in SCALAR_STATE_FIELDS:
+            if field in delta:
+                merged[field] = delta[field]
+    merged["removed_players"] = sorted(removed)
+    return merged
 
 class GameManager:
     """游戏管理器类"""
     
-    def __init__(self, room_id: str):
-        """初始化游戏管理器"""
-        self.game_state = GameState(
-            room_id=room_id,
-            players={},
-            current_turn_player_id="",
-            game_phase="waiting",
-            game_log=[]
-        )
-        
-        # 初始化地块状态字典
-        for i, tile in enumerate(GAME_MAP):
-            self.game_state.tile_states[str(i)] = TileState()
+    def __init__(self, room_id: str, seed: Optional[int] = None, max_players: int = MAX_PLAYERS,
+                 board: Board = DEFAULT_BOARD):
+        """初始化游戏管理器
+        
+        Args:
+            room_id: 房间ID
+            seed: 本房间随机数生成器的种子，为空时使用系统熵源
+            max_players: 玩家数上限
+            board: 本房间使用的棋盘
+        """
+        self.max_players = max_players
+        self.board = board
+        
+        # 紧凑的运行时状态，只在序列化时转换为 GameState 模型
+        self.state = RoomState(room_id, board.tile_groups)
+        
+        # 定长环形日志，实时状态只携带最近的条目
+        self.log = GameLog()
+        
+        # 状态版本号，每次提交增量时单调递增
+        self.version = 0
+        # 自上次提交以来发生变化的玩家、被移除的玩家和地块
+        self._dirty_players = set()
+        self._removed_players = set()
+        self._dirty_tiles = set()
+        # 尚未提交的第一条日志的序号
+        self._log_mark = 0
+        # 上次提交时的标量字段值
+        self._committed_scalars = self._scalar_values()
+        
+        # 房间独立的随机数生成器，相同种子和操作序列得到相同对局
+        self.seed = seed
+        self.rng = random.Random(seed)
+        
+        # 本次操作产生的随机结果，用于事件日志的确定性重放
+        self.rng_outcomes: List[int] = []
+        # 重放时预先给定的随机结果
+        self._replay_outcomes = deque()
+        
+        # 玩家ID -> 重连令牌的 SHA-256 摘要，随快照持久化，重启后仍能校验重连
+        self.resume_tokens: Dict[str, str] = {}
+        
+        # 当前债务的起因，以及本局的破产记录（仅用于统计，不持久化）
+        self.debt_cause = ""
+        self.bankruptcies: List[Dict] = []
     
     def add_player(self, player_id: str, player_name: str) -> bool:
-        """添加玩家到游戏"""
-        if player_id in self.game_state.players:
-            self.game_state.game_log.append(f"玩家 {player_name} 已经在游戏中")
+        """添加玩家到游戏，失败时不修改任何状态（包括日志）"""
+        if player_id in self.state.players or len(self.state.players) >= self.max_players:
             return False
         
         # 创建新玩家
-        new_player = Player(id=player_id, name=player_name)
-        self.game_state.players[player_id] = new_player
+        self.state.add_player(player_id, player_name)
+        self._mark_player(player_id)
         
         # 如果是第一个玩家，设置为当前回合玩家
-        if len(self.game_state.players) == 1:
-            self.game_state.current_turn_player_id = player_id
-            self.game_state.game_phase = "playing"
+        if len(self.state.players) == 1:
+            self.state.current_turn_player_id = player_id
+            self.state.game_phase = "playing"
         
-        self.game_state.game_log.append(f"玩家 {player_name} 加入了游戏")
+        self._log(f"玩家 {player_name} 加入了游戏")
         return True
     
     def roll_dice_and_move(self, player_id: str) -> Dict:
         """掷骰子并移动玩家，自动处理所有地块事件"""
         # 检查是否有玩家处于债务状态
-        if self.game_state.player_in_debt_id:
+        if self.state.player_in_debt_id:
             return {"success": False, "message": "你必须先处理你的债务！"}
         
-        if player_id != self.game_state.current_turn_player_id:
+        if player_id != self.state.current_turn_player_id:
             return {"success": False, "message": "不是你的回合"}
         
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return {"success": False, "message": "玩家不存在"}
         
-        if self.game_state.has_rolled_dice:
+        if self.state.has_rolled_dice:
             return {"success": False, "message": "本回合已经掷过骰子了"}
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         
         # 处理监狱逻辑
         if player.is_in_jail:
             player.turns_in_jail += 1
-            self.game_state.game_log.append(f"{player.name} 在监狱中度过第 {player.turns_in_jail} 个回合")
+            self._mark_player(player_id)
+            self._log(f"{player.name} 在监狱中度过第 {player.turns_in_jail} 个回合")
             
-            if player.turns_in_jail >= 3:
+            if player.turns_in_jail >= self.board.jail_turns:
                 # 强制释放并扣除罚款
-                fine = 500
+                fine = self.board.jail_fine
                 player.money -= fine
                 player.is_in_jail = False
                 player.turns_in_jail = 0
-                self.game_state.game_log.append(f"{player.name} 被强制释放出狱，支付罚款 {fine} 元")
+                self._mark_player(player_id)
+                self._log(f"{player.name} 被强制释放出狱，支付罚款 {fine} 元")
                 # 检查债务状态
-                self._handle_debt(player_id)
+                self._handle_debt(player_id, DEBT_JAIL_FINE)
+                
+                # 无力支付罚款而破产，不再掷骰子
+                if player_id not in self.state.players:
+                    return {
+                        "success": True,
+                        "message": f"{player.name} 无力支付罚款，破产出局",
+                        "dice_roll": 0,
+                        "new_position": player.position,
+                        "tile_id": player.position
+                    }
             else:
                 # 标记已掷骰子但不移动
-                self.game_state.has_rolled_dice = True
+                self.state.has_rolled_dice = True
                 self._check_turn_completion()
                 return {
                     "success": True,
-                    "message": f"在监狱中，无法移动。还需要 {3 - player.turns_in_jail} 个回合才能出狱",
+                    "message": f"在监狱中，无法移动。还需要 {self.board.jail_turns - player.turns_in_jail} 个回合才能出狱",
                     "dice_roll": 0,
                     "new_position": player.position,
-                    "tile": GAME_MAP[player.position]
+                    "tile_id": player.position
                 }
         
         # 掷骰子（1-6）
-        dice_roll = random.randint(1, 6)
-        player = self.game_state.players[player_id]
+        dice_roll = self._random_outcome(lambda: self.rng.randint(1, 6))
+        player = self.state.players[player_id]
         
         # 使用统一的移动方法
         self._move_player(player_id, dice_roll)
         
-        current_tile = GAME_MAP[player.position]
-        self.game_state.game_log.append(
+        current_tile = self.board.tiles[player.position]
+        self._log(
             f"{player.name} 掷出了 {dice_roll} 点，移动到 {current_tile['name']}"
         )
         
         # 标记已掷骰子
-        self.game_state.has_rolled_dice = True
+        self.state.has_rolled_dice = True
         
         # 自动处理落地事件（如付租金）
         self._handle_landing(player_id)
@@ -162,42 +217,45 @@ class GameManager:
             "success": True, 
             "dice_roll": dice_roll, 
             "new_position": player.position,
-            "tile": current_tile
+            "tile_id": current_tile["id"]
         }
     
     def buy_property(self, player_id: str) -> Dict:
         """购买地产"""
         # 检查是否有玩家处于债务状态
-        if self.game_state.player_in_debt_id:
+        if self.state.player_in_debt_id:
             return {"success": False, "message": "你必须先处理你的债务！"}
         
-        if player_id != self.game_state.current_turn_player_id:
+        if player_id != self.state.current_turn_player_id:
             return {"success": False, "message": "不是你的回合"}
         
-        if not self.game_state.can_buy_property:
+        if not self.state.can_buy_property:
             return {"success": False, "message": "当前无法购买地产"}
         
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return {"success": False, "message": "玩家不存在"}
         
-        player = self.game_state.players[player_id]
-        current_tile = GAME_MAP[player.position]
+        player = self.state.players[player_id]
+        current_tile = self.board.tiles[player.position]
+        price = self.board.prices[player.position]
         
         # 检查玩家资金是否足够
-        if player.money < current_tile["price"]:
+        if player.money < price:
             return {"success": False, "message": "资金不足"}
         
         # 购买地产
-        player.money -= current_tile["price"]
+        player.money -= price
         
-        # 在tile_states中记录所有权
-        self.game_state.tile_states[str(player.position)].owner_id = player_id
+        # 记录地块所有权
+        self.state.acquire_tile(player.position, player)
+        self._mark_player(player_id)
+        self._mark_tile(player.position)
         
         # 购买后不能再购买
-        self.game_state.can_buy_property = False
+        self.state.can_buy_property = False
         
-        self.game_state.game_log.append(
-            f"{player.name} 购买了 {current_tile['name']}，花费 {current_tile['price']} 元"
+        self._log(
+            f"{player.name} 购买了 {current_tile['name']}，花费 {price} 元"
         )
         
         # 检查回合是否完成
@@ -206,148 +264,156 @@ class GameManager:
         return {
             "success": True,
             "message": f"成功购买 {current_tile['name']}",
-            "property": current_tile
+            "property_id": current_tile["id"]
         }
     
     def end_turn(self) -> Dict:
         """结束当前玩家回合"""
         # 检查是否有玩家处于债务状态
-        if self.game_state.player_in_debt_id:
+        if self.state.player_in_debt_id:
             return {"success": False, "message": "你必须先处理你的债务！"}
         
-        if not self.game_state.turn_completed:
+        if not self.state.turn_completed:
             return {"success": False, "message": "回合尚未完成，无法结束回合"}
         
-        player_ids = list(self.game_state.players.keys())
+        player_ids = list(self.state.players.keys())
         if not player_ids:
             return {"success": False, "message": "没有玩家"}
         
-        current_index = player_ids.index(self.game_state.current_turn_player_id)
+        current_index = player_ids.index(self.state.current_turn_player_id)
         next_index = (current_index + 1) % len(player_ids)
-        self.game_state.current_turn_player_id = player_ids[next_index]
+        self.state.current_turn_player_id = player_ids[next_index]
         
         # 重置回合状态
-        self.game_state.has_rolled_dice = False
-        self.game_state.can_buy_property = False
-        self.game_state.turn_completed = False
+        self.state.has_rolled_dice = False
+        self.state.can_buy_property = False
+        self.state.turn_completed = False
         
-        current_player_name = self.game_state.players[self.game_state.current_turn_player_id].name
-        self.game_state.game_log.append(f"轮到 {current_player_name} 的回合")
+        current_player_name = self.state.players[self.state.current_turn_player_id].name
+        self._log(f"轮到 {current_player_name} 的回合")
         
         return {"success": True, "message": "回合已结束"}
     
     def _move_player(self, player_id: str, steps: int):
         """移动玩家并处理起点奖励（私有方法）"""
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         old_position = player.position
         
         # 计算新位置
-        new_position = (old_position + steps) % len(GAME_MAP)
+        new_position = (old_position + steps) % self.board.size
         
         # 更新玩家位置
         player.position = new_position
+        self._mark_player(player_id)
         
         # 检查是否经过起点（只有前进时才给奖励）
         if steps > 0 and new_position < old_position:
-            player.money += 2000
-            self.game_state.game_log.append(f"{player.name} 经过起点，获得2000元")
+            player.money += self.board.go_bonus
+            self._log(f"{player.name} 经过起点，获得{self.board.go_bonus}元")
     
     def _handle_landing(self, player_id: str):
-        """处理玩家落地事件（私有方法）"""
-        if player_id not in self.game_state.players:
+        """处理玩家落地事件（私有方法）
+        
+        按地块类型编码查表分派，卡片移动了玩家时继续处理新位置的地块。
+        """
+        player = self.state.players.get(player_id)
+        if player is None:
             return
         
-        processing = True
-        while processing:
-            processing = False  # 假设本轮循环后结束
-            player = self.game_state.players[player_id]
-            current_tile = GAME_MAP[player.position]
-            
-            # 处理机会卡
-            if current_tile["type"] == "chance":
-                card = random.choice(CHANCE_CARDS)
-                moved = self._apply_card_effect(player_id, card)
-                # 如果卡片效果导致了位置移动，设置标志，让 while 循环再执行一次
-                if moved:
-                    processing = True
-                continue
-            
-            # 处理命运卡
-            if current_tile["type"] == "destiny":
-                card = random.choice(DESTINY_CARDS)
-                moved = self._apply_card_effect(player_id, card)
-                # 如果卡片效果导致了位置移动，设置标志，让 while 循环再执行一次
-                if moved:
-                    processing = True
-                continue
-            
-            # 处理监狱地块（安全探监）
-            if current_tile["type"] == "jail":
-                self.game_state.game_log.append(f"{player.name} 路过了监狱")
-                continue
-            
-            # 处理前往监狱地块
-            elif current_tile["type"] == "go_to_jail":
-                player.position = 5  # 这是新地图上监狱的ID
-                player.is_in_jail = True
-                player.turns_in_jail = 0
-                self.game_state.game_log.append(f"{player.name} 被送进了监狱！")
-                # 因为这里是传送，所以直接 continue 跳出 while 循环的当前迭代
-                continue
-
-            # 处理税收地块
-            if current_tile["type"] == "tax":
-                tax_amount = 2000  # 固定税收金额2000元
-                player.money -= tax_amount
-                self.game_state.game_log.append(f"{player.name} 缴纳了 {tax_amount} 元税收")
-                # 检查债务状态
-                self._handle_debt(player_id)
-                continue
-
-            # 只处理地产类型的地块
-            if current_tile["type"] != "property":
-                continue
-            
-            # 从tile_states中获取地产所有者
-            tile_state = self.game_state.tile_states[str(player.position)]
-            property_owner = None
-            
-            if tile_state.owner_id and tile_state.owner_id != player_id:
-                property_owner = self.game_state.players.get(tile_state.owner_id)
-            
-            # 如果地产有所有者且不是当前玩家
-            if property_owner:
-                # 检查地产是否被抵押
-                if tile_state.mortgaged:
-                    self.game_state.game_log.append(
-                        f"{current_tile['name']} 已被抵押，无需支付租金"
-                    )
-                    continue
-                
-                # 根据地产等级计算租金
-                rent_list = current_tile.get("rent", [0])
-                if isinstance(rent_list, list):
-                    # 确保等级不超出租金列表范围
-                    level = min(tile_state.level, len(rent_list) - 1)
-                    rent = rent_list[level]
-                else:
-                    # 兼容旧的单一租金格式
-                    rent = rent_list
-                
-                # 强制扣除租金，即使资金不足
-                player.money -= rent
-                property_owner.money += rent
-                
-                level_text = f"（等级{tile_state.level}）" if tile_state.level > 0 else ""
-                self.game_state.game_log.append(
-                    f"{player.name} 向 {property_owner.name} 支付了 {rent} 元租金（{current_tile['name']}{level_text}）"
-                )
-                
-                # 检查债务状态
-                self._handle_debt(player_id)
+        tile_types = self.board.tile_types
+        handlers = self._LANDING_HANDLERS
+        while player_id in self.state.players:
+            handler = handlers.get(tile_types[player.position])
+            if handler is None or not handler(self, player_id, player):
+                break
+    
+    def _land_on_chance(self, player_id: str, player) -> bool:
+        """落在机会地块：抽一张机会卡（私有方法）"""
+        cards = self.board.chance_cards
+        card = cards[self._random_outcome(lambda: self.rng.randrange(len(cards)))]
+        return self._apply_card_effect(player_id, card)
+    
+    def _land_on_destiny(self, player_id: str, player) -> bool:
+        """落在命运地块：抽一张命运卡（私有方法）"""
+        cards = self.board.destiny_cards
+        card = cards[self._random_outcome(lambda: self.rng.randrange(len(cards)))]
+        return self._apply_card_effect(player_id, card)
+    
+    def _land_on_jail(self, player_id: str, player) -> bool:
+        """落在监狱地块：安全探监（私有方法）"""
+        self._log(f"{player.name} 路过了监狱")
+        return False
+    
+    def _land_on_go_to_jail(self, player_id: str, player) -> bool:
+        """落在前往监狱地块：直接传送到监狱，不经过起点（私有方法）"""
+        player.position = self.board.jail_position
+        player.is_in_jail = True
+        player.turns_in_jail = 0
+        self._mark_player(player_id)
+        self._log(f"{player.name} 被送进了监狱！")
+        return False
+    
+    def _land_on_tax(self, player_id: str, player) -> bool:
+        """落在税收地块：缴纳该地块的税款（私有方法）"""
+        tax_amount = self.board.tax_amounts[player.position]
+        player.money -= tax_amount
+        self._mark_player(player_id)
+        self._log(f"{player.name} 缴纳了 {tax_amount} 元税收")
+        # 检查债务状态
+        self._handle_debt(player_id, DEBT_TAX)
+        return False
+    
+    def _land_on_property(self, player_id: str, player) -> bool:
+        """落在地产：向所有者支付租金（私有方法）"""
+        position = player.position
+        owner_seat = self.state.tile_owner[position]
+        if owner_seat == NO_OWNER or owner_seat == player.seat:
+            return False
+        
+        property_owner = self.state.players.get(self.state.seat_owners.get(owner_seat, ""))
+        if property_owner is None:
+            return False
+        
+        current_tile = self.board.tiles[position]
+        
+        # 检查地产是否被抵押
+        if self.state.tile_mortgaged[position]:
+            self._log(
+                f"{current_tile['name']} 已被抵押，无需支付租金"
+            )
+            return False
+        
+        # 根据地产等级计算租金
+        tile_level = self.state.tile_level[position]
+        rent = self.board.rents[position][tile_level]
+        
+        # 强制扣除租金，即使资金不足
+        player.money -= rent
+        property_owner.money += rent
+        self._mark_player(player_id)
+        self._mark_player(property_owner.id)
+        
+        level_text = f"（等级{tile_level}）" if tile_level > 0 else ""
+        self._log(
+            f"{player.name} 向 {property_owner.name} 支付了 {rent} 元租金（{current_tile['name']}{level_text}）"
+        )
+        
+        # 检查债务状态
+        self._handle_debt(player_id, DEBT_RENT)
+        return False
+    
+    # 按地块类型编码分派的落地处理方法，返回 True 表示卡片移动了玩家，需要继续处理新位置
+    _LANDING_HANDLERS = {
+        TILE_PROPERTY: _land_on_property,
+        TILE_CHANCE: _land_on_chance,
+        TILE_DESTINY: _land_on_destiny,
+        TILE_JAIL: _land_on_jail,
+        TILE_GO_TO_JAIL: _land_on_go_to_jail,
+        TILE_TAX: _land_on_tax,
+    }
     
     def _apply_card_effect(self, player_id: str, card: Dict) -> bool:
         """应用卡片效果（私有方法）
@@ -355,19 +421,20 @@ class GameManager:
         Returns:
             bool: 如果卡片效果导致了玩家位置移动，则返回 True，否则返回 False
         """
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return False
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         
         # 记录抽到的卡片
-        self.game_state.game_log.append(f"{player.name} 抽到卡片：{card['text']}")
+        self._log(f"{player.name} 抽到卡片：{card['text']}")
         
         # 根据卡片类型应用效果
         if card['type'] == 'money_change':
             player.money += card['value']
+            self._mark_player(player_id)
             # 检查债务状态
-            self._handle_debt(player_id)
+            self._handle_debt(player_id, DEBT_CARD)
             return False
         
         elif card['type'] == 'move_to':
@@ -379,12 +446,12 @@ class GameManager:
                 steps = target_position - old_position
             else:
                 # 需要绕一圈到达目标位置
-                steps = len(GAME_MAP) - old_position + target_position
+                steps = self.board.size - old_position + target_position
             
             # 使用统一的移动方法，确保正确触发起点奖励
             self._move_player(player_id, steps)
             
-            self.game_state.game_log.append(
+            self._log(
                 f"{player.name} 从位置 {old_position} 移动到位置 {player.position}"
             )
             return True
@@ -392,7 +459,7 @@ class GameManager:
         elif card['type'] == 'move_forward':
             old_position = player.position
             self._move_player(player_id, card['value'])
-            self.game_state.game_log.append(
+            self._log(
                 f"{player.name} 从位置 {old_position} 前进 {card['value']} 格到位置 {player.position}"
             )
             return True
@@ -401,7 +468,7 @@ class GameManager:
             old_position = player.position
             # 后退的步数是负数
             self._move_player(player_id, -card['value'])
-            self.game_state.game_log.append(
+            self._log(
                 f"{player.name} 从位置 {old_position} 后退 {card['value']} 格到位置 {player.position}"
             )
             return True
@@ -410,95 +477,99 @@ class GameManager:
     
     def remove_player(self, player_id: str):
         """删除玩家并清空其地产归属"""
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return
         
-        player_name = self.game_state.players[player_id].name
+        player = self.state.players[player_id]
+        player_name = player.name
         
         # 清空该玩家所有地产的状态
-        for tile_id, tile_state in self.game_state.tile_states.items():
-            if tile_state.owner_id == player_id:
-                tile_state.owner_id = ""
-                tile_state.mortgaged = False
-                tile_state.level = 0
+        for tile_id in self.state.release_tiles(player):
+            self._mark_tile(tile_id)
         
         # 从玩家字典中删除该玩家
-        del self.game_state.players[player_id]
+        self.state.remove_player(player_id)
+        self._dirty_players.discard(player_id)
+        self._removed_players.add(player_id)
+        
+        # 负债的玩家离开后解除债务状态，否则其他玩家无法继续
+        if self.state.player_in_debt_id == player_id:
+            self.state.player_in_debt_id = ""
+            self.debt_cause = ""
         
         # 如果当前轮到该玩家，切换到下一个玩家
-        if self.game_state.current_turn_player_id == player_id:
-            if self.game_state.players:
-                player_ids = list(self.game_state.players.keys())
-                self.game_state.current_turn_player_id = player_ids[0]
+        if self.state.current_turn_player_id == player_id:
+            if self.state.players:
+                player_ids = list(self.state.players.keys())
+                self.state.current_turn_player_id = player_ids[0]
             else:
-                self.game_state.current_turn_player_id = ""
-                self.game_state.game_phase = "waiting"
+                self.state.current_turn_player_id = ""
+                self.state.game_phase = "waiting"
         
         # 添加日志
-        self.game_state.game_log.append(f"玩家 {player_name} 已离开游戏")
+        self._log(f"玩家 {player_name} 已离开游戏")
     
     def _check_can_buy_property(self, player_id: str):
         """检查是否可以购买地产（私有方法）"""
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return
         
-        player = self.game_state.players[player_id]
-        current_tile = GAME_MAP[player.position]
+        player = self.state.players[player_id]
         
         # 只有地产类型的地块才能购买
-        if current_tile["type"] != "property":
-            self.game_state.can_buy_property = False
+        if self.board.tile_types[player.position] != TILE_PROPERTY:
+            self.state.can_buy_property = False
             return
         
         # 检查地产是否已被购买
-        tile_state = self.game_state.tile_states[str(player.position)]
-        if tile_state.owner_id:
-            self.game_state.can_buy_property = False
+        if self.state.tile_owner[player.position] != NO_OWNER:
+            self.state.can_buy_property = False
             return
         
         # 如果地产未被购买，则可以购买
-        self.game_state.can_buy_property = True
+        self.state.can_buy_property = True
     
     def _check_turn_completion(self):
         """检查回合是否完成（私有方法）"""
         # 只要掷过骰子，就允许结束回合
-        if self.game_state.has_rolled_dice:
-            self.game_state.turn_completed = True
+        if self.state.has_rolled_dice:
+            self.state.turn_completed = True
     
     def mortgage_property(self, player_id: str, property_id: int) -> Dict:
         """抵押地产"""
         # 验证玩家是否存在
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return {"success": False, "message": "玩家不存在"}
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         
         # 验证地产ID是否有效
-        if property_id < 0 or property_id >= len(GAME_MAP):
+        if property_id < 0 or property_id >= self.board.size:
             return {"success": False, "message": "无效的地产ID"}
         
-        property_tile = GAME_MAP[property_id]
+        property_tile = self.board.tiles[property_id]
         
         # 验证是否为地产类型
-        if property_tile["type"] != "property":
+        if self.board.tile_types[property_id] != TILE_PROPERTY:
             return {"success": False, "message": "该地块不是地产"}
         
         # 验证玩家是否拥有该地产
-        tile_state = self.game_state.tile_states[str(property_id)]
-        if tile_state.owner_id != player_id:
+        if self.state.tile_owner[property_id] != player.seat:
             return {"success": False, "message": "您不拥有该地产"}
         
         # 验证地产是否已被抵押
-        if tile_state.mortgaged:
+        if self.state.tile_mortgaged[property_id]:
             return {"success": False, "message": "该地产已被抵押"}
         
         # 执行抵押
-        tile_state.mortgaged = True
-        mortgage_value = property_tile["mortgage_value"]
+        self.state.set_mortgaged(property_id, player, True)
+        mortgage_value = self.board.mortgage_values[property_id]
         player.money += mortgage_value
+        self._mark_player(player_id)
+        self._mark_tile(property_id)
         
         # 记录日志
-        self.game_state.game_log.append(
+        self._log(
             f"{player.name} 将 {property_tile['name']} 抵押给了银行，获得了 {mortgage_value} 元"
         )
         
@@ -514,32 +585,31 @@ class GameManager:
     def redeem_property(self, player_id: str, property_id: int) -> Dict:
         """赎回地产"""
         # 验证玩家是否存在
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return {"success": False, "message": "玩家不存在"}
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         
         # 验证地产ID是否有效
-        if property_id < 0 or property_id >= len(GAME_MAP):
+        if property_id < 0 or property_id >= self.board.size:
             return {"success": False, "message": "无效的地产ID"}
         
-        property_tile = GAME_MAP[property_id]
+        property_tile = self.board.tiles[property_id]
         
         # 验证是否为地产类型
-        if property_tile["type"] != "property":
+        if self.board.tile_types[property_id] != TILE_PROPERTY:
             return {"success": False, "message": "该地块不是地产"}
         
         # 验证玩家是否拥有该地产
-        tile_state = self.game_state.tile_states[str(property_id)]
-        if tile_state.owner_id != player_id:
+        if self.state.tile_owner[property_id] != player.seat:
             return {"success": False, "message": "您不拥有该地产"}
         
         # 验证地产是否处于抵押状态
-        if not tile_state.mortgaged:
+        if not self.state.tile_mortgaged[property_id]:
             return {"success": False, "message": "该地产未被抵押"}
         
         # 计算赎回金额（抵押价值的110%）
-        redeem_amount = int(property_tile["mortgage_value"] * 1.1)
+        redeem_amount = int(self.board.mortgage_values[property_id] * 1.1)
         
         # 验证玩家资金是否足够
         if player.money < redeem_amount:
@@ -549,11 +619,13 @@ class GameManager:
             }
         
         # 执行赎回
-        tile_state.mortgaged = False
+        self.state.set_mortgaged(property_id, player, False)
         player.money -= redeem_amount
+        self._mark_player(player_id)
+        self._mark_tile(property_id)
         
         # 记录日志
-        self.game_state.game_log.append(
+        self._log(
             f"{player.name} 支付 {redeem_amount} 元赎回了 {property_tile['name']}"
         )
         
@@ -566,53 +638,40 @@ class GameManager:
     def upgrade_property(self, player_id: str, property_id: int) -> Dict:
         """升级地产"""
         # 检查玩家是否存在
-        if player_id not in self.game_state.players:
+        if player_id not in self.state.players:
             return {"success": False, "message": "玩家不存在"}
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         
         # 检查地产ID是否有效
-        if property_id < 0 or property_id >= len(GAME_MAP):
+        if property_id < 0 or property_id >= self.board.size:
             return {"success": False, "message": "无效的地产ID"}
         
-        property_tile = GAME_MAP[property_id]
+        property_tile = self.board.tiles[property_id]
         
         # 检查是否为地产类型
-        if property_tile["type"] != "property":
+        if self.board.tile_types[property_id] != TILE_PROPERTY:
             return {"success": False, "message": "该地块不是地产"}
         
         # 检查玩家是否拥有该地产
-        tile_state = self.game_state.tile_states[str(property_id)]
-        if tile_state.owner_id != player_id:
+        if self.state.tile_owner[property_id] != player.seat:
             return {"success": False, "message": "你不拥有这个地产"}
         
         # 检查玩家是否拥有该地产所属颜色组的全部地产
-        property_group = None
-        for group_name, group_properties in PROPERTY_GROUPS.items():
-            if property_id in group_properties:
-                property_group = group_properties
-                break
-        
-        if property_group:
-            # 检查该颜色组中的所有地产是否都被当前玩家拥有
-            for group_property_id in property_group:
-                group_tile_state = self.game_state.tile_states[str(group_property_id)]
-                if group_tile_state.owner_id != player_id:
-                    return {"success": False, "message": "你必须拥有该颜色组的全部地产才能升级"}
-        
-        # 获取地块状态
-        tile_state = self.game_state.tile_states[str(property_id)]
+        property_group = self.board.tile_groups[property_id]
+        if property_group is not None and not self.state.owns_group(player, property_group):
+            return {"success": False, "message": "你必须拥有该颜色组的全部地产才能升级"}
         
         # 检查地产是否被抵押
-        if tile_state.mortgaged:
+        if self.state.tile_mortgaged[property_id]:
             return {"success": False, "message": "被抵押的地产无法升级"}
         
-        # 检查是否已达到最高等级（最多3级：0,1,2）
-        if tile_state.level >= 2:
+        # 检查是否已达到最高等级（租金表的最后一级）
+        if self.state.tile_level[property_id] >= self.board.max_levels[property_id]:
             return {"success": False, "message": "该地产已达到最高等级"}
         
         # 检查玩家资金是否足够
-        upgrade_cost = property_tile["upgrade_cost"]
+        upgrade_cost = self.board.upgrade_costs[property_id]
         if player.money < upgrade_cost:
             return {
                 "success": False, 
@@ -621,63 +680,233 @@ class GameManager:
         
         # 执行升级
         player.money -= upgrade_cost
-        tile_state.level += 1
+        self.state.tile_level[property_id] += 1
+        new_level = self.state.tile_level[property_id]
+        self._mark_player(player_id)
+        self._mark_tile(property_id)
         
-        self.game_state.game_log.append(
-            f"{player.name} 升级了 {property_tile['name']}，等级提升至 {tile_state.level} 级，花费 {upgrade_cost} 元"
+        self._log(
+            f"{player.name} 升级了 {property_tile['name']}，等级提升至 {new_level} 级，花费 {upgrade_cost} 元"
         )
         
         return {
             "success": True, 
-            "message": f"成功升级 {property_tile['name']} 至 {tile_state.level} 级",
-            "new_level": tile_state.level,
+            "message": f"成功升级 {property_tile['name']} 至 {new_level} 级",
+            "new_level": new_level,
             "cost": upgrade_cost
         }
     
-    def _handle_debt(self, player_id: str):
-        """处理玩家债务（私有方法）"""
-        if player_id not in self.game_state.players:
+    def _handle_debt(self, player_id: str, cause: Optional[str] = None):
+        """处理玩家债务（私有方法）
+        
+        Args:
+            player_id: 玩家ID
+            cause: 本次扣款的原因（DEBT_*），为空时沿用尚未偿还的债务的原因
+        """
+        if player_id not in self.state.players:
             return
         
-        player = self.game_state.players[player_id]
+        player = self.state.players[player_id]
         
         # 检查玩家资金是否小于0
         if player.money < 0:
+            if cause is not None:
+                self.debt_cause = cause
             # 检查玩家是否还有未抵押的地产
-            has_unmortgaged_properties = False
-            for tile_id, tile_state in self.game_state.tile_states.items():
-                if tile_state.owner_id == player_id and not tile_state.mortgaged:
-                    has_unmortgaged_properties = True
-                    break
-            
-            if has_unmortgaged_properties:
+            if player.unmortgaged_count > 0:
                 # 情况A：有资产可卖
-                self.game_state.player_in_debt_id = player_id
-                self.game_state.game_log.append(
+                self.state.player_in_debt_id = player_id
+                self._log(
                     f"{player.name} 资金为负！必须抵押地产来偿还债务。"
                 )
             else:
                 # 情况B：无资产可卖，触发真正的破产
-                self.game_state.game_log.append(
+                self._log(
                     f"{player.name} 破产了！资金不足且无可抵押资产。"
                 )
+                self.bankruptcies.append({"player_id": player_id, "cause": self.debt_cause})
+                self.debt_cause = ""
                 self.remove_player(player_id)
                 
                 # 检查游戏是否只剩最后一名胜利者
-                if len(self.game_state.players) == 1:
-                    winner = list(self.game_state.players.values())[0]
-                    self.game_state.game_log.append(
+                if len(self.state.players) == 1:
+                    winner = list(self.state.players.values())[0]
+                    self._log(
                         f"游戏结束！{winner.name} 获得胜利！"
                     )
-                    self.game_state.game_phase = "finished"
+                    self.state.game_phase = "finished"
         else:
             # 如果玩家资金已经恢复为非负数，清除债务状态
-            if self.game_state.player_in_debt_id == player_id:
-                self.game_state.player_in_debt_id = ""
-                self.game_state.game_log.append(
+            if self.state.player_in_debt_id == player_id:
+                self.state.player_in_debt_id = ""
+                self.debt_cause = ""
+                self._log(
                     f"{player.name} 已偿还债务，恢复正常状态。"
                 )
     
     def get_game_state(self) -> GameState:
         """获取当前游戏状态"""
-        return self.game_state
\ No newline at end of file
+        return self.state.to_game_state(self.log.recent())
+    
+    def _random_outcome(self, generate) -> int:
+        """产生一个随机结果并记录下来，重放时改用给定的结果（私有方法）
+        
+        重放时同样推进随机数生成器，恢复后的房间与原房间的随机数状态一致。
+        """
+        value = generate()
+        if self._replay_outcomes:
+            value = self._replay_outcomes.popleft()
+        self.rng_outcomes.append(value)
+        return value
+    
+    def take_rng_outcomes(self) -> List[int]:
+        """取出并清空自上次调用以来产生的随机结果"""
+        outcomes = self.rng_outcomes
+        self.rng_outcomes = []
+        return outcomes
+    
+    def replay_rng(self, outcomes: List[int]):
+        """设置接下来的操作使用的随机结果"""
+        self._replay_outcomes = deque(outcomes)
+    
+    def checkpoint(self) -> Dict:
+        """记录当前状态，用于批量操作失败时回滚
+        
+        只能在两次提交之间使用，回滚后尚未提交的变化记录也恢复原样。
+        """
+        return {
+            "state": self.state.to_snapshot(),
+            "log_seq": self.log.next_seq,
+            "dirty_players": set(self._dirty_players),
+            "removed_players": set(self._removed_players),
+            "dirty_tiles": set(self._dirty_tiles),
+            "rng_state": self.rng.getstate(),
+            "rng_outcome_count": len(self.rng_outcomes),
+            "replay_outcomes": deque(self._replay_outcomes),
+            "debt_cause": self.debt_cause,
+            "bankruptcy_count": len(self.bankruptcies)
+        }
+    
+    def rollback(self, checkpoint: Dict):
+        """回滚到 checkpoint() 记录的状态"""
+        self.state.restore(checkpoint["state"])
+        self.log.truncate(checkpoint["log_seq"])
+        self._dirty_players = checkpoint["dirty_players"]
+        self._removed_players = checkpoint["removed_players"]
+        self._dirty_tiles = checkpoint["dirty_tiles"]
+        # 随机数生成器一并回滚，被撤销的操作不影响之后的随机结果
+        self.rng.setstate(checkpoint["rng_state"])
+        del self.rng_outcomes[checkpoint["rng_outcome_count"]:]
+        self._replay_outcomes = checkpoint["replay_outcomes"]
+        self.debt_cause = checkpoint["debt_cause"]
+        del self.bankruptcies[checkpoint["bankruptcy_count"]:]
+    
+    def rng_state(self) -> List:
+        """导出随机数生成器的状态（可直接 JSON 序列化）"""
+        version, internal, gauss_next = self.rng.getstate()
+        return [version, list(internal), gauss_next]
+    
+    def restore_rng_state(self, rng_state: List):
+        """恢复 rng_state 导出的随机数生成器状态"""
+        version, internal, gauss_next = rng_state
+        self.rng.setstate((version, tuple(internal), gauss_next))
+    
+    def to_snapshot(self) -> Dict:
+        """导出紧凑的状态快照（可直接 JSON 序列化）"""
+        return {
+            "version": self.version,
+            "board": self.board.name,
+            "seed": self.seed,
+            "max_players": self.max_players,
+            "rng_state": self.rng_state(),
+            "resume_tokens": self.resume_tokens,
+            "state": self.state.to_snapshot(),
+            "log": self.log.to_snapshot()
+        }
+    
+    @classmethod
+    def from_snapshot(cls, room_id: str, snapshot: Dict) -> "GameManager":
+        """从状态快照恢复游戏管理器"""
+        game_manager = cls(
+            room_id,
+            snapshot.get("seed"),
+            snapshot.get("max_players", MAX_PLAYERS),
+            get_board(snapshot.get("board", DEFAULT_BOARD_NAME))
+        )
+        if "rng_state" in snapshot:
+            game_manager.restore_rng_state(snapshot["rng_state"])
+        game_manager.resume_tokens = dict(snapshot.get("resume_tokens", {}))
+        game_manager.state.restore(snapshot["state"])
+        game_manager.log.restore(snapshot["log"])
+        game_manager.version = snapshot["version"]
+        game_manager._log_mark = game_manager.log.next_seq
+        game_manager._committed_scalars = game_manager._scalar_values()
+        return game_manager
+    
+    def _log(self, text: str):
+        """追加一条游戏日志（私有方法）"""
+        self.log.append(text)
+    
+    def _mark_player(self, player_id: str):
+        """标记玩家数据已变化（私有方法）"""
+        self._dirty_players.add(player_id)
+    
+    def _mark_tile(self, tile_id: int):
+        """标记地块状态已变化（私有方法）"""
+        self._dirty_tiles.add(tile_id)
+    
+    def _scalar_values(self) -> tuple:
+        """读取当前的标量字段值（私有方法）"""
+        return tuple(getattr(self.state, field) for field in SCALAR_STATE_FIELDS)
+    
+    def has_pending_changes(self) -> bool:
+        """是否存在尚未提交的状态变化"""
+        return bool(
+            self._dirty_players
+            or self._removed_players
+            or self._dirty_tiles
+            or self._log_mark < self.log.next_seq
+            or self._scalar_values() != self._committed_scalars
+        )
+    
+    def commit_delta(self) -> Optional[Dict]:
+        """提交自上次提交以来的状态变化，返回增量数据
+        
+        没有任何变化时返回 None，版本号保持不变。
+        """
+        if not self.has_pending_changes():
+            return None
+        
+        players = self.state.players
+        delta = {
+            "base_version": self.version,
+            "version": self.version + 1,
+            # 客户端先处理移除列表，再按加入顺序合并玩家数据
+            "removed_players": sorted(self._removed_players),
+            "players": {
+                player_id: player.to_dict()
+                for player_id, player in players.items()
+                if player_id in self._dirty_players
+            },
+            "tile_states": {
+                str(tile_id): self.state.tile_dict(tile_id)
+                for tile_id in sorted(self._dirty_tiles)
+            },
+            "game_log": self.log.since(self._log_mark)
+        }
+        
+        # 只携带发生变化的标量字段
+        scalars = self._scalar_values()
+        for field, old_value, new_value in zip(SCALAR_STATE_FIELDS, self._committed_scalars, scalars):
+            if old_value != new_value:
+                delta[field] = new_value
+        
+        # 重置变化记录
+        self.version += 1
+        self._dirty_players.clear()
+        self._removed_players.clear()
+        self._dirty_tiles.clear()
+        self._log_mark = self.log.next_seq
+        self._committed_scalars = scalars
+        
+        return delta
\ No newline at end of file
@@ -0,0 +1,406 @@
+"""WebSocket 压力测试工具
+
+通过 /create_room 创建大量房间，为每个房间打开多个模拟客户端连接，
+按真实协议驱动对局（加入、掷骰子、购买、升级、抵押、赎回、结束回合），
+统计吞吐量以及从发送操作到收到 action_result、到收到随后的状态广播的延迟分位数。
+
+每个房间同一时刻只有一个操作在途，因此连接收到的下一条 action_result
+和下一条状态广播都可以归属到该操作。
+
+--bot-rooms 另外创建指定数量坐满服务器端机器人的房间作为背景负载，
+用于观察大量机器人对局时人类玩家操作的延迟。
+
+用法（先在本机启动服务器）：
+    python loadgen.py --url http://127.0.0.1:8001 --rooms 50 --players 4 --turns 200
+    python loadgen.py --url http://127.0.0.1:8001 --rooms 20 --bot-rooms 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+import websockets
+
+import wire
+from game_logic import GAME_MAP, TILE_GROUPS, SCALAR_STATE_FIELDS
+from sharding import websocket_url
+
+# 等待单个操作结果或状态广播的超时时间（秒）
+RESPONSE_TIMEOUT = 10.0
+
+# 策略买地和升级时保留的最低资金
+BUY_RESERVE = 2000
+UPGRADE_RESERVE = 4000
+
+# 每回合额外执行一次抵押/赎回的概率，用于覆盖这两类操作
+MORTGAGE_PROBABILITY = 0.05
+
+def create_room(base_url: str, seed: Optional[int] = None) -> str:
+    """通过 HTTP 接口创建房间（阻塞）"""
+    body = {"room_name": "loadgen"}
+    if seed is not None:
+        body["seed"] = seed
+    request = urllib.request.Request(
+        f"{base_url}/create_room",
+        data=json.dumps(body).encode("utf-8"),
+        method="POST",
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=RESPONSE_TIMEOUT) as response:
+        return json.loads(response.read())["room_id"]
+
+def add_bots(base_url: str, room_id: str, count: int) -> List[str]:
+    """向房间添加机器人（阻塞），分片模式下跟随 307 重定向到房间所在的工作进程"""
+    url = f"{base_url}/rooms/{room_id}/bots"
+    data = json.dumps({"count": count}).encode("utf-8")
+    for _ in range(2):
+        request = urllib.request.Request(url, data=data, method="POST", headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=RESPONSE_TIMEOUT) as response:
+                return json.loads(response.read())["bots"]
+        except urllib.error.HTTPError as error:
+            # urllib 不会对 POST 请求跟随 307 重定向
+            if error.code != 307:
+                raise
+            url = error.headers["Location"]
+    raise RuntimeError("重定向次数过多")
+
+async def fill_bot_rooms(base_url: str, rooms: int, players: int, concurrency: int = 32) -> int:
+    """创建坐满机器人的房间，返回成功创建的房间数"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def fill() -> bool:
+        try:
+            add_bots(base_url, create_room(base_url), players)
+            return True
+        except OSError:
+            return False
+
+    async def limited() -> bool:
+        async with semaphore:
+            return await asyncio.to_thread(fill)
+
+    return sum(await asyncio.gather(*(limited() for _ in range(rooms))))
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """已排序样本的分位数（最近秩法）"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+class LoadClient:
+    """模拟客户端：维护本地状态副本，并把收到的结果交给等待中的操作"""
+
+    def __init__(self, url: str, player_id: str):
+        self.url = url
+        self.player_id = player_id
+        self.websocket = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.state: Dict = {}
+        self.version = -1
+        self.ready = asyncio.Event()
+        self._result: Optional[asyncio.Future] = None
+        self._update: Optional[asyncio.Future] = None
+        # 版本号超过该值的状态才算作当前操作之后的广播
+        self._update_after = -1
+
+    async def connect(self):
+        """建立连接，等待收到第一份状态快照"""
+        self.websocket = await websockets.connect(self.url, max_size=None)
+        self.reader_task = asyncio.create_task(self._reader())
+        await asyncio.wait_for(self.ready.wait(), RESPONSE_TIMEOUT)
+
+    async def close(self):
+        """关闭连接"""
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+        if self.websocket is not None:
+            await self.websocket.close()
+
+    async def send(self, message: Dict, known_version: int, expect_update: bool = True):
+        """发送操作，返回 (结果, 结果延迟, 广播延迟)；操作失败时不等待广播
+
+        Args:
+            message: 操作消息
+            known_version: 房间内已知的最新版本号，之前操作的迟到广播不计入本操作
+            expect_update: 操作成功时是否等待随后的状态广播
+        """
+        loop = asyncio.get_running_loop()
+        self._result = loop.create_future()
+        self._update = loop.create_future()
+        self._update_after = known_version
+        start = time.perf_counter()
+        await self.websocket.send(json.dumps(message))
+
+        result = await asyncio.wait_for(self._result, RESPONSE_TIMEOUT)
+        result_latency = time.perf_counter() - start
+        update_latency = None
+        if expect_update and result.get("success"):
+            await asyncio.wait_for(self._update, RESPONSE_TIMEOUT)
+            update_latency = time.perf_counter() - start
+        return result, result_latency, update_latency
+
+    async def _reader(self):
+        """接收消息并更新本地状态（私有方法）"""
+        async for raw in self.websocket:
+            message = wire.decode(raw)
+            message_type = message.get("type")
+            if message_type == "game_state":
+                self.state = message["data"]
+                self.version = message.get("version", 0)
+                self.ready.set()
+                self._resolve_update()
+            elif message_type == "game_delta":
+                delta = message["data"]
+                if delta["version"] <= self.version:
+                    continue
+                if delta["base_version"] > self.version:
+                    # 漏掉了中间的增量，请求完整快照
+                    await self.websocket.send(json.dumps({"action": "resync"}))
+                    continue
+                # 合并后的增量可能覆盖已知的版本，增量是覆盖式的，可以直接应用
+                self._apply_delta(delta)
+                self._resolve_update()
+            elif message_type == "action_result":
+                if self._result is not None and not self._result.done():
+                    self._result.set_result(message)
+
+    def _resolve_update(self):
+        if self._update is not None and not self._update.done() and self.version > self._update_after:
+            self._update.set_result(None)
+
+    def _apply_delta(self, delta: Dict):
+        """把增量合并到本地状态（私有方法）"""
+        players = self.state["players"]
+        for player_id in delta["removed_players"]:
+            players.pop(player_id, None)
+        players.update(delta["players"])
+        self.state["tile_states"].update(delta["tile_states"])
+        for field in SCALAR_STATE_FIELDS:
+            if field in delta:
+                self.state[field] = delta[field]
+        self.version = delta["version"]
+
+class LoadStats:
+    """按操作类型汇总延迟"""
+
+    def __init__(self):
+        self.result_latency: Dict[str, List[float]] = {}
+        self.update_latency: Dict[str, List[float]] = {}
+        self.failures = 0
+        self.errors = 0
+
+    def record(self, action: str, result: Dict, result_latency: float, update_latency: Optional[float]):
+        self.result_latency.setdefault(action, []).append(result_latency)
+        if update_latency is not None:
+            self.update_latency.setdefault(action, []).append(update_latency)
+        if not result.get("success"):
+            self.failures += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        """吞吐量和各操作类型的延迟分位数（毫秒）"""
+        def describe(samples: List[float]) -> Dict:
+            samples = sorted(samples)
+            return {
+                "count": len(samples),
+                "p50": percentile(samples, 0.50) * 1000,
+                "p95": percentile(samples, 0.95) * 1000,
+                "p99": percentile(samples, 0.99) * 1000,
+                "max": samples[-1] * 1000 if samples else 0.0,
+            }
+
+        all_results = [sample for samples in self.result_latency.values() for sample in samples]
+        all_updates = [sample for samples in self.update_latency.values() for sample in samples]
+        return {
+            "elapsed_seconds": elapsed,
+            "actions": len(all_results),
+            "actions_per_second": len(all_results) / elapsed if elapsed else 0.0,
+            "failed_actions": self.failures,
+            "room_errors": self.errors,
+            "action_result_ms": describe(all_results),
+            "state_update_ms": describe(all_updates),
+            "per_action": {
+                action: {
+                    "action_result_ms": describe(samples),
+                    "state_update_ms": describe(self.update_latency.get(action, [])),
+                }
+                for action, samples in sorted(self.result_latency.items())
+            },
+        }
+
+async def run_room(base_url: str, players: int, turns: int, stats: LoadStats, rng: random.Random,
+                   seed: Optional[int], think_time: float, wire_format: str):
+    """创建一个房间并驱动一局对局"""
+    room_id = await asyncio.to_thread(create_room, base_url, seed)
+    ws_base = websocket_url(base_url)
+    clients = {
+        f"p{index}": LoadClient(f"{ws_base}/ws/{room_id}/p{index}?format={wire_format}", f"p{index}")
+        for index in range(players)
+    }
+
+    async def act(player_id: str, message: Dict, expect_update: bool = True) -> Dict:
+        known_version = max(client.version for client in clients.values())
+        result, result_latency, update_latency = await clients[player_id].send(message, known_version, expect_update)
+        stats.record(message["action"], result, result_latency, update_latency)
+        if think_time:
+            await asyncio.sleep(think_time)
+        return result
+
+    try:
+        for client in clients.values():
+            await client.connect()
+        for player_id in clients:
+            await act(player_id, {"action": "join_game", "player_name": player_id})
+
+        # 刚执行过成功操作的客户端一定已收到最新广播，版本号最大的状态副本即最新状态
+        def view() -> Dict:
+            return max(clients.values(), key=lambda client: client.version).state
+
+        for _ in range(turns):
+            state = view()
+            if state["game_phase"] != "playing" or len(state["players"]) < 2:
+                break
+            player_id = state["current_turn_player_id"]
+
+            await act(player_id, {"action": "roll_dice"})
+            await settle_debt(view, act)
+            await play_turn(view, player_id, act, rng)
+            await act(view()["current_turn_player_id"], {"action": "end_turn"})
+    except (asyncio.TimeoutError, OSError, websockets.ConnectionClosed):
+        stats.errors += 1
+    finally:
+        for client in clients.values():
+            await client.close()
+
+async def settle_debt(view, act):
+    """负债的玩家按编号抵押地产直至还清"""
+    while view()["player_in_debt_id"]:
+        state = view()
+        debtor_id = state["player_in_debt_id"]
+        tile_id = next((
+            int(tile_id) for tile_id, tile in sorted(state["tile_states"].items(), key=lambda item: int(item[0]))
+            if tile["owner_id"] == debtor_id and not tile["mortgaged"]
+        ), None)
+        if tile_id is None:
+            return
+        result = await act(debtor_id, {"action": "mortgage_property", "property_id": tile_id})
+        if not result.get("success"):
+            return
+
+async def play_turn(view, player_id: str, act, rng: random.Random):
+    """掷骰子之后的决策：购买、升级，偶尔抵押或赎回"""
+    state = view()
+    player = state["players"].get(player_id)
+    if player is None:
+        return
+
+    tile = GAME_MAP[player["position"]]
+    if state["can_buy_property"] and player["money"] - tile["price"] >= BUY_RESERVE:
+        await act(player_id, {"action": "buy_property"})
+        state = view()
+
+    owned = sorted(
+        int(tile_id) for tile_id, tile_state in state["tile_states"].items()
+        if tile_state["owner_id"] == player_id
+    )
+    groups = {}
+    for tile_id in owned:
+        groups.setdefault(TILE_GROUPS[tile_id], []).append(tile_id)
+
+    for tile_id in owned:
+        group = TILE_GROUPS[tile_id]
+        tile_state = state["tile_states"][str(tile_id)]
+        if group is None or tile_state["mortgaged"] or tile_state["level"] >= len(GAME_MAP[tile_id]["rent"]) - 1:
+            continue
+        if len(groups[group]) < sum(1 for other in TILE_GROUPS if other == group):
+            continue
+        if state["players"][player_id]["money"] - GAME_MAP[tile_id]["upgrade_cost"] >= UPGRADE_RESERVE:
+            await act(player_id, {"action": "upgrade_property", "property_id": tile_id})
+            state = view()
+            break
+
+    if owned and rng.random() < MORTGAGE_PROBABILITY:
+        tile_id = rng.choice(owned)
+        if state["tile_states"][str(tile_id)]["mortgaged"]:
+            await act(player_id, {"action": "redeem_property", "property_id": tile_id})
+        else:
+            await act(player_id, {"action": "mortgage_property", "property_id": tile_id})
+
+async def run_load(base_url: str, rooms: int, players: int, turns: int, concurrency: int,
+                   seed: Optional[int] = None, think_time: float = 0.0,
+                   wire_format: str = wire.FORMAT_JSON) -> Dict:
+    """并发运行多个房间的对局并汇总统计"""
+    stats = LoadStats()
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int):
+        async with semaphore:
+            room_seed = None if seed is None else seed + index
+            await run_room(base_url, players, turns, stats, random.Random(rng.getrandbits(64)), room_seed, think_time, wire_format)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(index) for index in range(rooms)))
+    return stats.summary(time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="大富翁服务器 WebSocket 压力测试")
+    parser.add_argument("--url", default="http://127.0.0.1:8001", help="服务器 HTTP 地址")
+    parser.add_argument("--rooms", type=int, default=20, help="房间数")
+    parser.add_argument("--players", type=int, default=4, help="每个房间的玩家数")
+    parser.add_argument("--turns", type=int, default=100, help="每个房间的最大回合数")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时进行对局的房间数，默认全部")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子，同时作为各房间的种子基数")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="每个操作之后的等待时间（毫秒）")
+    parser.add_argument("--format", default=wire.FORMAT_JSON, help="请求服务器使用的消息编码格式：json、orjson 或 msgpack")
+    parser.add_argument("--bot-rooms", type=int, default=0, help="额外创建的坐满机器人的房间数，作为背景负载")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    args = parser.parse_args()
+
+    if args.bot_rooms:
+        filled = asyncio.run(fill_bot_rooms(args.url.rstrip("/"), args.bot_rooms, args.players))
+        if not args.json:
+            print(f"已创建 {filled} 个机器人房间")
+
+    summary = asyncio.run(run_load(
+        args.url.rstrip("/"),
+        args.rooms,
+        args.players,
+        args.turns,
+        args.concurrency or args.rooms,
+        args.seed,
+        args.think_ms / 1000,
+        args.format
+    ))
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(
+        f"{args.rooms} 个房间 × {args.players} 名玩家，{summary['actions']} 个操作，"
+        f"耗时 {summary['elapsed_seconds']:.2f} 秒，{summary['actions_per_second']:.0f} 操作/秒"
+    )
+    print(f"{'操作':<18} {'次数':>7}  {'结果 p50/p95/p99 (ms)':>26}  {'广播 p50/p95/p99 (ms)':>26}")
+    rows = list(summary["per_action"].items()) + [("全部", {
+        "action_result_ms": summary["action_result_ms"],
+        "state_update_ms": summary["state_update_ms"],
+    })]
+    for action, row in rows:
+        result = row["action_result_ms"]
+        update = row["state_update_ms"]
+        print(
+            f"{action:<18} {result['count']:>7}  "
+            f"{result['p50']:8.2f} {result['p95']:8.2f} {result['p99']:8.2f}  "
+            f"{update['p50']:8.2f} {update['p95']:8.2f} {update['p99']:8.2f}"
+        )
+    if summary["failed_actions"] or summary["room_errors"]:
+        print(f"失败操作 {summary['failed_actions']} 个，异常中止的房间 {summary['room_errors']} 个")
+
+if __name__ == "__main__":
+    main()
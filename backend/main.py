@@ -1,13 +1,66 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
 import json
 import uuid
-from typing import Dict, List
-from game_logic import GameManager
+from typing import Dict, List, Optional
+from game_logic import GameManager, MAX_PLAYERS, merge_deltas
+from game_log import LIVE_LOG_SIZE
+from analytics import analytics_response
+from board import board_response, find_board
+from game_board import BOARDS, DEFAULT_BOARD, DEFAULT_BOARD_NAME, Board
 from models import GameState
+from connection_manager import ConnectionManager
+from room_actor import RoomActor
+from room_lifecycle import RoomLifecycle, RoomCapacityError
+from room_directory import RoomDirectory, RoomFilter, DEFAULT_PAGE_SIZE
+from sharding import shard_for_room, websocket_url
+from spectators import SpectatorHub
+from persistence import EventStore, EVENT_CREATE
+import bots
+import config
+import metrics
+import wire
 
-app = FastAPI(title="大富翁游戏服务器")
+# 事件日志持久化，未配置数据目录时不启用
+event_store: Optional[EventStore] = (
+    EventStore(config.DATA_DIR, fsync=config.EVENT_FSYNC) if config.DATA_DIR else None
+)
+
+async def snapshot_loop():
+    """定期写入全部房间的快照"""
+    while True:
+        await asyncio.sleep(config.SNAPSHOT_INTERVAL)
+        event_store.write_snapshot(active_games)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时从快照和事件日志恢复房间，关闭时写入最终快照"""
+    snapshot_task = None
+    if event_store is not None:
+        active_games.update(event_store.recover())
+        for room_id, game_manager in active_games.items():
+            room_directory.update(room_id, game_manager)
+        # 有机器人的房间立即启动执行者，让机器人继续对局
+        for room_id, game_manager in list(active_games.items()):
+            if any(bots.is_bot(player_id) for player_id in game_manager.state.players):
+                get_room_actor(room_id)
+        event_store.start()
+        snapshot_task = asyncio.create_task(snapshot_loop())
+    sweep_task = asyncio.create_task(lifecycle.run(config.ROOM_SWEEP_INTERVAL))
+    
+    yield
+    
+    sweep_task.cancel()
+    if event_store is not None:
+        snapshot_task.cancel()
+        event_store.write_snapshot(active_games)
+        event_store.close()
+
+app = FastAPI(title="大富翁游戏服务器", lifespan=lifespan)
 
 # 添加CORS中间件以支持跨域请求
 app.add_middleware(
@@ -20,83 +73,162 @@ app.add_middleware(
 
 # 全局变量存储活跃的游戏
 active_games: Dict[str, GameManager] = {}
+# 每个活跃房间对应的执行者
+room_actors: Dict[str, RoomActor] = {}
 
 class CreateRoomRequest(BaseModel):
     """创建房间请求模型"""
     room_name: str = "新游戏"
+    seed: Optional[int] = None  # 随机数种子，用于复现对局
+    board: str = DEFAULT_BOARD_NAME  # 棋盘名
+
+class AddBotsRequest(BaseModel):
+    """添加机器人请求模型"""
+    count: int = 1
 
 class CreateRoomResponse(BaseModel):
     """创建房间响应模型"""
     room_id: str
     message: str
 
-class ConnectionManager:
-    """WebSocket连接管理器"""
-    
-    def __init__(self):
-        # 存储每个房间的连接列表
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        # 存储每个连接对应的玩家信息
-        self.connection_info: Dict[WebSocket, Dict[str, str]] = {}
-    
-    async def connect(self, websocket: WebSocket, room_id: str, player_id: str):
-        """接受WebSocket连接"""
-        await websocket.accept()
-        
-        # 初始化房间连接列表
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        
-        # 添加连接到房间
-        self.active_connections[room_id].append(websocket)
-        
-        # 存储连接信息
-        self.connection_info[websocket] = {
-            "room_id": room_id,
-            "player_id": player_id
-        }
-    
-    def disconnect(self, websocket: WebSocket):
-        """断开WebSocket连接"""
-        if websocket in self.connection_info:
-            room_id = self.connection_info[websocket]["room_id"]
-            
-            # 从房间连接列表中移除
-            if room_id in self.active_connections:
-                self.active_connections[room_id].remove(websocket)
-                
-                # 如果房间没有连接了，清理房间
-                if not self.active_connections[room_id]:
-                    del self.active_connections[room_id]
-            
-            # 清理连接信息
-            del self.connection_info[websocket]
+def build_game_state_message(game_manager: GameManager) -> Dict:
+    """构建完整游戏状态快照消息"""
+    return {
+        "type": "game_state",
+        "version": game_manager.version,
+        "board": game_manager.board.name,
+        "board_version": game_manager.board.version,
+        "data": game_manager.get_game_state().dict()
+    }
+
+def build_room_snapshot(room_id: str) -> Dict:
+    """为慢速客户端生成房间的最新快照消息"""
+    return build_game_state_message(active_games[room_id])
+
+# 创建连接管理器实例
+manager = ConnectionManager(
+    queue_size=config.SEND_QUEUE_SIZE,
+    slow_consumer_policy=config.SLOW_CONSUMER_POLICY,
+    snapshot_provider=build_room_snapshot
+)
+
+# 观战连接，与玩家连接分开管理，按较低的频率广播共享的消息
+spectators = SpectatorHub(build_room_snapshot, config.SPECTATOR_INTERVAL)
+
+# 采集时计算的仪表
+metrics.REGISTRY.gauge("monopoly_active_rooms", "活跃房间数", lambda: len(active_games))
+metrics.REGISTRY.gauge("monopoly_connections", "当前 WebSocket 连接数", lambda: len(manager.connection_info))
+metrics.REGISTRY.gauge("monopoly_spectators", "当前观战连接数", lambda: spectators.total)
+metrics.REGISTRY.gauge(
+    "monopoly_action_queue_depth",
+    "全部房间待处理操作数之和",
+    lambda: sum(actor.queue.qsize() for actor in room_actors.values())
+)
+metrics.REGISTRY.gauge(
+    "monopoly_send_queue_depth",
+    "全部连接待发送消息数之和",
+    lambda: sum(connection.queue.qsize() for connection in manager.connection_info.values())
+)
+
+# 按游戏阶段和空位数索引的房间目录
+room_directory = RoomDirectory()
+
+# 空闲房间的休眠、删除和常驻数量上限
+lifecycle = RoomLifecycle(
+    active_games,
+    room_actors,
+    manager,
+    config.HIBERNATE_DIR,
+    idle_timeout=config.ROOM_IDLE_TIMEOUT,
+    room_ttl=config.ROOM_TTL,
+    hibernated_ttl=config.HIBERNATED_ROOM_TTL,
+    max_resident=config.MAX_RESIDENT_ROOMS,
+    event_store=event_store,
+    room_directory=room_directory,
+    spectators=spectators
+)
+
+def build_log_page(game_manager: GameManager, before, limit) -> Dict:
+    """按游标查询一页历史日志，游标或条数不是整数时抛出 ValueError"""
+    try:
+        before = None if before is None else int(before)
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("before 和 limit 必须是整数")
+    # 条数由 GameLog.page 限制在 1 到 MAX_PAGE_SIZE 之间
+    entries, next_cursor = game_manager.log.page(before, limit)
+    return {
+        "entries": entries,
+        "next_cursor": next_cursor
+    }
+
+def get_room_actor(room_id: str, seed: Optional[int] = None, board: Board = DEFAULT_BOARD) -> RoomActor:
+    """获取房间执行者，房间不在内存中时加载休眠的房间或按给定棋盘创建新房间
     
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        """发送个人消息"""
-        await websocket.send_text(message)
+    常驻房间数已达上限且无法换出时抛出 RoomCapacityError。
+    """
+    if room_id not in active_games:
+        lifecycle.ensure_capacity()
+        game_manager = lifecycle.load(room_id)
+        if game_manager is None:
+            game_manager = GameManager(room_id, seed, board=board)
+            if event_store is not None:
+                event_store.append(room_id, EVENT_CREATE, {
+                    "board": board.name,
+                    "seed": seed,
+                    "max_players": game_manager.max_players,
+                    "rng_state": game_manager.rng_state()
+                })
+        active_games[room_id] = game_manager
+        room_directory.update(room_id, game_manager)
+    lifecycle.touch(room_id)
     
-    async def broadcast_to_room(self, message: str, room_id: str):
-        """向房间内所有连接广播消息"""
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                try:
-                    await connection.send_text(message)
-                except:
-                    # 如果发送失败，移除该连接
-                    self.disconnect(connection)
+    actor = room_actors.get(room_id)
+    if actor is None:
+        actor = RoomActor(
+            room_id,
+            active_games[room_id],
+            manager,
+            queue_size=config.ACTION_QUEUE_SIZE,
+            batch_size=config.ACTION_BATCH_SIZE,
+            event_store=event_store,
+            room_directory=room_directory,
+            broadcast_tick=config.BROADCAST_TICK,
+            bot_delay=config.BOT_THINK_TIME,
+            spectators=spectators,
+            reconnect_grace=config.RECONNECT_GRACE,
+            history_size=config.DELTA_HISTORY_SIZE
+        )
+        actor.start()
+        room_actors[room_id] = actor
+    return actor
 
-# 创建连接管理器实例
-manager = ConnectionManager()
+async def wait_disconnect(websocket: WebSocket):
+    """忽略客户端发来的消息，直到连接断开"""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+def owns_room(room_id: str) -> bool:
+    """房间是否属于当前分片"""
+    return shard_for_room(room_id, config.SHARD_COUNT) == config.SHARD_INDEX
 
 @app.post("/create_room", response_model=CreateRoomResponse)
 async def create_room(request: CreateRoomRequest):
     """创建新的游戏房间"""
-    room_id = str(uuid.uuid4())[:8]  # 生成8位房间ID
+    board = BOARDS.get(request.board)
+    if board is None:
+        raise HTTPException(status_code=400, detail=f"棋盘 {request.board} 不存在")
     
-    # 创建新的游戏管理器
-    game_manager = GameManager(room_id)
-    active_games[room_id] = game_manager
+    # 生成8位房间ID，分片模式下只使用属于当前分片的ID
+    room_id = str(uuid.uuid4())[:8]
+    while not owns_room(room_id):
+        room_id = str(uuid.uuid4())[:8]
+    
+    # 创建新的游戏管理器及其执行者
+    try:
+        get_room_actor(room_id, request.seed, board)
+    except RoomCapacityError:
+        raise HTTPException(status_code=503, detail="服务器房间数已满，请稍后再试")
     
     return CreateRoomResponse(
         room_id=room_id,
@@ -104,131 +236,275 @@ async def create_room(request: CreateRoomRequest):
     )
 
 @app.get("/rooms")
-async def get_active_rooms():
-    """获取活跃房间列表"""
-    rooms = []
-    for room_id, game_manager in active_games.items():
-        rooms.append({
-            "room_id": room_id,
-            "player_count": len(game_manager.game_state.players),
-            "game_phase": game_manager.game_state.game_phase
-        })
-    return {"rooms": rooms}
+async def get_active_rooms(
+    phase: Optional[str] = None,
+    min_free_seats: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+):
+    """分页查询活跃房间，可按游戏阶段和最少空位数筛选，cursor 为上一页的 next_cursor"""
+    rooms, next_cursor = room_directory.query(RoomFilter(phase, min_free_seats), cursor, limit)
+    return {"rooms": rooms, "next_cursor": next_cursor}
+
+@app.get("/rooms/{room_id}/log")
+async def get_room_log(room_id: str, before: Optional[int] = None, limit: int = LIVE_LOG_SIZE):
+    """分页查询房间的历史日志，before 为游标（不包含）"""
+    if room_id not in active_games:
+        raise HTTPException(status_code=404, detail="房间不存在")
+    
+    return build_log_page(active_games[room_id], before, limit)
+
+@app.get("/rooms/{room_id}/stats")
+async def get_room_stats(room_id: str):
+    """查询房间执行者的队列深度和处理耗时"""
+    if room_id not in room_actors:
+        raise HTTPException(status_code=404, detail="房间不存在")
+    
+    return room_actors[room_id].stats()
+
+@app.post("/rooms/{room_id}/bots")
+async def add_bots(room_id: str, request: AddBotsRequest):
+    """向房间添加机器人玩家，最多填满空位"""
+    if room_id not in active_games and not lifecycle.is_hibernated(room_id):
+        raise HTTPException(status_code=404, detail="房间不存在")
+    try:
+        actor = get_room_actor(room_id)
+    except RoomCapacityError:
+        raise HTTPException(status_code=503, detail="服务器房间数已满，请稍后再试")
+    
+    game_manager = actor.game_manager
+    count = min(request.count, game_manager.max_players - len(game_manager.state.players))
+    if count <= 0:
+        raise HTTPException(status_code=409, detail="房间已满")
+    
+    # 机器人与人类玩家一样通过执行者加入游戏
+    bot_ids = []
+    for _ in range(count):
+        bot_id = bots.new_bot_id()
+        await actor.submit_action(bot_id, {"action": "join_game", "player_name": bots.bot_name(bot_id)}, None)
+        bot_ids.append(bot_id)
+    return {"room_id": room_id, "bots": bot_ids}
+
+@app.get("/board")
+async def get_board(name: str = DEFAULT_BOARD_NAME, if_none_match: Optional[str] = Header(None)):
+    """获取静态棋盘数据，支持 ETag 缓存"""
+    return board_response(find_board(name), if_none_match)
+
+@app.get("/analytics")
+async def get_analytics(
+    opponents: int = MAX_PLAYERS - 1,
+    board: str = DEFAULT_BOARD_NAME,
+    if_none_match: Optional[str] = Header(None)
+):
+    """棋盘的马尔可夫链分析结果（稳态分布、期望租金、回本轮数），按棋盘版本缓存"""
+    if not 1 <= opponents < MAX_PLAYERS:
+        raise HTTPException(status_code=400, detail=f"对手数应在 1 到 {MAX_PLAYERS - 1} 之间")
+    return analytics_response(find_board(board), opponents, if_none_match)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus 文本格式的运行指标"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.websocket("/ws/rooms")
+async def rooms_websocket(websocket: WebSocket):
+    """订阅房间目录变化，查询参数 phase 和 min_free_seats 与 /rooms 相同"""
+    params = websocket.query_params
+    try:
+        min_free_seats = int(params["min_free_seats"]) if "min_free_seats" in params else None
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    
+    # 目录推送是单向的，同时等待客户端断开，任意一方结束即退出
+    tasks = {
+        asyncio.create_task(wait_disconnect(websocket)),
+        asyncio.create_task(
+            room_directory.subscribe(websocket, RoomFilter(params.get("phase"), min_free_seats))
+        )
+    }
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    for task in done:
+        # 发送失败与连接断开同样处理，取出异常避免未处理异常的警告
+        task.exception()
 
 @app.websocket("/ws/{room_id}/{player_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str, player_id: str):
     """WebSocket端点处理游戏连接"""
-    await manager.connect(websocket, room_id, player_id)
+    # 分片模式下，不属于本进程的房间告知客户端正确的地址
+    if not owns_room(room_id) and config.SHARD_URLS:
+        await websocket.accept()
+        owner_url = config.SHARD_URLS[shard_for_room(room_id, config.SHARD_COUNT)]
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        await websocket.send_text(json.dumps({
+            "type": "redirect",
+            "url": f"{websocket_url(owner_url)}/ws/{room_id}/{player_id}{query}"
+        }))
+        await websocket.close()
+        return
     
-    # 检查房间是否存在，不存在则创建
-    if room_id not in active_games:
-        active_games[room_id] = GameManager(room_id)
+    # 机器人的玩家ID保留给服务器使用
+    if bots.is_bot(player_id):
+        await websocket.close(code=1008)
+        return
+    
+    # 客户端通过查询参数 format 选择消息编码格式，默认 JSON 文本
+    wire_format = wire.negotiate(websocket.query_params.get("format"))
+    
+    # 获取房间执行者，房间不存在则加载或创建
+    try:
+        actor = get_room_actor(room_id)
+    except RoomCapacityError:
+        await websocket.accept()
+        await websocket.close(code=1013)
+        return
+    game_manager = actor.game_manager
     
-    game_manager = active_games[room_id]
+    # 已有重连令牌的玩家必须出示相同的令牌，防止他人冒用玩家ID
+    params = websocket.query_params
+    if not actor.check_resume_token(player_id, params.get("token")):
+        await websocket.accept()
+        await websocket.close(code=1008)
+        return
+    actor.reclaim_seat(player_id)
+    # 座位仍在（断线后在保留时间内重连）时无需重新加入游戏
+    resumed = player_id in game_manager.state.players
+    await manager.connect(websocket, room_id, player_id, wire_format)
     
     try:
-        # 发送欢迎消息
+        # 发送欢迎消息，附带下次重连时使用的令牌
         await manager.send_personal_message(
-            json.dumps({
+            {
                 "type": "connection",
-                "message": f"已连接到房间 {room_id}"
-            }),
+                "message": f"已重新连接到房间 {room_id}" if resumed else f"已连接到房间 {room_id}",
+                "format": wire_format,
+                "board": game_manager.board.name,
+                "board_version": game_manager.board.version,
+                "token": actor.resume_token(player_id),
+                "resumed": resumed
+            },
             websocket
         )
         
-        # 发送当前游戏状态
-        await manager.send_personal_message(
-            json.dumps({
-                "type": "game_state",
-                "data": game_manager.get_game_state().dict()
-            }),
-            websocket
-        )
+        # 客户端带上已知的状态版本时只补发错过的增量，无法补发时发送完整快照
+        # （执行者总是在同一步内修改并提交状态，快照和增量的版本一致）
+        missed = None
+        try:
+            last_version = int(params["last_version"])
+        except (KeyError, ValueError):
+            last_version = None
+        if last_version is not None:
+            missed = actor.missed_deltas(last_version)
+        if missed is None:
+            if last_version is not None:
+                metrics.RECONNECTS.labels("snapshot").inc()
+            await manager.send_personal_message(
+                build_game_state_message(game_manager),
+                websocket
+            )
+        elif missed:
+            metrics.RECONNECTS.labels("delta").inc()
+            await manager.send_personal_message(
+                {"type": "game_delta", "data": merge_deltas(missed)},
+                websocket
+            )
+        else:
+            metrics.RECONNECTS.labels("current").inc()
         
         while True:
-            # 接收客户端消息
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # 接收客户端消息，文本帧为 JSON，二进制帧为 MessagePack
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(data.get("code", 1000))
+            text = data.get("text")
+            message = wire.decode(text if text is not None else data.get("bytes"))
+            lifecycle.touch(room_id)
+            if not isinstance(message, dict):
+                await manager.send_personal_message(
+                    {"type": "action_result", "success": False, "message": "消息格式错误"},
+                    websocket
+                )
+                continue
             
             action = message.get("action")
-            response = {"type": "action_result", "success": False}
-            
-            if action == "join_game":
-                player_name = message.get("player_name", f"玩家{player_id}")
-                success = game_manager.add_player(player_id, player_name)
-                response["success"] = success
-                response["message"] = "加入游戏成功" if success else "加入游戏失败"
-            
-            elif action == "roll_dice":
-                result = game_manager.roll_dice_and_move(player_id)
-                response.update(result)
-            
-            elif action == "buy_property":
-                result = game_manager.buy_property(player_id)
-                response.update(result)
-            
-            elif action == "end_turn":
-                result = game_manager.end_turn()
-                response.update(result)
             
-            elif action == "mortgage_property":
-                property_id = message.get("property_id")
-                if property_id is not None:
-                    result = game_manager.mortgage_property(player_id, property_id)
-                    response.update(result)
-                else:
-                    response["message"] = "缺少地产ID参数"
+            # 客户端请求重新同步完整状态
+            if action == "resync":
+                await manager.send_personal_message(
+                    build_game_state_message(game_manager),
+                    websocket
+                )
+                continue
             
-            elif action == "redeem_property":
-                property_id = message.get("property_id")
-                if property_id is not None:
-                    result = game_manager.redeem_property(player_id, property_id)
-                    response.update(result)
-                else:
-                    response["message"] = "缺少地产ID参数"
-            
-            elif action == "upgrade_property":
-                property_id = message.get("property_id")
-                if property_id is not None:
-                    result = game_manager.upgrade_property(player_id, property_id)
-                    response.update(result)
-                else:
-                    response["message"] = "缺少地产ID参数"
-            
-            else:
-                response["message"] = "未知操作"
-            
-            # 发送操作结果给当前玩家
-            await manager.send_personal_message(json.dumps(response), websocket)
+            # 客户端按游标查询更早的历史日志
+            if action == "get_log":
+                try:
+                    page = build_log_page(
+                        game_manager,
+                        message.get("before"),
+                        message.get("limit", LIVE_LOG_SIZE)
+                    )
+                except ValueError as error:
+                    await manager.send_personal_message(
+                        {"type": "action_result", "success": False, "message": str(error)},
+                        websocket
+                    )
+                    continue
+                await manager.send_personal_message(
+                    {"type": "game_log_page", **page},
+                    websocket
+                )
+                continue
             
-            # 广播更新后的游戏状态给房间内所有玩家
-            game_state_message = json.dumps({
-                "type": "game_state",
-                "data": game_manager.get_game_state().dict()
-            })
-            await manager.broadcast_to_room(game_state_message, room_id)
+            # 游戏操作交给房间执行者按顺序处理
+            await actor.submit_action(player_id, message, websocket)
     
     except WebSocketDisconnect:
+        pass
+    finally:
+        # 无论正常断开还是处理消息出错（如无法解码的帧），都注销连接并释放座位
         manager.disconnect(websocket)
-        # 从游戏中移除玩家并清空其地产
-        game_manager.remove_player(player_id)
-        
-        # 广播玩家离开消息
-        await manager.broadcast_to_room(
-            json.dumps({
-                "type": "player_disconnect",
-                "player_id": player_id,
-                "message": f"玩家 {player_id} 离开了游戏"
-            }),
-            room_id
-        )
-        
-        # 广播更新后的游戏状态
-        game_state_message = json.dumps({
-            "type": "game_state",
-            "data": game_manager.get_game_state().dict()
-        })
-        await manager.broadcast_to_room(game_state_message, room_id)
+        lifecycle.touch(room_id)
+        # 玩家已从新连接重连时不离开；否则由房间执行者保留座位，到期后移除玩家并广播离开消息
+        if not manager.player_connected(room_id, player_id):
+            await actor.disconnect_player(player_id)
+
+@app.websocket("/spectate/{room_id}")
+async def spectate_endpoint(websocket: WebSocket, room_id: str):
+    """观战连接：只接收房间状态，不加入游戏"""
+    if not owns_room(room_id) and config.SHARD_URLS:
+        await websocket.accept()
+        owner_url = config.SHARD_URLS[shard_for_room(room_id, config.SHARD_COUNT)]
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        await websocket.send_text(json.dumps({
+            "type": "redirect",
+            "url": f"{websocket_url(owner_url)}/spectate/{room_id}{query}"
+        }))
+        await websocket.close()
+        return
+    
+    # 观战不会创建房间
+    if room_id not in active_games and not lifecycle.is_hibernated(room_id):
+        await websocket.accept()
+        await websocket.close(code=1008)
+        return
+    try:
+        get_room_actor(room_id)
+    except RoomCapacityError:
+        await websocket.accept()
+        await websocket.close(code=1013)
+        return
+    
+    wire_format = wire.negotiate(websocket.query_params.get("format"))
+    await websocket.accept()
+    try:
+        await spectators.watch(websocket, room_id, wire_format)
+    finally:
+        # 最后一名观战者离开后从此时开始计算空闲时间
+        lifecycle.touch(room_id)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,234 @@
+"""运行指标
+
+以 Prometheus 文本格式导出的计数器、直方图和采集时计算的仪表。
+所有指标只在事件循环线程中更新，计数就是普通的整数加法，不需要加锁；
+直方图的桶在创建时分配好，记录一次观测只做一次二分查找和两次加法。
+带标签的指标通过 labels() 取得子指标，热点路径可以缓存子指标避免重复查找。
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# 延迟类直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# 消息大小直方图的桶上限（字节）
+SIZE_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+# 批量大小直方图的桶上限
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """生成 {a="x",b="y"} 形式的标签文本（私有函数）"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], _CounterChild] = {}
+        if not self.label_names:
+            self._children[()] = _CounterChild()
+
+    def labels(self, *values: str) -> _CounterChild:
+        """取得指定标签值的子计数器"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount: int = 1):
+        """无标签计数器加一"""
+        self._children[()].value += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}")
+        return lines
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 最后一个位置对应 +Inf 桶
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram:
+    """固定桶直方图"""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.bounds = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        if not self.label_names:
+            self._children[()] = _HistogramChild(self.bounds)
+
+    def labels(self, *values: str) -> _HistogramChild:
+        """取得指定标签值的子直方图"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.bounds)
+        return child
+
+    def observe(self, value: float):
+        """无标签直方图记录一次观测"""
+        self._children[()].observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class Gauge:
+    """采集时调用函数取值的仪表"""
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.function())}",
+        ]
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        """注册指标，同名指标重复注册时替换旧的"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float],
+                  label_names: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, label_names))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# 房间执行者
+ACTIONS = REGISTRY.counter(
+    "monopoly_actions_total", "按操作类型和结果统计的已处理操作数", ("action", "result")
+)
+ACTION_DURATION = REGISTRY.histogram(
+    "monopoly_action_duration_seconds", "单个操作在游戏引擎中的处理耗时", LATENCY_BUCKETS, ("action",)
+)
+ACTION_BATCH_SIZE = REGISTRY.histogram(
+    "monopoly_action_batch_size", "房间执行者每批处理的操作数", BATCH_BUCKETS
+)
+
+# 广播
+BROADCAST_BYTES = REGISTRY.histogram(
+    "monopoly_broadcast_bytes", "广播消息按各编码格式序列化后的大小（文本帧按字符计）", SIZE_BUCKETS, ("type", "format")
+)
+BROADCAST_FANOUT_DURATION = REGISTRY.histogram(
+    "monopoly_broadcast_fanout_seconds", "把一条广播放入房间内全部发送队列的耗时", LATENCY_BUCKETS
+)
+BROADCAST_COALESCED = REGISTRY.histogram(
+    "monopoly_broadcast_coalesced_deltas", "每次状态广播合并的增量数", BATCH_BUCKETS
+)
+BROADCAST_RECIPIENTS = REGISTRY.counter(
+    "monopoly_broadcast_recipients_total", "广播放入发送队列的消息份数"
+)
+
+# 发送
+MESSAGES_SENT = REGISTRY.counter(
+    "monopoly_messages_sent_total", "实际写入 WebSocket 的消息数"
+)
+SEND_FAILURES = REGISTRY.counter(
+    "monopoly_send_failures_total", "发送失败或因跟不上发送速度而断开的连接数", ("reason",)
+)
+STATES_DROPPED = REGISTRY.counter(
+    "monopoly_states_dropped_total", "慢速客户端被丢弃并改为补发快照的状态消息数"
+)
+
+# 断线重连
+RECONNECTS = REGISTRY.counter(
+    "monopoly_reconnects_total", "按补发方式统计的重连次数（delta 补发增量，current 已是最新，snapshot 补发快照）", ("mode",)
+)
+SEATS_RELEASED = REGISTRY.counter(
+    "monopoly_seats_released_total", "断线后超过保留时间仍未重连而离开房间的玩家数"
+)
+
+# 观战
+SPECTATOR_BROADCASTS = REGISTRY.counter(
+    "monopoly_spectator_broadcasts_total", "发给观战者的合并状态广播次数（每次只编码一次）"
+)
+SPECTATOR_FANOUT_DURATION = REGISTRY.histogram(
+    "monopoly_spectator_fanout_seconds", "把一次观战广播交给房间内全部观战者的耗时（含让出事件循环的时间）", LATENCY_BUCKETS
+)
+SPECTATOR_RESYNCS = REGISTRY.counter(
+    "monopoly_spectator_resyncs_total", "观战者跟不上广播而改为补发快照的次数"
+)
+
+# 房间生命周期
+ROOMS_HIBERNATED = REGISTRY.counter(
+    "monopoly_rooms_hibernated_total", "因空闲或超出常驻上限而写入磁盘的房间数"
+)
+ROOMS_REHYDRATED = REGISTRY.counter(
+    "monopoly_rooms_rehydrated_total", "从磁盘重新加载的休眠房间数"
+)
+ROOMS_DELETED = REGISTRY.counter(
+    "monopoly_rooms_deleted_total", "被删除的空房间、已结束房间和过期休眠房间数"
+)
@@ -7,6 +7,11 @@ class TileState(BaseModel):
     mortgaged: bool = False  # 是否被抵押
     level: int = 0  # 地产等级，0表示未升级
 
+class LogEntry(BaseModel):
+    """游戏日志条目模型"""
+    seq: int  # 日志序号，单调递增
+    text: str  # 日志内容
+
 class Player(BaseModel):
     """玩家模型"""
     id: str
@@ -22,7 +27,7 @@ class GameState(BaseModel):
     players: Dict[str, Player]  # 玩家ID到玩家对象的映射
     current_turn_player_id: str  # 当前回合的玩家ID
     game_phase: str  # 游戏阶段
-    game_log: List[str] = []  # 游戏日志
+    game_log: List[LogEntry] = []  # 最近的游戏日志，更早的日志需分页查询
     has_rolled_dice: bool = False  # 当前玩家是否已掷骰子
     can_buy_property: bool = False  # 当前玩家是否可以购买地产
     turn_completed: bool = False  # 当前回合是否已完成所有操作
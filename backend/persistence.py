@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+from actions import apply_action
+from game_board import DEFAULT_BOARD_NAME, get_board
+from game_logic import MAX_PLAYERS, GameManager
+
+logger = logging.getLogger(__name__)
+
+# 事件类型
+EVENT_CREATE = "create"  # 创建房间，携带棋盘名、种子、玩家数上限和随机数状态
+EVENT_ACTION = "action"  # 改变了房间状态的玩家操作（成功或执行中出错）
+EVENT_LEAVE = "leave"  # 玩家离开房间
+EVENT_TOKEN = "token"  # 为玩家签发重连令牌，携带令牌摘要
+EVENT_HIBERNATE = "hibernate"  # 空闲房间写入磁盘并移出内存
+EVENT_RESTORE = "restore"  # 休眠的房间重新加载，携带加载时的完整快照
+EVENT_DELETE = "delete"  # 删除房间
+
+_SEGMENT_PREFIX = "events-"
+_SNAPSHOT_PREFIX = "snapshot-"
+
+class EventStore:
+    """事件溯源持久化
+
+    每个改变了房间状态的操作连同其随机结果追加写入本地事件日志，并定期写入所有房间的
+    紧凑快照。写入由后台线程批量完成（组提交），事件循环只负责把事件放入队列。
+
+    目录结构：
+        events-<起始序号>.jsonl  每次写快照后切换到新的日志段
+        snapshot-<序号>.json     包含序号不大于该值的全部事件的效果
+    """
+
+    def __init__(self, directory: str, fsync: bool = True, max_batch: int = 1024):
+        self.directory = directory
+        self.fsync = fsync
+        self.max_batch = max_batch
+        # 最后一个已分配的事件序号
+        self.last_seq = 0
+        # 写线程的工作队列，元素为 ("event", 行) / ("snapshot", (序号, 数据)) / ("stop", None)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._segment = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """启动后台写线程，新事件写入新的日志段"""
+        self._open_segment(self.last_seq + 1)
+        self._thread = threading.Thread(target=self._writer, name="event-store-writer", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """写完队列中的全部内容后停止写线程"""
+        if self._thread is None:
+            return
+        self._queue.put(("stop", None))
+        self._thread.join()
+        self._thread = None
+
+    def append(self, room_id: str, kind: str, data: Optional[Dict] = None) -> int:
+        """追加一条事件，返回其序号（只入队，不阻塞事件循环）"""
+        self.last_seq += 1
+        event = {"seq": self.last_seq, "room_id": room_id, "kind": kind}
+        if data:
+            event.update(data)
+        self._queue.put(("event", json.dumps(event, ensure_ascii=False)))
+        return self.last_seq
+
+    def write_snapshot(self, games: Dict[str, GameManager]):
+        """记录当前全部房间的快照，实际写盘在后台线程完成"""
+        rooms = {room_id: game_manager.to_snapshot() for room_id, game_manager in games.items()}
+        self._queue.put(("snapshot", (self.last_seq, rooms)))
+
+    def recover(self) -> Dict[str, GameManager]:
+        """加载最新快照并重放其后的事件，重建全部房间"""
+        games: Dict[str, GameManager] = {}
+        snapshot_seq = 0
+
+        snapshots = self._list_files(_SNAPSHOT_PREFIX, ".json")
+        if snapshots:
+            snapshot_seq, path = snapshots[-1]
+            with open(path, encoding="utf-8") as file:
+                rooms = json.load(file)["rooms"]
+            for room_id, snapshot in rooms.items():
+                games[room_id] = GameManager.from_snapshot(room_id, snapshot)
+
+        self.last_seq = snapshot_seq
+        replayed = 0
+        for _, path in self._list_files(_SEGMENT_PREFIX, ".jsonl"):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # 崩溃时可能留下不完整的最后一行
+                        logger.warning("事件日志 %s 末尾不完整，已忽略", path)
+                        break
+                    if event["seq"] <= self.last_seq:
+                        continue
+                    self._apply(games, event)
+                    self.last_seq = event["seq"]
+                    replayed += 1
+
+        # 重放产生的变化合并为一个新版本
+        for game_manager in games.values():
+            game_manager.commit_delta()
+
+        logger.info("从快照 %d 恢复 %d 个房间，重放 %d 条事件", snapshot_seq, len(games), replayed)
+        return games
+
+    def _apply(self, games: Dict[str, GameManager], event: Dict):
+        """把一条事件应用到房间（私有方法）"""
+        room_id = event["room_id"]
+        kind = event["kind"]
+        if kind == EVENT_CREATE:
+            if room_id not in games:
+                board = get_board(event.get("board", DEFAULT_BOARD_NAME))
+                game_manager = GameManager(room_id, event.get("seed"), event.get("max_players", MAX_PLAYERS), board)
+                if "rng_state" in event:
+                    game_manager.restore_rng_state(event["rng_state"])
+                games[room_id] = game_manager
+            return
+        if kind == EVENT_RESTORE:
+            games[room_id] = GameManager.from_snapshot(room_id, event["snapshot"])
+            return
+        if kind in (EVENT_HIBERNATE, EVENT_DELETE):
+            # 休眠的房间保存在休眠目录中，不属于常驻房间
+            games.pop(room_id, None)
+            return
+
+        game_manager = games.get(room_id)
+        if game_manager is None:
+            logger.warning("事件 %d 引用了不存在的房间 %s", event["seq"], room_id)
+            return
+
+        if kind == EVENT_ACTION:
+            game_manager.replay_rng(event["rng"])
+            # 执行时出错的操作，重放时以相同的方式出错，保留相同的部分修改
+            apply_action(game_manager, event["player_id"], event["message"])
+            game_manager.take_rng_outcomes()
+        elif kind == EVENT_LEAVE:
+            game_manager.resume_tokens.pop(event["player_id"], None)
+            game_manager.remove_player(event["player_id"])
+        elif kind == EVENT_TOKEN:
+            game_manager.resume_tokens[event["player_id"]] = event["token_hash"]
+
+    def _list_files(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        """列出目录中按序号排序的文件（私有方法）"""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                seq = int(name[len(prefix):-len(suffix)])
+                files.append((seq, os.path.join(self.directory, name)))
+        files.sort()
+        return files
+
+    def _open_segment(self, start_seq: int):
+        """打开新的事件日志段（私有方法）"""
+        if self._segment is not None:
+            self._segment.close()
+        path = os.path.join(self.directory, f"{_SEGMENT_PREFIX}{start_seq:012d}.jsonl")
+        self._segment = open(path, "a", encoding="utf-8")
+
+    def _writer(self):
+        """后台写线程：批量写入事件并统一刷盘（私有方法）"""
+        running = True
+        while running:
+            items = [self._queue.get()]
+            while len(items) < self.max_batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for kind, payload in items:
+                if kind == "event":
+                    lines.append(payload)
+                    continue
+
+                # 快照和停止前先写完之前的事件
+                self._write_lines(lines)
+                lines = []
+                if kind == "snapshot":
+                    self._write_snapshot(*payload)
+                else:
+                    running = False
+                    break
+            self._write_lines(lines)
+
+        self._segment.close()
+        self._segment = None
+
+    def _write_lines(self, lines: List[str]):
+        """写入一批事件并刷盘（私有方法）"""
+        if not lines:
+            return
+        self._segment.write("\n".join(lines) + "\n")
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+
+    def _write_snapshot(self, seq: int, rooms: Dict):
+        """原子写入快照，切换日志段并清理已被快照覆盖的旧文件（私有方法）"""
+        path = os.path.join(self.directory, f"{_SNAPSHOT_PREFIX}{seq:012d}.json")
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"seq": seq, "rooms": rooms}, file, ensure_ascii=False, separators=(",", ":"))
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+        self._open_segment(seq + 1)
+        for start_seq, old_path in self._list_files(_SEGMENT_PREFIX, ".jsonl"):
+            if start_seq <= seq:
+                os.remove(old_path)
+        for old_seq, old_path in self._list_files(_SNAPSHOT_PREFIX, ".json"):
+            if old_seq < seq:
+                os.remove(old_path)
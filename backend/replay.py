@@ -0,0 +1,209 @@
+"""确定性重放工具
+
+给定随机数种子和操作脚本，不经过网络和事件循环，直接对游戏引擎全速重放，
+输出耗时和最终状态的哈希。相同种子和脚本在同一引擎版本下总是得到相同的对局，
+可用来在相同负载下比较不同引擎版本的性能，并确认优化没有改变游戏结果。
+
+脚本格式（JSON）：
+    {"seed": 1, "room_id": "replay", "actions": [{"player_id": "p0", "message": {"action": "roll_dice"}}, ...]}
+
+用法：
+    python replay.py record --seed 1 --players 4 --turns 500 --output script.json
+    python replay.py run script.json --repeat 5
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+from actions import apply_action
+from game_logic import GameManager
+
+# 策略买地和升级时保留的最低资金
+BUY_RESERVE = 2000
+UPGRADE_RESERVE = 4000
+
+def state_hash(game_manager: GameManager) -> str:
+    """游戏管理器完整状态（含日志）的哈希"""
+    payload = json.dumps(game_manager.to_snapshot(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _upgradable_tile(game_manager: GameManager, player_id: str) -> Optional[int]:
+    """找出玩家可以升级且升级后仍有余钱的地产（私有函数）"""
+    state = game_manager.state
+    board = game_manager.board
+    player = state.players[player_id]
+    for tile_id in sorted(player.tiles):
+        group = board.tile_groups[tile_id]
+        if group is None or state.tile_mortgaged[tile_id] or state.tile_level[tile_id] >= board.max_levels[tile_id]:
+            continue
+        if not state.owns_group(player, group):
+            continue
+        if player.money - board.upgrade_costs[tile_id] >= UPGRADE_RESERVE:
+            return tile_id
+    return None
+
+def record_script(seed: int, players: int = 4, turns: int = 500, room_id: str = "replay") -> Dict:
+    """用固定的简单策略对局，记录每一步操作作为脚本
+
+    策略：掷骰子，资金充裕时购买地产并升级成套地产，负债时按编号抵押地产，
+    然后结束回合。对局结束或达到回合上限时停止。
+    """
+    game_manager = GameManager(room_id, seed, max_players=max(players, 1))
+    state = game_manager.state
+    actions: List[Dict] = []
+
+    def act(player_id: str, message: Dict) -> Dict:
+        actions.append({"player_id": player_id, "message": message})
+        # 与服务器相同的执行方式，随机结果不需要保存
+        response, _ = apply_action(game_manager, player_id, message)
+        game_manager.take_rng_outcomes()
+        return response
+
+    def settle_debt():
+        while state.player_in_debt_id:
+            debtor_id = state.player_in_debt_id
+            debtor = state.players[debtor_id]
+            tile_id = next((tile for tile in sorted(debtor.tiles) if not state.tile_mortgaged[tile]), None)
+            if tile_id is None:
+                break
+            result = act(debtor_id, {"action": "mortgage_property", "property_id": tile_id})
+            if not result.get("success"):
+                break
+
+    for index in range(players):
+        act(f"p{index}", {"action": "join_game", "player_name": f"玩家{index}"})
+
+    for _ in range(turns):
+        if state.game_phase != "playing" or len(state.players) < 2:
+            break
+        player_id = state.current_turn_player_id
+
+        act(player_id, {"action": "roll_dice"})
+        settle_debt()
+
+        player = state.players.get(player_id)
+        if player is not None:
+            if state.can_buy_property and player.money - game_manager.board.prices[player.position] >= BUY_RESERVE:
+                act(player_id, {"action": "buy_property"})
+            tile_id = _upgradable_tile(game_manager, player_id)
+            if tile_id is not None:
+                act(player_id, {"action": "upgrade_property", "property_id": tile_id})
+
+        act(state.current_turn_player_id, {"action": "end_turn"})
+
+    return {"seed": seed, "room_id": room_id, "actions": actions}
+
+def replay(script: Dict, commit: bool = True) -> Dict:
+    """对新建的游戏管理器重放脚本
+
+    Args:
+        script: 操作脚本
+        commit: 每个操作后是否提交状态增量（与服务器逐批广播的开销一致）
+    """
+    # 脚本中加入游戏的玩家数可能超过默认上限
+    joined = {item["player_id"] for item in script["actions"] if item["message"].get("action") == "join_game"}
+    game_manager = GameManager(script.get("room_id", "replay"), script["seed"], max_players=max(len(joined), 1))
+    per_action: Dict[str, List[float]] = {}
+    errors = 0
+
+    start = time.perf_counter()
+    for step in script["actions"]:
+        message = step["message"]
+        action_start = time.perf_counter()
+        _, result = apply_action(game_manager, step["player_id"], message)
+        game_manager.take_rng_outcomes()
+        if result == "error":
+            errors += 1
+        if commit:
+            game_manager.commit_delta()
+        timing = per_action.setdefault(message.get("action", ""), [0, 0.0])
+        timing[0] += 1
+        timing[1] += time.perf_counter() - action_start
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed": elapsed,
+        "errors": errors,
+        "per_action": per_action,
+        "state_hash": state_hash(game_manager),
+        "version": game_manager.version,
+    }
+
+def benchmark(script: Dict, repeat: int = 5, commit: bool = True) -> Dict:
+    """多次重放脚本，校验结果一致并汇总耗时"""
+    runs = [replay(script, commit) for _ in range(repeat)]
+    hashes = {run["state_hash"] for run in runs}
+    if len(hashes) != 1:
+        raise RuntimeError("多次重放得到的最终状态不一致")
+
+    actions = len(script["actions"])
+    elapsed = sorted(run["elapsed"] for run in runs)
+    best = runs[min(range(repeat), key=lambda index: runs[index]["elapsed"])]
+    return {
+        "seed": script["seed"],
+        "actions": actions,
+        "repeat": repeat,
+        "errors": best["errors"],
+        "best_seconds": elapsed[0],
+        "median_seconds": elapsed[len(elapsed) // 2],
+        "actions_per_second": actions / elapsed[0],
+        "per_action_us": {
+            action: {"count": count, "mean": total * 1e6 / count}
+            for action, (count, total) in sorted(best["per_action"].items())
+        },
+        "version": best["version"],
+        "state_hash": best["state_hash"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="大富翁引擎确定性重放")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="用固定策略生成操作脚本")
+    record_parser.add_argument("--seed", type=int, default=None, help="随机数种子，默认随机生成")
+    record_parser.add_argument("--players", type=int, default=4, help="玩家数")
+    record_parser.add_argument("--turns", type=int, default=500, help="最大回合数")
+    record_parser.add_argument("--output", default="-", help="脚本输出路径，- 表示标准输出")
+
+    run_parser = subparsers.add_parser("run", help="重放操作脚本并计时")
+    run_parser.add_argument("script", help="脚本路径")
+    run_parser.add_argument("--repeat", type=int, default=5, help="重放次数")
+    run_parser.add_argument("--no-commit", action="store_true", help="不在每个操作后提交状态增量")
+    run_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        seed = args.seed if args.seed is not None else random.getrandbits(32)
+        script = record_script(seed, args.players, args.turns)
+        text = json.dumps(script, ensure_ascii=False)
+        if args.output == "-":
+            print(text)
+        else:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(text)
+        return
+
+    with open(args.script, encoding="utf-8") as file:
+        script = json.load(file)
+    result = benchmark(script, args.repeat, not args.no_commit)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    print(
+        f"种子 {result['seed']}，{result['actions']} 个操作 × {result['repeat']} 次，"
+        f"最快 {result['best_seconds'] * 1000:.2f} ms，中位 {result['median_seconds'] * 1000:.2f} ms，"
+        f"{result['actions_per_second']:.0f} 操作/秒"
+    )
+    for action, timing in result["per_action_us"].items():
+        print(f"  {action:<18} {timing['count']:>7} 次  平均 {timing['mean']:8.2f} µs")
+    print(f"最终版本 {result['version']}，状态哈希 {result['state_hash']}")
+    if result["errors"]:
+        print(f"出错操作 {result['errors']} 个")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from fastapi import WebSocket
+import bots
+import metrics
+from actions import KNOWN_ACTIONS, apply_action
+from connection_manager import ConnectionManager
+from game_logic import GameManager, merge_deltas
+from persistence import EventStore, EVENT_ACTION, EVENT_LEAVE, EVENT_TOKEN
+from room_directory import RoomDirectory
+from spectators import SpectatorHub
+
+logger = logging.getLogger(__name__)
+
+# 队列消息类型
+KIND_ACTION = "action"  # 客户端发来的操作
+KIND_LEAVE = "leave"  # 连接断开，玩家离开房间
+KIND_BOT = "bot"  # 轮到机器人行动，处理时再根据当时的状态决策
+
+# 机器人连续失败后重试间隔的上限（秒），每次失败间隔翻倍
+BOT_MAX_BACKOFF = 30.0
+
+# 座位保留到期而操作队列已满时，重试放入离开事件的间隔（秒）
+LEAVE_RETRY_DELAY = 0.1
+
+def _hash_token(token: str) -> str:
+    """重连令牌的摘要，只有摘要会写入快照和事件日志（私有函数）"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+class RoomActor:
+    """房间执行者
+
+    每个房间由一个 asyncio 任务独占其 GameManager，按到达顺序处理操作队列。
+    每轮取出队列中已积压的全部操作（不超过批量上限）一起处理，
+    逐个回复操作结果，最后只广播一次状态增量。
+
+    设置 broadcast_tick 后，操作结果仍立即回复，状态增量和通知则先积压起来，
+    每个间隔最多广播一次，间隔内的全部变化合并为一条 game_delta 消息。
+
+    房间里有机器人时，每批操作处理完后如果轮到机器人行动，
+    等待 bot_delay 秒后向队列放入一次机器人行动，每次只执行一步。
+    机器人的操作失败时改为结束回合；仍然失败则按指数退避延长等待时间，
+    直到有操作成功提交。
+
+    状态增量同时交给 spectators，观战者的广播不占用玩家广播的发送队列。
+
+    设置 reconnect_grace 后，玩家断线时先保留座位，超过该时间仍未重连才离开房间。
+    最近 history_size 个状态增量保留在内存中，重连的客户端只需补发错过的部分。
+    """
+
+    def __init__(
+        self,
+        room_id: str,
+        game_manager: GameManager,
+        connection_manager: ConnectionManager,
+        queue_size: int = 256,
+        batch_size: int = 64,
+        event_store: Optional[EventStore] = None,
+        room_directory: Optional[RoomDirectory] = None,
+        broadcast_tick: float = 0.0,
+        bot_delay: float = 0.5,
+        spectators: Optional[SpectatorHub] = None,
+        reconnect_grace: float = 0.0,
+        history_size: int = 256
+    ):
+        self.room_id = room_id
+        self.game_manager = game_manager
+        self.connection_manager = connection_manager
+        self.batch_size = batch_size
+        # 记录成功操作的事件日志，为空时不持久化
+        self.event_store = event_store
+        # 房间目录，玩家数或游戏阶段变化时更新
+        self.room_directory = room_directory
+        # 状态广播的最小间隔（秒），为 0 时每批操作后立即广播
+        self.broadcast_tick = broadcast_tick
+        # 尚未广播的状态增量和通知
+        self._pending_deltas: List[Dict] = []
+        self._pending_notices: List[Dict] = []
+        # 下一次广播的事件循环时间，没有待广播的内容时为 None
+        self._flush_at: Optional[float] = None
+        # 机器人每一步操作之前的等待时间（秒）
+        self.bot_delay = bot_delay
+        # 观战连接，状态增量另外交给它按自己的频率广播
+        self.spectators = spectators
+        # 玩家断线后保留座位的时间（秒），为 0 时立即离开
+        self.reconnect_grace = reconnect_grace
+        # 断线玩家 -> 座位保留到期后放入离开事件的定时器
+        self._leave_handles: Dict[str, asyncio.TimerHandle] = {}
+        # 玩家ID -> 重连令牌明文（只在内存中），游戏管理器中保存其摘要
+        self._resume_tokens: Dict[str, str] = {}
+        # 最近提交的状态增量，版本连续
+        self._history: Deque[Dict] = deque(maxlen=history_size)
+        # 执行者创建时的状态版本：恢复的房间中该版本号不一定对应客户端见过的状态，
+        # 只有之后由本执行者提交的版本才能补发增量
+        self._history_base = game_manager.version
+        # 机器人决策表，首次需要时加载
+        self.bot_policy: Optional[bots.BotPolicy] = None
+        # 已安排的机器人行动
+        self._bot_handle: Optional[asyncio.TimerHandle] = None
+        # 机器人连续失败的次数，有操作成功提交后清零
+        self._bot_failures = 0
+        # 队列元素为 (消息类型, 玩家ID, 消息内容, 回复用的连接)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+        # 运行统计
+        self.processed_actions = 0
+        self.processed_batches = 0
+        self.max_queue_depth = 0
+        self.total_processing_time = 0.0
+        self.max_processing_time = 0.0
+
+    def start(self):
+        """启动执行者任务"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+            # 加载的休眠房间或恢复的房间中可能正轮到机器人行动
+            self._schedule_bot_turn()
+
+    @property
+    def bots_active(self) -> bool:
+        """是否已安排了机器人行动"""
+        return self._bot_handle is not None
+
+    def cancel_bot_turn(self):
+        """取消已安排的机器人行动"""
+        if self._bot_handle is not None:
+            self._bot_handle.cancel()
+            self._bot_handle = None
+
+    def _schedule_bot_turn(self):
+        """轮到机器人行动时，等待 bot_delay 秒后放入一次机器人行动（私有方法）"""
+        if self._bot_handle is not None:
+            return
+        if bots.acting_bot(self.game_manager.state) is None:
+            return
+        delay = self.bot_delay
+        if self._bot_failures:
+            delay = min(max(delay, 0.1) * 2 ** self._bot_failures, BOT_MAX_BACKOFF)
+        self._bot_handle = asyncio.get_running_loop().call_later(delay, self._enqueue_bot_turn)
+
+    def _enqueue_bot_turn(self):
+        """把机器人行动放入操作队列，队满时稍后重试（私有方法）"""
+        self._bot_handle = None
+        try:
+            self.queue.put_nowait((KIND_BOT, "", None, None))
+        except asyncio.QueueFull:
+            self._schedule_bot_turn()
+
+    @property
+    def seats_held(self) -> bool:
+        """是否有断线玩家的座位正在保留"""
+        return bool(self._leave_handles)
+
+    def resume_token(self, player_id: str) -> str:
+        """玩家的重连令牌，首次连接时生成并记录摘要"""
+        token = self._resume_tokens.get(player_id)
+        if token is None:
+            token = self._resume_tokens[player_id] = secrets.token_urlsafe(16)
+            token_hash = _hash_token(token)
+            self.game_manager.resume_tokens[player_id] = token_hash
+            if self.event_store is not None:
+                self.event_store.append(self.room_id, EVENT_TOKEN, {"player_id": player_id, "token_hash": token_hash})
+        return token
+
+    def check_resume_token(self, player_id: str, token: Optional[str]) -> bool:
+        """检查重连令牌，玩家已有令牌时必须一致
+
+        令牌摘要随房间快照持久化，休眠或重启后同样需要校验；游戏中已有该玩家
+        却没有令牌记录时拒绝，防止他人占用座位。
+        """
+        expected = self.game_manager.resume_tokens.get(player_id)
+        if expected is None:
+            return player_id not in self.game_manager.state.players
+        if token is None or not hmac.compare_digest(expected, _hash_token(token)):
+            return False
+        # 重启后内存中没有明文，沿用玩家出示的令牌
+        self._resume_tokens.setdefault(player_id, token)
+        return True
+
+    def reclaim_seat(self, player_id: str) -> bool:
+        """玩家重连，取消座位保留到期后的离开，返回是否正在保留座位"""
+        handle = self._leave_handles.pop(player_id, None)
+        if handle is None:
+            return False
+        handle.cancel()
+        return True
+
+    async def disconnect_player(self, player_id: str):
+        """玩家断线：保留座位 reconnect_grace 秒，未设置保留时间时立即离开"""
+        if self.reconnect_grace <= 0:
+            await self.submit_leave(player_id)
+            return
+        self.reclaim_seat(player_id)
+        self._leave_handles[player_id] = asyncio.get_running_loop().call_later(
+            self.reconnect_grace, self._enqueue_leave, player_id
+        )
+
+    def _enqueue_leave(self, player_id: str):
+        """座位保留到期，把离开事件放入操作队列，队满时稍后重试（私有方法）"""
+        self._leave_handles.pop(player_id, None)
+        try:
+            self.queue.put_nowait((KIND_LEAVE, player_id, None, None))
+        except asyncio.QueueFull:
+            self._leave_handles[player_id] = asyncio.get_running_loop().call_later(
+                LEAVE_RETRY_DELAY, self._enqueue_leave, player_id
+            )
+            return
+        metrics.SEATS_RELEASED.inc()
+
+    def missed_deltas(self, last_version: int) -> Optional[List[Dict]]:
+        """客户端在 last_version 之后错过的状态增量
+
+        Returns:
+            按版本排列的增量，客户端已是最新时为空列表；
+            版本过旧或不是本执行者提交的版本、无法补发时返回 None
+        """
+        version = self.game_manager.version
+        if last_version > version or last_version <= self._history_base:
+            return None
+        count = version - last_version
+        if count > len(self._history):
+            return None
+        return list(self._history)[len(self._history) - count:]
+
+    async def stop(self):
+        """停止执行者任务，未处理的操作将被丢弃"""
+        self.cancel_bot_turn()
+        for handle in self._leave_handles.values():
+            handle.cancel()
+        self._leave_handles.clear()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def submit_action(self, player_id: str, message: Dict, websocket: Optional[WebSocket]):
+        """提交客户端操作，队列已满时等待"""
+        await self._put((KIND_ACTION, player_id, message, websocket))
+
+    async def submit_leave(self, player_id: str):
+        """提交玩家离开事件"""
+        await self._put((KIND_LEAVE, player_id, None, None))
+
+    async def _put(self, item: Tuple):
+        """放入操作队列并记录最大积压深度（私有方法）"""
+        await self.queue.put(item)
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def stats(self) -> Dict:
+        """房间执行者的运行统计"""
+        batches = self.processed_batches
+        return {
+            "room_id": self.room_id,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "processed_actions": self.processed_actions,
+            "processed_batches": batches,
+            "average_batch_size": self.processed_actions / batches if batches else 0.0,
+            "average_processing_ms": self.total_processing_time * 1000 / batches if batches else 0.0,
+            "max_processing_ms": self.max_processing_time * 1000
+        }
+
+    async def _run(self):
+        """执行者主循环（私有方法）"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if self._flush_at is not None and loop.time() >= self._flush_at:
+                    await self._flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("房间 %s 广播状态失败", self.room_id)
+
+            if self._flush_at is None:
+                item = await self.queue.get()
+            else:
+                # 有待广播的内容时最多等到广播时间
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), self._flush_at - loop.time())
+                except asyncio.TimeoutError:
+                    continue
+
+            batch = [item]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                await self._process_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("房间 %s 处理操作失败", self.room_id)
+
+    async def _process_batch(self, batch: List[Tuple]):
+        """依次应用一批操作，并在最后广播一次状态增量（私有方法）"""
+        game_manager = self.game_manager
+        replies: List[Tuple[WebSocket, Dict]] = []
+        notices: List[Dict] = []
+
+        if self.bot_policy is None and any(item[0] == KIND_BOT for item in batch):
+            # 决策表的计算在线程池中进行，不阻塞事件循环
+            self.bot_policy = await bots.load_policy(game_manager.board)
+
+        start = time.perf_counter()
+        for kind, player_id, message, websocket in batch:
+            if kind == KIND_BOT:
+                decision = self.bot_policy.decide(game_manager.state)
+                if decision is None:
+                    self._bot_failures += 1
+                    continue
+                player_id, message = decision
+
+            if kind == KIND_LEAVE:
+                # 离开事件处理前玩家已经重连（新连接先于旧连接断开被发现）
+                if self.connection_manager.player_connected(self.room_id, player_id):
+                    continue
+                # 从游戏中移除玩家并清空其地产
+                self._resume_tokens.pop(player_id, None)
+                game_manager.resume_tokens.pop(player_id, None)
+                game_manager.remove_player(player_id)
+                metrics.ACTIONS.labels("leave", "success").inc()
+                if self.event_store is not None:
+                    self.event_store.append(self.room_id, EVENT_LEAVE, {"player_id": player_id})
+                notices.append({
+                    "type": "player_disconnect",
+                    "player_id": player_id,
+                    "message": f"玩家 {player_id} 离开了游戏"
+                })
+                continue
+
+            response = self._apply_action(player_id, message)
+            if websocket is not None:
+                replies.append((websocket, response))
+            if kind == KIND_BOT and not response.get("success"):
+                action = message.get("action")
+                logger.warning("房间 %s 机器人 %s 的操作 %s 失败：%s", self.room_id, player_id, action, response.get("message"))
+                # 决策不可行时放弃本回合剩余的操作
+                if action != "end_turn":
+                    response = self._apply_action(player_id, {"action": "end_turn"})
+                if not response.get("success"):
+                    self._bot_failures += 1
+
+        # 整批操作只提交一次增量
+        delta = game_manager.commit_delta()
+        if delta is not None:
+            # 局面有变化，机器人可以按正常间隔重新尝试
+            self._bot_failures = 0
+            self._history.append(delta)
+            if self.spectators is not None:
+                self.spectators.publish(self.room_id, delta)
+        if self.room_directory is not None:
+            self.room_directory.update(self.room_id, game_manager)
+        elapsed = time.perf_counter() - start
+
+        metrics.ACTION_BATCH_SIZE.observe(len(batch))
+        self.processed_actions += len(batch)
+        self.processed_batches += 1
+        self.total_processing_time += elapsed
+        if elapsed > self.max_processing_time:
+            self.max_processing_time = elapsed
+
+        # 发送操作结果给各自的玩家
+        for websocket, response in replies:
+            await self.connection_manager.send_personal_message(response, websocket)
+
+        # 离开通知和本批操作产生的状态增量等到下一次广播时一起发送
+        if delta is not None:
+            self._pending_deltas.append(delta)
+        self._pending_notices.extend(notices)
+        if self._flush_at is None and (self._pending_deltas or self._pending_notices):
+            if self.broadcast_tick > 0:
+                self._flush_at = asyncio.get_running_loop().time() + self.broadcast_tick
+            else:
+                await self._flush()
+
+        self._schedule_bot_turn()
+
+    def _apply_action(self, player_id: str, message: Dict) -> Dict:
+        """执行一个操作并记录指标，改变了状态的操作写入事件日志（私有方法）
+
+        单个操作在校验失败时不修改任何状态，无需记录；执行中抛出异常的操作可能
+        已修改了部分状态，连同随机结果一起记录，重放时得到相同的状态。
+        """
+        game_manager = self.game_manager
+        action = message.get("action")
+        # 未知操作归为一类，避免客户端输入产生任意多的标签
+        label = action if action in KNOWN_ACTIONS else "unknown"
+        action_start = time.perf_counter()
+        response, result = apply_action(game_manager, player_id, message)
+        metrics.ACTION_DURATION.labels(label).observe(time.perf_counter() - action_start)
+        metrics.ACTIONS.labels(label, result).inc()
+
+        # 操作连同随机结果写入事件日志，重放时可得到相同结果
+        rng_outcomes = game_manager.take_rng_outcomes()
+        if self.event_store is not None and result != "failure":
+            self.event_store.append(self.room_id, EVENT_ACTION, {
+                "player_id": player_id,
+                "message": message,
+                "rng": rng_outcomes
+            })
+        return response
+
+    async def _flush(self):
+        """把积压的状态增量合并后连同通知一起广播（私有方法）"""
+        deltas, notices = self._pending_deltas, self._pending_notices
+        self._pending_deltas = []
+        self._pending_notices = []
+        self._flush_at = None
+
+        if not deltas:
+            for notice in notices:
+                await self.connection_manager.broadcast_to_room(notice, self.room_id)
+            return
+
+        metrics.BROADCAST_COALESCED.observe(len(deltas))
+        message = {"type": "game_delta", "data": merge_deltas(deltas)}
+        if notices:
+            # 通知只是提示，慢速客户端连同增量一起丢弃时由快照补齐状态
+            message["notices"] = notices
+        await self.connection_manager.broadcast_to_room(message, self.room_id, droppable=True)
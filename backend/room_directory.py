@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import itertools
+import json
+from bisect import bisect_right, insort
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from game_logic import GameManager
+
+# 单页房间数的默认值和上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 房间目录订阅者的待发送消息队列长度，队满时断开该订阅者
+SUBSCRIBER_QUEUE_SIZE = 256
+
+class RoomFilter:
+    """房间目录的筛选条件"""
+
+    __slots__ = ("phase", "min_free_seats")
+
+    def __init__(self, phase: Optional[str] = None, min_free_seats: Optional[int] = None):
+        self.phase = phase
+        self.min_free_seats = min_free_seats
+
+    def matches(self, entry: Optional[Dict]) -> bool:
+        """房间条目是否满足条件，条目为空（房间不存在）时不满足"""
+        if entry is None:
+            return False
+        if self.phase is not None and entry["game_phase"] != self.phase:
+            return False
+        if self.min_free_seats is not None and entry["free_seats"] < self.min_free_seats:
+            return False
+        return True
+
+class _Subscriber:
+    """房间目录的推送订阅者（私有类）"""
+
+    def __init__(self, websocket: WebSocket, room_filter: RoomFilter):
+        self.websocket = websocket
+        self.filter = room_filter
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+class RoomDirectory:
+    """增量维护的房间目录
+
+    房间的玩家数、空位数或游戏阶段变化时更新对应条目，并同时维护
+    按游戏阶段和按空位数分组的有序索引，查询时只遍历候选索引。
+    分页游标为上一页最后一个房间ID，结果按房间ID排序。
+
+    订阅者连接 /ws/rooms 后先收到一份满足条件的房间列表，
+    之后只收到满足条件的房间变化（room_update）和离开条件范围的房间（room_remove）。
+    """
+
+    def __init__(self):
+        # 房间ID -> 条目
+        self.entries: Dict[str, Dict] = {}
+        # 全部房间ID以及各索引下的房间ID，均保持有序
+        self._all: List[str] = []
+        self._by_phase: Dict[str, List[str]] = {}
+        self._by_free_seats: Dict[int, List[str]] = {}
+        # 目录版本号，每次条目变化时递增
+        self.version = 0
+        self._subscribers: Set[_Subscriber] = set()
+
+    def update(self, room_id: str, game_manager: GameManager):
+        """根据房间当前状态更新条目，没有变化时不做任何事"""
+        state = game_manager.state
+        player_count = len(state.players)
+        free_seats = max(game_manager.max_players - player_count, 0)
+        old = self.entries.get(room_id)
+        if (
+            old is not None
+            and old["player_count"] == player_count
+            and old["game_phase"] == state.game_phase
+            and old["max_players"] == game_manager.max_players
+        ):
+            return
+
+        entry = {
+            "room_id": room_id,
+            "player_count": player_count,
+            "max_players": game_manager.max_players,
+            "free_seats": free_seats,
+            "game_phase": state.game_phase,
+        }
+        if old is None:
+            insort(self._all, room_id)
+        else:
+            self._unindex(old)
+        self.entries[room_id] = entry
+        insort(self._by_phase.setdefault(entry["game_phase"], []), room_id)
+        insort(self._by_free_seats.setdefault(free_seats, []), room_id)
+        self._changed(room_id, old, entry)
+
+    def remove(self, room_id: str):
+        """删除房间条目"""
+        old = self.entries.pop(room_id, None)
+        if old is None:
+            return
+        self._all.pop(bisect_right(self._all, room_id) - 1)
+        self._unindex(old)
+        self._changed(room_id, old, None)
+
+    def query(self, room_filter: RoomFilter, cursor: Optional[str] = None,
+              limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List[Dict], Optional[str]]:
+        """按条件分页查询房间
+
+        Returns:
+            (房间条目列表, 下一页游标)，没有更多结果时游标为 None
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rooms = []
+        for room_id in self._candidates(room_filter, cursor):
+            entry = self.entries[room_id]
+            if not room_filter.matches(entry):
+                continue
+            if len(rooms) == limit:
+                return rooms, rooms[-1]["room_id"]
+            rooms.append(entry)
+        return rooms, None
+
+    async def subscribe(self, websocket: WebSocket, room_filter: RoomFilter, limit: int = MAX_PAGE_SIZE):
+        """推送房间目录变化直至连接断开（连接需已接受）"""
+        subscriber = _Subscriber(websocket, room_filter)
+        rooms, next_cursor = self.query(room_filter, None, limit)
+        await websocket.send_text(json.dumps({
+            "type": "room_list",
+            "version": self.version,
+            "rooms": rooms,
+            "next_cursor": next_cursor,
+        }))
+
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                if message is None:
+                    # 跟不上推送速度，断开后由客户端重新订阅
+                    await websocket.close(code=1008)
+                    return
+                await websocket.send_text(message)
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def _candidates(self, room_filter: RoomFilter, cursor: Optional[str]) -> Iterator[str]:
+        """按房间ID顺序给出可能满足条件的房间，从游标之后开始（私有方法）"""
+        if room_filter.phase is not None:
+            source = self._by_phase.get(room_filter.phase, [])
+            return itertools.islice(source, bisect_right(source, cursor) if cursor else 0, None)
+        if room_filter.min_free_seats is not None:
+            # 合并各个满足空位条件的索引
+            sources = [
+                rooms for free_seats, rooms in self._by_free_seats.items()
+                if free_seats >= room_filter.min_free_seats
+            ]
+            return heapq.merge(*(
+                itertools.islice(rooms, bisect_right(rooms, cursor) if cursor else 0, None)
+                for rooms in sources
+            ))
+        return itertools.islice(self._all, bisect_right(self._all, cursor) if cursor else 0, None)
+
+    def _unindex(self, entry: Dict):
+        """从分组索引中移除条目（私有方法）"""
+        room_id = entry["room_id"]
+        for index, key in ((self._by_phase, entry["game_phase"]), (self._by_free_seats, entry["free_seats"])):
+            rooms = index[key]
+            rooms.pop(bisect_right(rooms, room_id) - 1)
+            if not rooms:
+                del index[key]
+
+    def _changed(self, room_id: str, old: Optional[Dict], new: Optional[Dict]):
+        """递增版本号并通知订阅者（私有方法）"""
+        self.version += 1
+        if not self._subscribers:
+            return
+
+        update = None
+        removal = None
+        for subscriber in list(self._subscribers):
+            if subscriber.filter.matches(new):
+                if update is None:
+                    update = json.dumps({"type": "room_update", "version": self.version, "room": new})
+                message = update
+            elif subscriber.filter.matches(old):
+                if removal is None:
+                    removal = json.dumps({"type": "room_remove", "version": self.version, "room_id": room_id})
+                message = removal
+            else:
+                continue
+
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._subscribers.discard(subscriber)
+                # 清空积压的消息，放入断开标记
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
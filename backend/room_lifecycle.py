@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import metrics
+from connection_manager import ConnectionManager
+from game_logic import GameManager
+from persistence import EventStore, EVENT_HIBERNATE, EVENT_RESTORE, EVENT_DELETE
+from room_actor import RoomActor
+from room_directory import RoomDirectory
+from spectators import SpectatorHub
+
+logger = logging.getLogger(__name__)
+
+# 可以作为休眠文件名的房间ID，其他ID的空闲房间直接删除
+_ROOM_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_HIBERNATE_SUFFIX = ".json"
+
+class RoomCapacityError(Exception):
+    """常驻房间数已达上限且没有可以换出的房间"""
+
+class RoomLifecycle:
+    """房间生命周期管理
+
+    - 没有连接超过 idle_timeout 秒的房间写入磁盘并从内存移除，有人重连时再加载
+    - 没有玩家或已结束、且没有连接超过 room_ttl 秒的房间直接删除
+    - 休眠超过 hibernated_ttl 秒的房间文件被删除
+    - 常驻房间数超过 max_resident 时，按最近使用顺序换出没有连接的房间
+
+    房间的使用时间在创建、连接、收到消息和断开时更新。
+    正在由机器人进行对局、有人观战或有断线玩家的座位正在保留的房间不会被休眠或删除。
+    """
+
+    def __init__(
+        self,
+        active_games: Dict[str, GameManager],
+        room_actors: Dict[str, RoomActor],
+        connection_manager: ConnectionManager,
+        directory: str,
+        idle_timeout: float = 300,
+        room_ttl: float = 120,
+        hibernated_ttl: float = 7 * 24 * 3600,
+        max_resident: int = 10000,
+        event_store: Optional[EventStore] = None,
+        room_directory: Optional[RoomDirectory] = None,
+        spectators: Optional[SpectatorHub] = None
+    ):
+        self.active_games = active_games
+        self.room_actors = room_actors
+        self.connection_manager = connection_manager
+        self.directory = directory
+        self.idle_timeout = idle_timeout
+        self.room_ttl = room_ttl
+        self.hibernated_ttl = hibernated_ttl
+        self.max_resident = max_resident
+        self.event_store = event_store
+        # 休眠和删除的房间从房间目录中移除
+        self.room_directory = room_directory
+        # 有观战者的房间不会被休眠或换出
+        self.spectators = spectators
+        # 房间ID -> 最近使用时间，按使用先后排列
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def touch(self, room_id: str):
+        """记录房间被使用，不在内存中的房间（已休眠、已删除或从未加载）忽略"""
+        if room_id not in self.active_games:
+            return
+        self._last_used[room_id] = time.monotonic()
+        self._last_used.move_to_end(room_id)
+
+    def is_hibernated(self, room_id: str) -> bool:
+        """房间是否处于休眠状态"""
+        path = self._path(room_id)
+        return path is not None and os.path.exists(path)
+
+    def load(self, room_id: str) -> Optional[GameManager]:
+        """加载休眠的房间，不存在时返回 None"""
+        path = self._path(room_id)
+        if path is None or not os.path.exists(path):
+            return None
+
+        with open(path, encoding="utf-8") as file:
+            snapshot = json.load(file)
+        game_manager = GameManager.from_snapshot(room_id, snapshot)
+        # 加载后的后续操作依赖该快照，先记入事件日志再删除文件
+        if self.event_store is not None:
+            self.event_store.append(room_id, EVENT_RESTORE, {"snapshot": snapshot})
+        os.remove(path)
+        metrics.ROOMS_REHYDRATED.inc()
+        return game_manager
+
+    def ensure_capacity(self):
+        """为新的常驻房间腾出位置，无法腾出时抛出 RoomCapacityError"""
+        if len(self.active_games) < self.max_resident:
+            return
+        for room_id in list(self._last_used):
+            if room_id in self.active_games and self._evictable(room_id):
+                self._evict(room_id)
+                if len(self.active_games) < self.max_resident:
+                    return
+        raise RoomCapacityError(f"常驻房间数已达上限 {self.max_resident}")
+
+    def sweep(self):
+        """检查全部房间，休眠或删除空闲的房间"""
+        now = time.monotonic()
+        for room_id in list(self.active_games):
+            if not self._evictable(room_id):
+                continue
+            # 恢复或旧版本留下的房间没有使用记录，从本次检查开始计时
+            idle = now - self._last_used.setdefault(room_id, now)
+            if self._disposable(room_id):
+                if idle >= self.room_ttl:
+                    self._delete(room_id)
+            elif idle >= self.idle_timeout:
+                self._hibernate(room_id)
+
+        # 清理过期的休眠文件
+        deadline = time.time() - self.hibernated_ttl
+        for name in os.listdir(self.directory):
+            if not name.endswith(_HIBERNATE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+                    metrics.ROOMS_DELETED.inc()
+            except OSError:
+                pass
+
+    async def run(self, interval: float):
+        """定期检查房间"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("房间生命周期检查失败")
+
+    def _evictable(self, room_id: str) -> bool:
+        """房间没有玩家或观战连接，没有待处理的操作和保留中的座位，也没有机器人在对局（私有方法）"""
+        if self.connection_manager.active_connections.get(room_id):
+            return False
+        if self.spectators is not None and self.spectators.count(room_id):
+            return False
+        actor = self.room_actors.get(room_id)
+        return actor is None or (actor.queue.empty() and not actor.bots_active and not actor.seats_held)
+
+    def _disposable(self, room_id: str) -> bool:
+        """房间没有保留价值：没有玩家、已经结束或无法作为文件名保存（私有方法）"""
+        state = self.active_games[room_id].state
+        return not state.players or state.game_phase == "finished" or self._path(room_id) is None
+
+    def _evict(self, room_id: str):
+        """为腾出位置换出房间（私有方法）"""
+        if self._disposable(room_id):
+            self._delete(room_id)
+        else:
+            self._hibernate(room_id)
+
+    def _hibernate(self, room_id: str):
+        """把房间写入磁盘并从内存移除（私有方法）"""
+        path = self._path(room_id)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.active_games[room_id].to_snapshot(), file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+        self._drop(room_id)
+        if self.event_store is not None:
+            self.event_store.append(room_id, EVENT_HIBERNATE)
+        metrics.ROOMS_HIBERNATED.inc()
+
+    def _delete(self, room_id: str):
+        """删除房间（私有方法）"""
+        self._drop(room_id)
+        if self.event_store is not None:
+            self.event_store.append(room_id, EVENT_DELETE)
+        metrics.ROOMS_DELETED.inc()
+
+    def _drop(self, room_id: str):
+        """从内存中移除房间并停止其执行者（私有方法）"""
+        del self.active_games[room_id]
+        if self.room_directory is not None:
+            self.room_directory.remove(room_id)
+        self._last_used.pop(room_id, None)
+        actor = self.room_actors.pop(room_id, None)
+        if actor is not None:
+            actor.cancel_bot_turn()
+            if actor.task is not None:
+                # 队列已空，执行者只可能在等待新操作或发送，直接取消
+                actor.task.cancel()
+                actor.task = None
+
+    def _path(self, room_id: str) -> Optional[str]:
+        """房间休眠文件的路径，房间ID不能作为文件名时返回 None（私有方法）"""
+        if not _ROOM_ID_PATTERN.match(room_id):
+            return None
+        return os.path.join(self.directory, room_id + _HIBERNATE_SUFFIX)
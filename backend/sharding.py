@@ -0,0 +1,283 @@
+"""多进程房间分片
+
+按房间ID哈希把房间分配给 N 个工作进程，每个工作进程运行完整的 main:app，
+只负责自己分片内的房间。前端进程负责：
+- /create_room 轮流转发给各工作进程（工作进程只会生成属于自己分片的房间ID）
+- /rooms 汇总所有工作进程的房间列表，按房间ID合并分页
+- /ws/rooms 同时订阅所有工作进程的房间目录并转发给客户端
+- /ws/{room_id}/{player_id} 和 /spectate/{room_id} 告知客户端房间所在工作进程的地址（redirect 消息）
+- /board 和 /analytics 各进程加载相同的棋盘定义，由前端进程直接提供
+- /rooms/{room_id}/... 重定向到房间所在的工作进程
+
+用法（本机启动 4 个工作进程，前端进程监听 8001 端口）：
+    python sharding.py --workers 4 --port 8001
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import urllib.parse
+import urllib.request
+import zlib
+from typing import Dict, List, Optional
+
+import websockets
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import RedirectResponse
+
+from analytics import analytics_response
+from board import board_response, find_board
+from game_board import BOARDS, DEFAULT_BOARD_NAME
+from game_logic import MAX_PLAYERS
+from room_directory import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+def shard_for_room(room_id: str, shard_count: int) -> int:
+    """房间ID所属的分片序号，所有进程使用同一稳定哈希"""
+    return zlib.crc32(room_id.encode("utf-8")) % shard_count
+
+def websocket_url(http_url: str) -> str:
+    """把工作进程的 HTTP 地址转换为 WebSocket 地址"""
+    if http_url.startswith("https://"):
+        return "wss://" + http_url[len("https://"):]
+    return "ws://" + http_url[len("http://"):]
+
+def _http_json(method: str, url: str, body: Optional[Dict] = None, timeout: float = 5.0) -> Dict:
+    """发送 JSON 请求并解析响应（阻塞，私有函数）"""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+def _merge_room_pages(pages: List[Dict], limit: int) -> Dict:
+    """合并各工作进程按房间ID排序的同一页结果（私有函数）
+
+    每个工作进程返回的都是游标之后最小的若干房间，合并后取前 limit 个即为全局的一页；
+    被截断或任一工作进程还有下一页时，以本页最后一个房间ID作为下一页游标。
+    """
+    rooms = sorted(
+        (room for page in pages for room in page["rooms"]),
+        key=lambda room: room["room_id"]
+    )
+    has_more = len(rooms) > limit or any(page.get("next_cursor") for page in pages)
+    rooms = rooms[:limit]
+    return {
+        "rooms": rooms,
+        "next_cursor": rooms[-1]["room_id"] if has_more and rooms else None
+    }
+
+def create_front_app(worker_urls: List[str]) -> FastAPI:
+    """创建负责路由的前端应用
+
+    Args:
+        worker_urls: 各工作进程对客户端公开的 HTTP 地址，按分片序号排列
+    """
+    front_app = FastAPI(title="大富翁游戏分片路由")
+    front_app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    shard_count = len(worker_urls)
+    # 新房间轮流分配给各工作进程
+    next_worker = itertools.cycle(range(shard_count))
+
+    def owner_url(room_id: str) -> str:
+        return worker_urls[shard_for_room(room_id, shard_count)]
+
+    @front_app.post("/create_room")
+    async def create_room(request: Dict = None):
+        """转发创建房间请求"""
+        board = (request or {}).get("board", DEFAULT_BOARD_NAME)
+        if board not in BOARDS:
+            raise HTTPException(status_code=400, detail=f"棋盘 {board} 不存在")
+        worker_url = worker_urls[next(next_worker)]
+        try:
+            return await asyncio.to_thread(_http_json, "POST", f"{worker_url}/create_room", request or {})
+        except OSError:
+            raise HTTPException(status_code=503, detail="工作进程不可用")
+
+    @front_app.get("/rooms")
+    async def get_active_rooms(
+        phase: Optional[str] = None,
+        min_free_seats: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE
+    ):
+        """汇总所有工作进程的活跃房间，参数与工作进程的 /rooms 相同"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        params = {"limit": limit}
+        if phase is not None:
+            params["phase"] = phase
+        if min_free_seats is not None:
+            params["min_free_seats"] = min_free_seats
+        if cursor is not None:
+            params["cursor"] = cursor
+        query = urllib.parse.urlencode(params)
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_http_json, "GET", f"{url}/rooms?{query}") for url in worker_urls),
+            return_exceptions=True
+        )
+        return _merge_room_pages([result for result in results if not isinstance(result, Exception)], limit)
+
+    @front_app.websocket("/ws/rooms")
+    async def rooms_websocket(websocket: WebSocket):
+        """订阅所有工作进程的房间目录
+
+        先发送一份合并后的 room_list，之后原样转发各工作进程的变化消息。
+        消息中的 version 由各工作进程分别递增，只在同一房间的消息之间有先后意义。
+        """
+        await websocket.accept()
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        upstreams = []
+        try:
+            for url in worker_urls:
+                upstreams.append(await websockets.connect(f"{websocket_url(url)}/ws/rooms{query}", max_size=None))
+            pages = [json.loads(await upstream.recv()) for upstream in upstreams]
+            initial = _merge_room_pages(pages, MAX_PAGE_SIZE)
+            await websocket.send_text(json.dumps({"type": "room_list", **initial}))
+
+            async def relay(upstream):
+                async for message in upstream:
+                    await websocket.send_text(message)
+
+            async def wait_disconnect():
+                while (await websocket.receive())["type"] != "websocket.disconnect":
+                    pass
+
+            tasks = [asyncio.create_task(relay(upstream)) for upstream in upstreams]
+            tasks.append(asyncio.create_task(wait_disconnect()))
+            # 客户端断开或任一工作进程的订阅结束时关闭全部订阅，由客户端重新订阅
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.exception()
+        except (OSError, websockets.ConnectionClosed, WebSocketDisconnect):
+            pass
+        finally:
+            for upstream in upstreams:
+                await upstream.close()
+        try:
+            await websocket.close(code=1012)
+        except (RuntimeError, WebSocketDisconnect):
+            # 客户端已经断开
+            pass
+
+    @front_app.get("/board")
+    async def get_board(name: str = DEFAULT_BOARD_NAME, if_none_match: Optional[str] = Header(None)):
+        """静态棋盘数据，各进程相同，由前端进程直接提供"""
+        return board_response(find_board(name), if_none_match)
+
+    @front_app.get("/analytics")
+    async def get_analytics(
+        opponents: int = MAX_PLAYERS - 1,
+        board: str = DEFAULT_BOARD_NAME,
+        if_none_match: Optional[str] = Header(None)
+    ):
+        """棋盘的马尔可夫链分析结果（稳态分布、期望租金、回本轮数），按棋盘版本缓存"""
+        if not 1 <= opponents < MAX_PLAYERS:
+            raise HTTPException(status_code=400, detail=f"对手数应在 1 到 {MAX_PLAYERS - 1} 之间")
+        return analytics_response(find_board(board), opponents, if_none_match)
+
+    @front_app.get("/route/{room_id}")
+    async def route_room(room_id: str):
+        """查询房间所在的工作进程"""
+        url = owner_url(room_id)
+        return {
+            "room_id": room_id,
+            "shard": shard_for_room(room_id, shard_count),
+            "http_url": url,
+            "ws_url": websocket_url(url)
+        }
+
+    @front_app.api_route("/rooms/{room_id}/{path:path}", methods=["GET", "POST"])
+    async def redirect_room_request(room_id: str, path: str):
+        """房间相关的请求重定向到所在工作进程（307 保留请求方法和请求体）"""
+        return RedirectResponse(f"{owner_url(room_id)}/rooms/{room_id}/{path}", status_code=307)
+
+    @front_app.websocket("/ws/{room_id}/{player_id}")
+    async def websocket_redirect(websocket: WebSocket, room_id: str, player_id: str):
+        """告知客户端房间所在工作进程的 WebSocket 地址"""
+        await websocket.accept()
+        # 保留查询参数（如编码格式）
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        await websocket.send_text(json.dumps({
+            "type": "redirect",
+            "url": f"{websocket_url(owner_url(room_id))}/ws/{room_id}/{player_id}{query}"
+        }))
+        await websocket.close()
+
+    @front_app.websocket("/spectate/{room_id}")
+    async def spectate_redirect(websocket: WebSocket, room_id: str):
+        """告知观战客户端房间所在工作进程的 WebSocket 地址"""
+        await websocket.accept()
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        await websocket.send_text(json.dumps({
+            "type": "redirect",
+            "url": f"{websocket_url(owner_url(room_id))}/spectate/{room_id}{query}"
+        }))
+        await websocket.close()
+
+    @front_app.get("/")
+    async def root():
+        """根路径"""
+        return {"message": "大富翁游戏分片路由运行中", "shards": shard_count}
+
+    return front_app
+
+def main():
+    parser = argparse.ArgumentParser(description="以多进程分片模式启动大富翁游戏服务器")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=8001, help="前端路由进程端口")
+    parser.add_argument("--worker-base-port", type=int, default=8101, help="第一个工作进程的端口")
+    parser.add_argument("--public-host", default="localhost", help="客户端访问工作进程使用的主机名")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    worker_urls = [
+        f"http://{args.public_host}:{args.worker_base_port + index}"
+        for index in range(args.workers)
+    ]
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+    workers = []
+    for index in range(args.workers):
+        env = dict(
+            os.environ,
+            MONOPOLY_SHARD_INDEX=str(index),
+            MONOPOLY_SHARD_COUNT=str(args.workers),
+            MONOPOLY_SHARD_URLS=",".join(worker_urls)
+        )
+        # 每个工作进程使用独立的持久化目录
+        if env.get("MONOPOLY_DATA_DIR"):
+            env["MONOPOLY_DATA_DIR"] = os.path.join(env["MONOPOLY_DATA_DIR"], f"shard-{index}")
+        workers.append(subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--host", args.host,
+                "--port", str(args.worker_base_port + index)
+            ],
+            cwd=backend_dir,
+            env=env
+        ))
+
+    try:
+        uvicorn.run(create_front_app(worker_urls), host=args.host, port=args.port)
+    finally:
+        for worker in workers:
+            worker.send_signal(signal.SIGTERM)
+        for worker in workers:
+            worker.wait()
+
+if __name__ == "__main__":
+    main()
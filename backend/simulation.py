@@ -0,0 +1,264 @@
+"""大富翁棋盘蒙特卡洛模拟
+
+用 NumPy 数组同时推进大量相互独立的对局，统计各地块的落地频率以及
+每个地产在各等级下的期望租金收入，用于调整棋盘定义中的价格和租金。
+地块类型、监狱位置、出狱规则和卡片都直接取自编译后的 Board，可模拟任意棋盘。
+
+移动规则与 game_logic.py 保持一致：
+- 骰子为 1-6 点，位置按棋盘长度取模
+- 机会/命运卡的移动效果会触发新的落地处理
+- 落在"前往监狱"直接传送到监狱，在监狱中等待，第 jail_turns 个回合缴纳罚款后出狱并正常掷骰
+
+用法：
+    python simulation.py --games 20000 --turns 100 --seed 1 --compare --board default
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from game_board import (
+    BOARDS, CARD_TYPES, DEFAULT_BOARD, DEFAULT_BOARD_NAME, TILE_CHANCE, TILE_DESTINY, TILE_GO_TO_JAIL,
+    TILE_PROPERTY, Board
+)
+from game_logic import GameManager
+
+# 卡片效果编码（按 CARD_TYPES 中的顺序）
+CARD_MONEY, CARD_MOVE_TO, CARD_MOVE_FORWARD, CARD_MOVE_BACKWARD = range(len(CARD_TYPES))
+
+# 单次落地处理中卡片连锁移动的最大次数
+MAX_LANDING_CHAIN = 16
+
+def _card_tables(cards: List[Dict]):
+    """把卡片列表编译为效果编码数组和数值数组（私有函数）"""
+    kinds = np.array([CARD_TYPES.index(card["type"]) for card in cards], dtype=np.int8)
+    values = np.array([card["value"] for card in cards], dtype=np.int64)
+    return kinds, values
+
+def simulate(games: int = 10000, turns: int = 100, seed: Optional[int] = None, board: Board = DEFAULT_BOARD) -> Dict:
+    """向量化模拟多局游戏中单个棋子的移动
+
+    Args:
+        games: 并行模拟的独立对局数
+        turns: 每局模拟的回合数
+        seed: 随机数种子
+        board: 模拟的棋盘
+
+    Returns:
+        包含落地次数和总回合数的原始统计结果
+    """
+    rng = np.random.default_rng(seed)
+    board_size = board.size
+    jail_position = board.jail_position
+    jail_turns = board.jail_turns
+    # 直接使用编译后的地块类型编码数组
+    tile_codes = np.frombuffer(bytes(board.tile_types), dtype=np.uint8)
+    chance_kinds, chance_values = _card_tables(board.chance_cards)
+    destiny_kinds, destiny_values = _card_tables(board.destiny_cards)
+
+    position = np.zeros(games, dtype=np.int64)
+    in_jail = np.zeros(games, dtype=bool)
+    turns_in_jail = np.zeros(games, dtype=np.int8)
+    landings = np.zeros(board_size, dtype=np.int64)
+    go_passes = 0
+
+    for _ in range(turns):
+        # 监狱中的棋子累计等待回合，满 jail_turns 回合的本回合出狱并正常掷骰
+        turns_in_jail[in_jail] += 1
+        released = in_jail & (turns_in_jail >= jail_turns)
+        in_jail[released] = False
+        turns_in_jail[released] = 0
+
+        movers = np.flatnonzero(~in_jail)
+        dice = rng.integers(1, 7, size=movers.size)
+        old = position[movers]
+        new = (old + dice) % board_size
+        go_passes += int(np.count_nonzero(new < old))
+        position[movers] = new
+
+        # 处理落地事件，卡片移动后的棋子继续参与下一轮处理
+        active = movers
+        for _ in range(MAX_LANDING_CHAIN):
+            if active.size == 0:
+                break
+            current = position[active]
+            landings += np.bincount(current, minlength=board_size)
+            codes = tile_codes[current]
+
+            jailed = active[codes == TILE_GO_TO_JAIL]
+            position[jailed] = jail_position
+            in_jail[jailed] = True
+            turns_in_jail[jailed] = 0
+
+            moved = []
+            for code, kinds, values in (
+                (TILE_CHANCE, chance_kinds, chance_values),
+                (TILE_DESTINY, destiny_kinds, destiny_values),
+            ):
+                drawers = active[codes == code]
+                if drawers.size == 0 or kinds.size == 0:
+                    continue
+                cards = rng.integers(0, kinds.size, size=drawers.size)
+                kind = kinds[cards]
+                value = values[cards]
+                old = position[drawers]
+
+                steps = np.zeros(drawers.size, dtype=np.int64)
+                steps = np.where(kind == CARD_MOVE_TO, (value - old) % board_size, steps)
+                steps = np.where(kind == CARD_MOVE_FORWARD, value, steps)
+                steps = np.where(kind == CARD_MOVE_BACKWARD, -value, steps)
+
+                new = (old + steps) % board_size
+                go_passes += int(np.count_nonzero((steps > 0) & (new < old)))
+                position[drawers] = new
+                moved.append(drawers[kind != CARD_MONEY])
+
+            active = np.concatenate(moved) if moved else active[:0]
+
+    return {
+        "games": games,
+        "turns": turns,
+        "landings": landings,
+        "go_passes": go_passes,
+    }
+
+def simulate_scalar(games: int = 100, turns: int = 100, seed: Optional[int] = None,
+                    board: Board = DEFAULT_BOARD) -> Dict:
+    """逐回合调用 GameManager 的参照实现，用于校验向量化结果和对比吞吐量"""
+    # 每局使用独立种子，整体结果由 seed 决定
+    seeds = random.Random(seed)
+    landings = np.zeros(board.size, dtype=np.int64)
+    go_passes = 0
+
+    class RecordingGameManager(GameManager):
+        """记录每次落地位置的游戏管理器"""
+
+        def _handle_landing(self, player_id: str):
+            landings[self.state.players[player_id].position] += 1
+            super()._handle_landing(player_id)
+
+        def _apply_card_effect(self, player_id: str, card: Dict) -> bool:
+            moved = super()._apply_card_effect(player_id, card)
+            if moved:
+                landings[self.state.players[player_id].position] += 1
+            return moved
+
+        def _move_player(self, player_id: str, steps: int):
+            nonlocal go_passes
+            old_position = self.state.players[player_id].position
+            super()._move_player(player_id, steps)
+            if steps > 0 and self.state.players[player_id].position < old_position:
+                go_passes += 1
+
+    for game in range(games):
+        game_manager = RecordingGameManager(f"sim{game}", seeds.getrandbits(64), board=board)
+        game_manager.add_player("p", "p")
+        # 资金足够多，避免破产提前结束对局
+        game_manager.state.players["p"].money = 10 ** 12
+        for _ in range(turns):
+            game_manager.roll_dice_and_move("p")
+            game_manager.end_turn()
+
+    return {
+        "games": games,
+        "turns": turns,
+        "landings": landings,
+        "go_passes": go_passes,
+    }
+
+def summarize(result: Dict, board: Board = DEFAULT_BOARD) -> Dict:
+    """根据原始统计结果计算落地频率和期望租金
+
+    expected_rent 表示对手每走一个回合，该地产在各等级下带来的期望租金。
+    """
+    total_turns = result["games"] * result["turns"]
+    frequency = result["landings"] / total_turns
+
+    tiles = []
+    for tile_id, tile in enumerate(board.tiles):
+        entry = {
+            "id": tile_id,
+            "name": tile["name"],
+            "type": tile["type"],
+            "landing_frequency": float(frequency[tile_id]),
+        }
+        if board.tile_types[tile_id] == TILE_PROPERTY:
+            entry["expected_rent"] = [float(frequency[tile_id] * rent) for rent in board.rents[tile_id]]
+        tiles.append(entry)
+
+    return {
+        "board": board.name,
+        "games": result["games"],
+        "turns": result["turns"],
+        "go_passes_per_turn": result["go_passes"] / total_turns,
+        "tiles": tiles,
+    }
+
+def compare(vectorized: Dict, scalar: Dict) -> List[Dict]:
+    """比较两组落地频率，返回各地块的差异与标准误差的比值"""
+    rows = []
+    vector_turns = vectorized["games"] * vectorized["turns"]
+    scalar_turns = scalar["games"] * scalar["turns"]
+    for tile_id in range(len(vectorized["landings"])):
+        p_vector = vectorized["landings"][tile_id] / vector_turns
+        p_scalar = scalar["landings"][tile_id] / scalar_turns
+        pooled = (p_vector + p_scalar) / 2
+        # 把每回合的落地次数近似为伯努利变量，忽略了同一局内回合间的相关性
+        stderr = np.sqrt(max(pooled * (1 - pooled), 1e-12) * (1 / vector_turns + 1 / scalar_turns))
+        rows.append({
+            "id": tile_id,
+            "vectorized": float(p_vector),
+            "scalar": float(p_scalar),
+            "z": float((p_vector - p_scalar) / stderr),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="大富翁棋盘蒙特卡洛模拟")
+    parser.add_argument("--games", type=int, default=10000, help="并行模拟的对局数")
+    parser.add_argument("--turns", type=int, default=100, help="每局回合数")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子")
+    parser.add_argument("--compare", action="store_true", help="与逐回合参照实现比较结果和吞吐量")
+    parser.add_argument("--scalar-games", type=int, default=200, help="参照实现模拟的对局数")
+    parser.add_argument("--board", default=DEFAULT_BOARD_NAME, choices=sorted(BOARDS), help="棋盘名")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    args = parser.parse_args()
+    board = BOARDS[args.board]
+
+    start = time.perf_counter()
+    result = simulate(args.games, args.turns, args.seed, board)
+    elapsed = time.perf_counter() - start
+    summary = summarize(result, board)
+    summary["turns_per_second"] = args.games * args.turns / elapsed
+
+    if args.compare:
+        start = time.perf_counter()
+        scalar = simulate_scalar(args.scalar_games, args.turns, args.seed, board)
+        scalar_elapsed = time.perf_counter() - start
+        scalar_rate = args.scalar_games * args.turns / scalar_elapsed
+        rows = compare(result, scalar)
+        summary["scalar_turns_per_second"] = scalar_rate
+        summary["speedup"] = summary["turns_per_second"] / scalar_rate
+        summary["max_abs_z"] = max(abs(row["z"]) for row in rows)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"对局数 {args.games}，每局 {args.turns} 回合，{summary['turns_per_second']:.0f} 回合/秒")
+    print(f"{'ID':>3} {'地块':<8} {'落地频率':>10}  各等级期望租金/回合")
+    for entry in summary["tiles"]:
+        rents = " ".join(f"{rent:8.2f}" for rent in entry.get("expected_rent", []))
+        print(f"{entry['id']:>3} {entry['name']:<8} {entry['landing_frequency']:>10.4f}  {rents}")
+    print(f"经过起点频率：{summary['go_passes_per_turn']:.4f} 次/回合")
+    if args.compare:
+        print(
+            f"参照实现 {summary['scalar_turns_per_second']:.0f} 回合/秒，"
+            f"加速 {summary['speedup']:.0f} 倍，最大偏差 |z| = {summary['max_abs_z']:.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
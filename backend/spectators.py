@@ -0,0 +1,179 @@
+"""观战连接
+
+观战者只接收房间状态，不占用玩家座位，也不经过 ConnectionManager 的逐连接发送队列：
+- 房间执行者每次提交增量时，只把增量追加到该房间的观战待发送列表
+- 每个有观战者的房间由一个定时任务每 interval 秒把积压的增量合并为一条 game_delta，
+  每种编码格式只编码一次，房间内所有观战者共享同一份结果
+- 每个观战者只保留一份待发送消息，上一份还没发出又有新的广播时说明跟不上，
+  改为发送一份完整快照；同一状态的快照同样只生成和编码一次
+
+分发时每交给一批观战者就让出一次事件循环，观战者再多也不会长时间阻塞玩家操作的处理。
+"""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+import metrics
+import wire
+from game_logic import merge_deltas
+from wire import FORMAT_JSON, OutgoingMessage
+
+# 每交给多少名观战者之后让出一次事件循环
+FANOUT_SLICE = 32
+
+class Spectator:
+    """单个观战连接"""
+
+    __slots__ = ("websocket", "wire_format", "pending", "resync", "wakeup")
+
+    def __init__(self, websocket: WebSocket, wire_format: str = FORMAT_JSON):
+        self.websocket = websocket
+        self.wire_format = wire_format
+        # 等待发送的广播，只保留一份
+        self.pending: Optional[OutgoingMessage] = None
+        # 下一次发送完整快照（刚连接、跟不上广播或客户端请求重新同步）
+        self.resync = True
+        self.wakeup = asyncio.Event()
+        self.wakeup.set()
+
+    def offer(self, outgoing: OutgoingMessage):
+        """交给观战者一份广播，上一份尚未发出时改为补发快照"""
+        if self.resync:
+            return
+        if self.pending is not None:
+            self.pending = None
+            self.resync = True
+            metrics.SPECTATOR_RESYNCS.inc()
+        else:
+            self.pending = outgoing
+        self.wakeup.set()
+
+class _SpectatorRoom:
+    """一个房间的全部观战者和待广播的增量（私有类）"""
+
+    __slots__ = ("spectators", "deltas", "snapshot", "task")
+
+    def __init__(self):
+        self.spectators: Set[Spectator] = set()
+        self.deltas: List[Dict] = []
+        # 当前状态的快照，状态变化后失效
+        self.snapshot: Optional[OutgoingMessage] = None
+        self.task: Optional[asyncio.Task] = None
+
+class SpectatorHub:
+    """观战连接管理器，与玩家连接的 ConnectionManager 相互独立"""
+
+    def __init__(self, snapshot_provider: Callable[[str], Dict], interval: float = 1.0):
+        """
+        Args:
+            snapshot_provider: 根据房间ID生成最新完整状态消息
+            interval: 观战广播的间隔（秒）
+        """
+        self.snapshot_provider = snapshot_provider
+        self.interval = interval
+        self.rooms: Dict[str, _SpectatorRoom] = {}
+
+    def count(self, room_id: str) -> int:
+        """房间的观战者数量"""
+        room = self.rooms.get(room_id)
+        return len(room.spectators) if room is not None else 0
+
+    @property
+    def total(self) -> int:
+        """全部观战者数量"""
+        return sum(len(room.spectators) for room in self.rooms.values())
+
+    def publish(self, room_id: str, delta: Dict):
+        """房间执行者提交增量后调用，没有观战者时什么都不做"""
+        room = self.rooms.get(room_id)
+        if room is not None:
+            room.deltas.append(delta)
+            room.snapshot = None
+
+    async def watch(self, websocket: WebSocket, room_id: str, wire_format: str = FORMAT_JSON):
+        """为已接受的连接提供观战，直到连接断开"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = _SpectatorRoom()
+            room.task = asyncio.create_task(self._broadcast_loop(room))
+        spectator = Spectator(websocket, wire_format)
+        room.spectators.add(spectator)
+
+        tasks = {
+            asyncio.create_task(self._sender(room_id, room, spectator)),
+            asyncio.create_task(self._receiver(spectator)),
+        }
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            room.spectators.discard(spectator)
+            if not room.spectators and self.rooms.get(room_id) is room:
+                del self.rooms[room_id]
+                room.task.cancel()
+        for task in done:
+            # 发送失败与连接断开同样处理，取出异常避免未处理异常的警告
+            task.exception()
+
+    async def _broadcast_loop(self, room: _SpectatorRoom):
+        """每个间隔把积压的增量合并后交给全部观战者（私有方法）"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not room.deltas:
+                continue
+            deltas, room.deltas = room.deltas, []
+
+            start = time.perf_counter()
+            outgoing = OutgoingMessage({"type": "game_delta", "data": merge_deltas(deltas)})
+            for index, spectator in enumerate(list(room.spectators)):
+                spectator.offer(outgoing)
+                if index % FANOUT_SLICE == FANOUT_SLICE - 1:
+                    await asyncio.sleep(0)
+            metrics.SPECTATOR_BROADCASTS.inc()
+            metrics.SPECTATOR_FANOUT_DURATION.observe(time.perf_counter() - start)
+
+    def _snapshot(self, room_id: str, room: _SpectatorRoom) -> OutgoingMessage:
+        """当前状态的快照，同一状态只生成一次（私有方法）"""
+        if room.snapshot is None:
+            room.snapshot = OutgoingMessage(self.snapshot_provider(room_id))
+        return room.snapshot
+
+    async def _sender(self, room_id: str, room: _SpectatorRoom, spectator: Spectator):
+        """发送观战者的待发送消息（私有方法）"""
+        websocket = spectator.websocket
+        while True:
+            await spectator.wakeup.wait()
+            spectator.wakeup.clear()
+            if spectator.resync:
+                spectator.resync = False
+                spectator.pending = None
+                outgoing = self._snapshot(room_id, room)
+            else:
+                outgoing, spectator.pending = spectator.pending, None
+                if outgoing is None:
+                    continue
+            payload = outgoing.encoded(spectator.wire_format)
+            if isinstance(payload, bytes):
+                await websocket.send_bytes(payload)
+            else:
+                await websocket.send_text(payload)
+            metrics.MESSAGES_SENT.inc()
+
+    async def _receiver(self, spectator: Spectator):
+        """接收观战者的消息，只处理重新同步请求，直到连接断开（私有方法）"""
+        while True:
+            data = await spectator.websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                return
+            text = data.get("text")
+            try:
+                message = wire.decode(text if text is not None else data.get("bytes"))
+            except Exception:
+                # 观战者发来的内容不影响观战
+                continue
+            if isinstance(message, dict) and message.get("action") == "resync":
+                spectator.resync = True
+                spectator.wakeup.set()
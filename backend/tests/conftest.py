@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 后端模块位于上一级目录，以顶层模块的方式导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
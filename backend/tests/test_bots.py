@@ -0,0 +1,51 @@
+import copy
+
+import pytest
+
+from bots import MAX_RESERVE, MIN_RESERVE, build_policy
+from game_board import DEFAULT_BOARD, TILE_PROPERTY, Board
+
+def _board(modify) -> Board:
+    """复制默认棋盘定义，修改后编译为新棋盘"""
+    definition = copy.deepcopy(DEFAULT_BOARD.definition)
+    modify(definition)
+    return Board("test", definition)
+
+def _property_ids(board: Board):
+    return [tile_id for tile_id in range(board.size) if board.tile_types[tile_id] == TILE_PROPERTY]
+
+def test_default_board_policy():
+    policy = build_policy(DEFAULT_BOARD)
+    for tile_id in _property_ids(DEFAULT_BOARD):
+        assert MIN_RESERVE <= policy.buy_reserve[tile_id] <= MAX_RESERVE
+        assert MIN_RESERVE <= policy.upgrade_reserve[tile_id] <= MAX_RESERVE
+
+def test_free_upgrade_is_ranked_first():
+    board = _board(lambda definition: definition["tiles"][1].update(upgrade_cost=0))
+    policy = build_policy(board)
+    assert policy.upgrade_rank[1] == 0
+    assert policy.upgrade_reserve[1] == MIN_RESERVE
+
+def test_zero_mortgage_value_is_mortgaged_last():
+    board = _board(lambda definition: definition["tiles"][1].update(mortgage_value=0))
+    policy = build_policy(board)
+    assert policy.mortgage_rank[1] == len(_property_ids(board)) - 1
+
+@pytest.mark.parametrize("tiles", [[1], "all"])
+def test_zero_rent_never_pays_back(tiles):
+    def modify(definition):
+        for tile in definition["tiles"]:
+            if tile["type"] == "property" and (tiles == "all" or tile["id"] in tiles):
+                tile["rent"] = [0] * len(tile["rent"])
+    board = _board(modify)
+    policy = build_policy(board)
+    assert policy.buy_reserve[1] == MAX_RESERVE
+
+def test_board_without_properties():
+    def modify(definition):
+        for tile in definition["tiles"]:
+            if tile["type"] == "property":
+                definition["tiles"][tile["id"]] = {"id": tile["id"], "name": tile["name"], "type": "free_parking"}
+        definition["property_groups"] = {}
+    policy = build_policy(_board(modify))
+    assert all(reserve is None for reserve in policy.buy_reserve)
@@ -0,0 +1,35 @@
+import copy
+
+import pytest
+
+from game_board import DEFAULT_BOARD, Board
+
+def _definition_with_card(card):
+    definition = copy.deepcopy(DEFAULT_BOARD.definition)
+    definition["chance_cards"].append(dict(card, text="测试卡片"))
+    return definition
+
+def test_default_board_compiles():
+    Board("test", copy.deepcopy(DEFAULT_BOARD.definition))
+
+@pytest.mark.parametrize("card", [
+    {"type": "move_forward", "value": 0},
+    {"type": "move_forward", "value": -2},
+    {"type": "move_backward", "value": 0},
+    {"type": "move_backward", "value": -1},
+    # 目标是机会和命运地块
+    {"type": "move_to", "value": 3},
+    {"type": "move_to", "value": 8},
+    {"type": "move_to", "value": DEFAULT_BOARD.size},
+])
+def test_rejects_cards_that_loop_or_leave_the_board(card):
+    with pytest.raises(ValueError):
+        Board("test", _definition_with_card(card))
+
+@pytest.mark.parametrize("card", [
+    {"type": "move_forward", "value": 1},
+    {"type": "move_backward", "value": 2},
+    {"type": "move_to", "value": 1},
+])
+def test_accepts_valid_movement_cards(card):
+    Board("test", _definition_with_card(card))
@@ -0,0 +1,36 @@
+from connection_manager import ConnectionManager
+from game_logic import GameManager
+from replay import record_script, replay, state_hash
+from room_actor import RoomActor
+
+# 插入在加入游戏之后的失败操作：非当前玩家掷骰子、重复加入、参数类型错误导致的异常、中途失败的批量操作
+FAILING_ACTIONS = [
+    {"player_id": "p1", "message": {"action": "roll_dice"}},
+    {"player_id": "p0", "message": {"action": "join_game", "player_name": "玩家0"}},
+    {"player_id": "p0", "message": {"action": "upgrade_property", "property_id": "x"}},
+    {"player_id": "p0", "message": {"action": "batch", "actions": [
+        {"action": "roll_dice"},
+        {"action": "redeem_property", "property_id": 999},
+    ]}},
+]
+
+def _script_with_failures(seed: int = 7, players: int = 3):
+    script = record_script(seed, players=players, turns=40)
+    actions = script["actions"]
+    script_with_failures = dict(script, actions=actions[:players] + FAILING_ACTIONS + actions[players:])
+    return script, script_with_failures
+
+def test_failing_actions_do_not_change_replayed_state():
+    script, script_with_failures = _script_with_failures()
+    result = replay(script_with_failures)
+    assert result["errors"] == 1
+    assert result["state_hash"] == replay(script)["state_hash"]
+
+def test_replay_matches_room_actor():
+    _, script = _script_with_failures()
+    game_manager = GameManager(script["room_id"], script["seed"], max_players=3)
+    actor = RoomActor(script["room_id"], game_manager, ConnectionManager())
+    for step in script["actions"]:
+        actor._apply_action(step["player_id"], step["message"])
+        game_manager.commit_delta()
+    assert state_hash(game_manager) == replay(script)["state_hash"]
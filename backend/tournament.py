@@ -0,0 +1,311 @@
+"""多进程完整规则锦标赛
+
+用真实的 GameManager 规则（落地处理、监狱、机会/命运卡、债务与破产）进行完整对局，
+直到只剩一名玩家（game_phase 变为 finished）或达到回合上限。所有玩家都由
+bots.py 的决策表控制，对局按种子分块分配给进程池，各块的统计结果一完成就合并，
+可在单机上一夜跑完上百万局，用于验证规则或数值调整的效果。
+
+统计内容：
+- 按座位顺序（加入顺序）的胜率
+- 决出胜负的对局长度（回合数）的分布
+- 达到回合上限的对局单独统计：局数、占比和届时资金领先的座位
+- 破产原因（租金、税收、卡片、出狱罚款）
+
+用法：
+    python tournament.py --games 100000 --players 4 --seed 1 --board default
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from actions import dispatch_action
+from bots import BOT_PREFIX, BotPolicy, build_policy
+from game_board import BOARDS, DEFAULT_BOARD_NAME
+from game_logic import MAX_PLAYERS, GameManager
+
+# 单局的最大回合数（每次掷骰子算一个回合），超过后按未分胜负计
+DEFAULT_MAX_TURNS = 2000
+
+# 对局长度直方图的分组宽度（回合数）
+LENGTH_BUCKET = 50
+
+# 最多保留的出错对局种子数
+MAX_ERROR_SEEDS = 20
+
+# 工作进程内的决策表，由 _init_worker 生成
+_policy: Optional[BotPolicy] = None
+
+def play_game(policy: BotPolicy, seed: int, players: int = MAX_PLAYERS, max_turns: int = DEFAULT_MAX_TURNS) -> Dict:
+    """按给定种子进行一局完整对局
+
+    Returns:
+        对局结果：outcome 为 finished（决出胜者）、timeout（达到回合上限）
+        或 stalled（没有玩家能继续行动）；winner 为胜者座位；leader 为达到
+        回合上限时资金最多的座位；bankruptcies 为依次破产的 (座位, 原因)
+    """
+    game_manager = GameManager("tournament", seed, max_players=players, board=policy.board)
+    state = game_manager.state
+    for seat in range(players):
+        game_manager.add_player(f"{BOT_PREFIX}{seat}", f"玩家{seat}")
+    seats = {player_id: player.seat for player_id, player in state.players.items()}
+
+    turns = 0
+    outcome = "timeout"
+    while turns < max_turns:
+        if state.game_phase == "finished":
+            outcome = "finished"
+            break
+        decision = policy.decide(state)
+        if decision is None:
+            outcome = "stalled"
+            break
+        player_id, message = decision
+        if message["action"] == "roll_dice":
+            turns += 1
+        result = dispatch_action(game_manager, player_id, message)
+        # 只统计不重放，丢弃为事件日志记录的随机结果
+        game_manager.take_rng_outcomes()
+        if not result.get("success"):
+            outcome = "stalled"
+            break
+    else:
+        if state.game_phase == "finished":
+            outcome = "finished"
+
+    winner = None
+    leader = None
+    if outcome == "finished":
+        winner = seats[next(iter(state.players))]
+    elif outcome == "timeout":
+        leader = seats[max(state.players, key=lambda player_id: state.players[player_id].money)]
+    return {
+        "seed": seed,
+        "outcome": outcome,
+        "turns": turns,
+        "winner": winner,
+        "leader": leader,
+        "bankruptcies": [(seats[item["player_id"]], item["cause"]) for item in game_manager.bankruptcies],
+    }
+
+def new_tally(players: int) -> Dict:
+    """空的统计结果"""
+    return {
+        "games": 0,
+        "outcomes": Counter(),
+        "wins": [0] * players,
+        "timeout_leaders": [0] * players,
+        "bankrupt_seats": [0] * players,
+        "causes": Counter(),
+        "lengths": Counter(),
+        "error_seeds": [],
+    }
+
+def merge_tally(total: Dict, part: Dict):
+    """把一块对局的统计结果合并到 total 中"""
+    total["games"] += part["games"]
+    total["outcomes"].update(part["outcomes"])
+    total["causes"].update(part["causes"])
+    total["lengths"].update(part["lengths"])
+    for seat, count in enumerate(part["wins"]):
+        total["wins"][seat] += count
+    for seat, count in enumerate(part["timeout_leaders"]):
+        total["timeout_leaders"][seat] += count
+    for seat, count in enumerate(part["bankrupt_seats"]):
+        total["bankrupt_seats"][seat] += count
+    room = MAX_ERROR_SEEDS - len(total["error_seeds"])
+    total["error_seeds"].extend(part["error_seeds"][:room])
+
+def _init_worker(board_name: str):
+    """工作进程初始化：为棋盘生成一次决策表（私有函数）"""
+    global _policy
+    _policy = build_policy(BOARDS[board_name])
+
+def _play_chunk(task: tuple) -> Dict:
+    """在工作进程中进行一块连续种子的对局，返回这一块的统计结果（私有函数）"""
+    first_seed, count, players, max_turns = task
+    tally = new_tally(players)
+    for seed in range(first_seed, first_seed + count):
+        tally["games"] += 1
+        try:
+            game = play_game(_policy, seed, players, max_turns)
+        except Exception:
+            # 引擎异常：记录种子以便单独复现
+            tally["outcomes"]["error"] += 1
+            if len(tally["error_seeds"]) < MAX_ERROR_SEEDS:
+                tally["error_seeds"].append(seed)
+            continue
+        tally["outcomes"][game["outcome"]] += 1
+        # 对局长度只统计决出胜负的对局，达到回合上限的对局另行统计
+        if game["winner"] is not None:
+            tally["lengths"][game["turns"]] += 1
+            tally["wins"][game["winner"]] += 1
+        if game["leader"] is not None:
+            tally["timeout_leaders"][game["leader"]] += 1
+        for seat, cause in game["bankruptcies"]:
+            tally["bankrupt_seats"][seat] += 1
+            tally["causes"][cause] += 1
+    return tally
+
+def run_tournament(games: int, players: int = MAX_PLAYERS, seed: int = 0, workers: Optional[int] = None,
+                   chunk_size: int = 200, max_turns: int = DEFAULT_MAX_TURNS, progress=None,
+                   board_name: str = DEFAULT_BOARD_NAME) -> Dict:
+    """在进程池中进行 games 局对局，第 i 局使用种子 seed + i
+
+    Args:
+        workers: 工作进程数，默认使用全部 CPU 核心；为 1 时在当前进程中运行
+        chunk_size: 每个任务包含的对局数
+        progress: 每合并一块结果后调用 progress(已完成局数, 总局数)
+        board_name: 使用的棋盘名
+    """
+    tasks = [
+        (seed + first, min(chunk_size, games - first), players, max_turns)
+        for first in range(0, games, chunk_size)
+    ]
+    workers = workers or os.cpu_count() or 1
+    total = new_tally(players)
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(board_name)
+        parts = map(_play_chunk, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(board_name,))
+        parts = pool.imap_unordered(_play_chunk, tasks)
+    try:
+        for part in parts:
+            merge_tally(total, part)
+            if progress is not None:
+                progress(total["games"], games)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    elapsed = time.perf_counter() - start
+
+    result = summarize(total, players, seed, elapsed)
+    result["board"] = board_name
+    return result
+
+def _percentile(lengths: Counter, fraction: float) -> int:
+    """按计数统计的分位数（私有函数）"""
+    target = fraction * sum(lengths.values())
+    seen = 0
+    for turns in sorted(lengths):
+        seen += lengths[turns]
+        if seen >= target:
+            return turns
+    return 0
+
+def summarize(total: Dict, players: int, seed: int, elapsed: float) -> Dict:
+    """把合并后的统计结果整理为报告"""
+    finished = total["outcomes"]["finished"]
+    timeouts = total["outcomes"]["timeout"]
+    lengths = total["lengths"]
+    played = sum(lengths.values())
+    histogram = Counter()
+    for turns, count in lengths.items():
+        histogram[turns // LENGTH_BUCKET * LENGTH_BUCKET] += count
+    bankruptcies = sum(total["causes"].values())
+
+    return {
+        "games": total["games"],
+        "players": players,
+        "seed": seed,
+        "elapsed_seconds": elapsed,
+        "games_per_second": total["games"] / elapsed if elapsed > 0 else 0.0,
+        "outcomes": dict(total["outcomes"]),
+        "win_rate_by_seat": [wins / finished if finished else 0.0 for wins in total["wins"]],
+        "bankruptcy_rate_by_seat": [
+            count / total["games"] if total["games"] else 0.0 for count in total["bankrupt_seats"]
+        ],
+        "timeout": {
+            "games": timeouts,
+            "share": timeouts / total["games"] if total["games"] else 0.0,
+            # 达到回合上限时资金领先的座位分布
+            "leader_rate_by_seat": [count / timeouts if timeouts else 0.0 for count in total["timeout_leaders"]],
+        },
+        # 只包含决出胜负的对局
+        "length": {
+            "mean": sum(turns * count for turns, count in lengths.items()) / played if played else 0.0,
+            "min": min(lengths) if lengths else 0,
+            "p50": _percentile(lengths, 0.5),
+            "p90": _percentile(lengths, 0.9),
+            "p99": _percentile(lengths, 0.99),
+            "max": max(lengths) if lengths else 0,
+            # 分组起点 -> 局数
+            "histogram": {str(bucket): histogram[bucket] for bucket in sorted(histogram)},
+        },
+        "bankruptcy_causes": {
+            cause: {"count": count, "share": count / bankruptcies}
+            for cause, count in total["causes"].most_common()
+        },
+        "error_seeds": total["error_seeds"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="大富翁多进程完整规则锦标赛")
+    parser.add_argument("--games", type=int, default=10000, help="对局数")
+    parser.add_argument("--players", type=int, default=MAX_PLAYERS, help="每局玩家数")
+    parser.add_argument("--seed", type=int, default=None, help="第一局的种子，默认随机生成")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认为 CPU 核心数")
+    parser.add_argument("--chunk-size", type=int, default=200, help="每个任务包含的对局数")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS, help="单局最大回合数")
+    parser.add_argument("--board", default=DEFAULT_BOARD_NAME, choices=sorted(BOARDS), help="棋盘名")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    args = parser.parse_args()
+    if args.players < 2:
+        parser.error("每局至少需要 2 名玩家")
+
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    start = time.perf_counter()
+
+    def progress(done: int, games: int):
+        rate = done / max(time.perf_counter() - start, 1e-9)
+        print(f"\r已完成 {done}/{games} 局，{rate:.0f} 局/秒", end="", file=sys.stderr, flush=True)
+
+    result = run_tournament(
+        args.games, args.players, seed, args.workers, args.chunk_size, args.max_turns, progress, args.board
+    )
+    print(file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    outcomes = result["outcomes"]
+    print(
+        f"种子 {seed} 起 {result['games']} 局，{result['players']} 名玩家，"
+        f"耗时 {result['elapsed_seconds']:.1f} 秒（{result['games_per_second']:.0f} 局/秒）"
+    )
+    print(
+        f"决出胜负 {outcomes.get('finished', 0)} 局，达到回合上限 {outcomes.get('timeout', 0)} 局，"
+        f"无法继续 {outcomes.get('stalled', 0)} 局，引擎异常 {outcomes.get('error', 0)} 局"
+    )
+    print("按座位的胜率 / 破产率：")
+    for seat, (win_rate, bankrupt_rate) in enumerate(zip(result["win_rate_by_seat"], result["bankruptcy_rate_by_seat"])):
+        print(f"  座位 {seat}  {win_rate:7.2%}  {bankrupt_rate:7.2%}")
+    timeout = result["timeout"]
+    if timeout["games"]:
+        print(f"达到回合上限 {timeout['games']} 局（{timeout['share']:.2%}），届时资金领先的座位：")
+        for seat, rate in enumerate(timeout["leader_rate_by_seat"]):
+            print(f"  座位 {seat}  {rate:7.2%}")
+    length = result["length"]
+    print(
+        f"决出胜负的对局长度（回合）：平均 {length['mean']:.1f}，最短 {length['min']}，p50 {length['p50']}，"
+        f"p90 {length['p90']}，p99 {length['p99']}，最长 {length['max']}"
+    )
+    print("破产原因：")
+    for cause, entry in result["bankruptcy_causes"].items():
+        print(f"  {cause:<10} {entry['count']:>9}  {entry['share']:7.2%}")
+    if result["error_seeds"]:
+        print(f"出错对局的种子：{result['error_seeds']}")
+
+if __name__ == "__main__":
+    main()
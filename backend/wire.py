@@ -0,0 +1,81 @@
+"""消息编码格式
+
+客户端连接时通过查询参数 format 选择服务器发送消息使用的编码：
+    json     - 标准库 json 文本帧（默认）
+    orjson   - orjson 编码的 JSON 文本帧，内容与 json 相同，编码更快
+    msgpack  - MessagePack 二进制帧，体积更小
+
+orjson 和 msgpack 为可选依赖，未安装时请求该格式的连接回退为 json。
+客户端发来的消息可以是 JSON 文本帧，也可以是 MessagePack 二进制帧。
+"""
+import json
+from typing import Dict, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMAT_JSON = "json"
+FORMAT_ORJSON = "orjson"
+FORMAT_MSGPACK = "msgpack"
+
+def available_formats() -> List[str]:
+    """当前进程支持的编码格式"""
+    formats = [FORMAT_JSON]
+    if orjson is not None:
+        formats.append(FORMAT_ORJSON)
+    if msgpack is not None:
+        formats.append(FORMAT_MSGPACK)
+    return formats
+
+def negotiate(requested: Optional[str]) -> str:
+    """根据客户端请求的格式选择实际使用的格式，不支持时回退为 json"""
+    if requested in available_formats():
+        return requested
+    return FORMAT_JSON
+
+def encode(message: Dict, wire_format: str = FORMAT_JSON) -> Union[str, bytes]:
+    """按指定格式编码消息，文本格式返回 str，二进制格式返回 bytes"""
+    if wire_format == FORMAT_MSGPACK:
+        return msgpack.packb(message, use_bin_type=True)
+    if wire_format == FORMAT_ORJSON:
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message)
+
+def decode(data: Union[str, bytes]) -> Dict:
+    """解码客户端消息：文本帧按 JSON 解析，二进制帧按 MessagePack 解析"""
+    if isinstance(data, str):
+        return json.loads(data)
+    if msgpack is None:
+        raise ValueError("服务器不支持二进制消息")
+    return msgpack.unpackb(data, raw=False)
+
+class OutgoingMessage:
+    """待发送的消息，每种格式只编码一次并缓存结果
+
+    广播时同一个对象放入房间内所有连接的发送队列，
+    使用相同格式的连接共享同一份编码结果。
+    """
+
+    __slots__ = ("message", "_encoded")
+
+    def __init__(self, message: Dict):
+        self.message = message
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def encoded(self, wire_format: str) -> Union[str, bytes]:
+        """取得指定格式的编码结果"""
+        payload = self._encoded.get(wire_format)
+        if payload is None:
+            payload = self._encoded[wire_format] = encode(self.message, wire_format)
+        return payload
+
+    def items(self):
+        """已经编码过的 (格式, 结果)"""
+        return self._encoded.items()
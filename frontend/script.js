@@ -1,34 +1,8 @@
-// 游戏地图数据（与后端保持一致）
-const GAME_MAP = [
-    {"id": 0, "name": "起点", "type": "start"},
-    {"id": 1, "name": "高旺路", "type": "property", "price": 1000, "rent": [100, 300, 700], "mortgage_value": 500, "upgrade_cost": 500},
-    {"id": 2, "name": "竹湾路", "type": "property", "price": 1200, "rent": [120, 360, 840], "mortgage_value": 600, "upgrade_cost": 600},
-    {"id": 3, "name": "机会", "type": "chance"},
-    {"id": 4, "name": "红岭路", "type": "property", "price": 1500, "rent": [150, 450, 1050], "mortgage_value": 750, "upgrade_cost": 750},
-    {"id": 5, "name": "监狱", "type": "jail"},
-    {"id": 6, "name": "龙山路", "type": "property", "price": 1800, "rent": [180, 540, 1260], "mortgage_value": 900, "upgrade_cost": 900},
-    {"id": 7, "name": "三龙大道", "type": "property", "price": 2000, "rent": [200, 600, 1400], "mortgage_value": 1000, "upgrade_cost": 1000},
-    {"id": 8, "name": "命运", "type": "destiny"},
-    {"id": 9, "name": "工厂路", "type": "property", "price": 2200, "rent": [220, 660, 1540], "mortgage_value": 1100, "upgrade_cost": 1100},
-    {"id": 10, "name": "免费停车", "type": "free_parking"},
-    {"id": 11, "name": "富民路", "type": "property", "price": 2500, "rent": [250, 750, 1750], "mortgage_value": 1250, "upgrade_cost": 1250},
-    {"id": 12, "name": "大学路", "type": "property", "price": 2800, "rent": [280, 840, 1960], "mortgage_value": 1400, "upgrade_cost": 1400},
-    {"id": 13, "name": "税收", "type": "tax"},
-    {"id": 14, "name": "西江路", "type": "property", "price": 3000, "rent": [300, 900, 2100], "mortgage_value": 1500, "upgrade_cost": 1500},
-    {"id": 15, "name": "前往监狱", "type": "go_to_jail"},
-    {"id": 16, "name": "文澜路", "type": "property", "price": 3200, "rent": [320, 960, 2240], "mortgage_value": 1600, "upgrade_cost": 1600},
-    {"id": 17, "name": "西堤路", "type": "property", "price": 3500, "rent": [350, 1050, 2450], "mortgage_value": 1750, "upgrade_cost": 1750},
-    {"id": 18, "name": "机会", "type": "chance"},
-    {"id": 19, "name": "新兴路", "type": "property", "price": 4000, "rent": [400, 1200, 2800], "mortgage_value": 2000, "upgrade_cost": 2000}
-];
-
-// 地产颜色组常量（与后端保持一致）
-const PROPERTY_GROUPS = {
-    'group1': [1, 2, 4],
-    'group2': [6, 7, 9],
-    'group3': [11, 12, 14],
-    'group4': [16, 17, 19]
-};
+// 棋盘数据，启动时从服务器 /board 接口加载
+let GAME_MAP = [];
+let PROPERTY_GROUPS = {};
+let boardVersion = null; // 当前棋盘数据的版本号
+const BOARD_CACHE_KEY = 'monopoly-board'; // 本地缓存棋盘数据的键前缀，后接棋盘名
 
 // 全局变量
 let socket = null;
@@ -36,13 +10,21 @@ let roomId = null;
 let playerId = null;
 let playerName = null;
 let gameState = null;
-let lastShownCardLog = null; // 记录上次显示的卡片日志，避免重复显示
+let stateVersion = -1; // 当前游戏状态的版本号
+let resyncPending = false; // 是否已请求完整状态重新同步
+let wsRedirectUrl = null; // 分片模式下房间所在工作进程的WebSocket地址
+let redirecting = false; // 是否正在跳转到房间所在的工作进程
+let spectating = false; // 是否以观战者身份连接
+let resumeToken = null; // 服务器发放的重连令牌，断线后凭它在保留时间内回到原座位
+let lastShownCardLog = -1; // 记录上次显示的卡片日志序号，避免重复显示
+const LIVE_LOG_SIZE = 50; // 本地保留的最近日志条数（与后端保持一致）
 
 // DOM元素
 const elements = {
     modal: document.getElementById('join-modal'),
     joinForm: document.getElementById('join-form'),
     createRoomBtn: document.getElementById('create-room-btn'),
+    spectateBtn: document.getElementById('spectate-btn'),
     roomIdInput: document.getElementById('room-id-input'),
     playerNameInput: document.getElementById('player-name-input'),
     roomIdDisplay: document.getElementById('room-id-display'),
@@ -60,17 +42,53 @@ const elements = {
 };
 
 // 初始化游戏
-function initGame() {
+async function initGame() {
     // 显示加入游戏模态框
     elements.modal.style.display = 'flex';
     
-    // 创建游戏棋盘
+    // 加载棋盘数据并创建游戏棋盘
+    try {
+        await loadBoard();
+    } catch (error) {
+        console.error('加载棋盘失败:', error);
+        alert('加载棋盘失败，请检查服务器连接');
+    }
     createGameBoard();
     
     // 绑定事件监听器
     bindEventListeners();
 }
 
+// 加载棋盘数据：优先使用本地缓存，凭版本号向服务器验证是否过期
+async function loadBoard(name = 'default') {
+    const cacheKey = `${BOARD_CACHE_KEY}-${name}`;
+    let cached = null;
+    try {
+        cached = JSON.parse(localStorage.getItem(cacheKey));
+    } catch (error) {
+        cached = null;
+    }
+    
+    let board = cached;
+    try {
+        const headers = cached ? { 'If-None-Match': `"${cached.version}"` } : {};
+        const response = await fetch(`http://localhost:8001/board?name=${encodeURIComponent(name)}`, { headers });
+        if (response.ok) {
+            board = await response.json();
+            localStorage.setItem(cacheKey, JSON.stringify(board));
+        } else if (response.status !== 304) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+    } catch (error) {
+        // 服务器不可用时沿用本地缓存
+        if (!cached) throw error;
+    }
+    
+    GAME_MAP = board.tiles;
+    PROPERTY_GROUPS = board.property_groups;
+    boardVersion = board.version;
+}
+
 // 创建游戏棋盘
 function createGameBoard() {
     elements.gameBoard.innerHTML = '';
@@ -132,6 +150,9 @@ function bindEventListeners() {
     // 创建房间按钮
     elements.createRoomBtn.addEventListener('click', handleCreateRoom);
     
+    // 观战按钮
+    elements.spectateBtn.addEventListener('click', handleSpectate);
+    
     // 游戏控制按钮
     elements.rollDiceBtn.addEventListener('click', () => sendAction('roll_dice'));
     elements.buyPropertyBtn.addEventListener('click', () => sendAction('buy_property'));
@@ -169,6 +190,22 @@ async function handleJoinGame(event) {
     elements.playerIdDisplay.textContent = `玩家ID: ${playerId}`;
 }
 
+// 处理观战：只接收房间状态，不加入游戏
+function handleSpectate() {
+    roomId = elements.roomIdInput.value.trim();
+    if (!roomId) {
+        alert('请输入要观战的房间ID');
+        return;
+    }
+    
+    spectating = true;
+    connectWebSocket();
+    
+    elements.modal.style.display = 'none';
+    elements.roomIdDisplay.textContent = `房间ID: ${roomId}`;
+    elements.playerIdDisplay.textContent = '观战中';
+}
+
 // 处理创建房间
 async function handleCreateRoom() {
     try {
@@ -219,15 +256,20 @@ function generatePlayerId() {
 function connectWebSocket() {
     updateConnectionStatus('connecting', '连接中...');
     
-    const wsUrl = `ws://localhost:8001/ws/${roomId}/${playerId}`;
+    const defaultUrl = spectating
+        ? `ws://localhost:8001/spectate/${roomId}`
+        : `ws://localhost:8001/ws/${roomId}/${playerId}`;
+    // 重连时带上令牌和已知的状态版本，服务器只补发错过的更新
+    const params = new URLSearchParams();
+    if (resumeToken) params.set('token', resumeToken);
+    if (gameState && stateVersion >= 0) params.set('last_version', stateVersion);
+    const query = params.toString();
+    const wsUrl = (wsRedirectUrl || defaultUrl) + (query ? `?${query}` : '');
     socket = new WebSocket(wsUrl);
     
     socket.onopen = function(event) {
         console.log('WebSocket连接已建立');
         updateConnectionStatus('connected', '已连接');
-        
-        // 发送加入游戏请求
-        sendAction('join_game', { player_name: playerName });
     };
     
     socket.onmessage = function(event) {
@@ -239,9 +281,22 @@ function connectWebSocket() {
         console.log('WebSocket连接已关闭');
         updateConnectionStatus('disconnected', '连接断开');
         
+        // 跳转到房间所在的工作进程时立即重连
+        if (redirecting) {
+            redirecting = false;
+            connectWebSocket();
+            return;
+        }
+        
+        // 重连令牌不符或房间不存在时不再重连
+        if (event.code === 1008) {
+            updateConnectionStatus('disconnected', '无法连接到该房间');
+            return;
+        }
+        
         // 尝试重连
         setTimeout(() => {
-            if (roomId && playerId) {
+            if (roomId && (playerId || spectating)) {
                 connectWebSocket();
             }
         }, 3000);
@@ -260,14 +315,35 @@ function handleServerMessage(message) {
     switch (message.type) {
         case 'connection':
             addLogEntry(message.message);
+            resumeToken = message.token || null;
+            // 座位仍保留时直接继续游戏，否则发送加入游戏请求（观战者不加入游戏）
+            if (!spectating && !message.resumed) {
+                sendAction('join_game', { player_name: playerName });
+            }
             break;
             
         case 'game_state':
             gameState = message.data;
+            stateVersion = message.version;
+            resyncPending = false;
+            // 房间使用的棋盘或其版本与本地不同时重新加载棋盘
+            if (message.board_version && message.board_version !== boardVersion) {
+                loadBoard(message.board).then(() => {
+                    createGameBoard();
+                    render(gameState);
+                });
+                break;
+            }
             render(gameState);
             checkForCardMessage(gameState.game_log);
             break;
             
+        case 'game_delta':
+            applyGameDelta(message.data);
+            // 与增量合并发送的通知（如玩家离开）
+            (message.notices || []).forEach(handleServerMessage);
+            break;
+            
         case 'action_result':
             handleActionResult(message);
             break;
@@ -276,13 +352,68 @@ function handleServerMessage(message) {
             addLogEntry(message.message);
             break;
             
+        case 'redirect':
+            // 房间由其他工作进程负责，连接关闭后改连该地址
+            // 查询参数在每次连接时重新生成
+            wsRedirectUrl = message.url.split('?')[0];
+            redirecting = true;
+            break;
+            
         default:
             console.log('未知消息类型:', message.type);
     }
 }
 
+// 应用服务器推送的状态增量
+function applyGameDelta(delta) {
+    // 过期的增量直接忽略
+    if (gameState && delta.version <= stateVersion) return;
+    
+    // 缺少中间版本时请求完整状态重新同步；
+    // 服务器合并广播的增量可能从更早的版本开始，增量是覆盖式的，可以直接应用
+    if (!gameState || delta.base_version > stateVersion) {
+        if (!resyncPending) {
+            resyncPending = true;
+            sendAction('resync');
+        }
+        return;
+    }
+    
+    delta.removed_players.forEach(id => {
+        delete gameState.players[id];
+    });
+    Object.entries(delta.players).forEach(([id, player]) => {
+        gameState.players[id] = player;
+    });
+    Object.entries(delta.tile_states).forEach(([id, tileState]) => {
+        gameState.tile_states[id] = tileState;
+    });
+    // 跳过已经收到过的日志
+    const lastLog = gameState.game_log[gameState.game_log.length - 1];
+    const newLogs = lastLog ? delta.game_log.filter(entry => entry.seq > lastLog.seq) : delta.game_log;
+    gameState.game_log = gameState.game_log.concat(newLogs).slice(-LIVE_LOG_SIZE);
+    
+    // 合并发生变化的标量字段
+    ['current_turn_player_id', 'game_phase', 'has_rolled_dice', 'can_buy_property',
+     'turn_completed', 'player_in_debt_id'].forEach(field => {
+        if (field in delta) {
+            gameState[field] = delta[field];
+        }
+    });
+    
+    stateVersion = delta.version;
+    render(gameState);
+    checkForCardMessage(gameState.game_log);
+}
+
 // 处理操作结果
 function handleActionResult(result) {
+    // 批量操作成功时逐个展示各操作的结果
+    if (result.action === 'batch' && result.success) {
+        result.results.forEach(handleActionResult);
+        return;
+    }
+
     if (result.success) {
         if (result.dice_roll) {
             elements.diceValue.textContent = result.dice_roll;
@@ -392,7 +523,7 @@ function renderPlayers(players, currentTurnPlayerId) {
                                     onclick="handlePropertyAction('${isMortgaged ? 'redeem' : 'mortgage'}', ${propertyId})">
                                 ${isMortgaged ? '赎回' : '抵押'}
                             </button>
-                            ${!isMortgaged && level < 2 && hasCompletePropertyGroup(player.id, propertyId) ? `
+                            ${!isMortgaged && level < property.rent.length - 1 && hasCompletePropertyGroup(player.id, propertyId) ? `
                                 <button class="property-btn upgrade-btn" 
                                         onclick="handlePropertyAction('upgrade', ${propertyId})">
                                     升级
@@ -630,7 +761,7 @@ function renderGameLog(logs) {
     recentLogs.forEach(log => {
         const logElement = document.createElement('div');
         logElement.className = 'log-entry';
-        logElement.textContent = log;
+        logElement.textContent = log.text;
         elements.logContent.appendChild(logElement);
     });
     
@@ -662,10 +793,11 @@ function checkForCardMessage(logs) {
     // 检查最新的几条日志
     const recentLogs = logs.slice(-3);
     
-    for (let log of recentLogs) {
+    for (let entry of recentLogs) {
+        const log = entry.text;
         if (log.includes('抽到卡片：')) {
             // 检查是否已经显示过这条日志
-            if (lastShownCardLog === log) {
+            if (entry.seq <= lastShownCardLog) {
                 continue;
             }
             
@@ -684,7 +816,7 @@ function checkForCardMessage(logs) {
             }
             
             // 记录已显示的卡片日志
-            lastShownCardLog = log;
+            lastShownCardLog = entry.seq;
             showCardModal(cardType, cardText);
             break;
         }